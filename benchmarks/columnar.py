@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the pyqualtrics package.
+# For copyright and licensing information about this package, see the
+# NOTICE.txt and LICENSE.txt files in its top-level directory; they are
+# available at https://github.com/Baguage/pyqualtrics
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+""" Memory used by survey responses: OrderedDict of OrderedDicts (getLegacyResponseData) vs
+columnar.ColumnarResponses (getLegacyResponseData with columnar=True).
+
+Usage: python benchmarks/columnar.py [number of responses] [number of questions]
+
+Answers are choice codes 1-5, as in a typical Likert-scale survey. Memory is measured with tracemalloc
+(Python 3 only): peak during the call and what remains allocated while the result is referenced.
+"""
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+from collections import OrderedDict
+
+from pyqualtrics import Qualtrics
+from stub_server import StubServer
+
+
+def legacy_response_data(responses, questions):
+    rng = random.Random(0)
+    parts = []
+    for i in range(responses):
+        response = OrderedDict([("ResponseSet", "Default Response Set"), ("Name", "Qualtrics, Py"),
+                                ("ExternalDataReference", ""), ("EmailAddress", "pyqualtrics+%s@gmail.com" % i),
+                                ("IPAddress", "129.74.%s.%s" % (i // 256 % 256, i % 256)), ("Status", "0"),
+                                ("StartDate", "2017-06-01 10:10:10"), ("EndDate", "2017-06-01 10:20:10"),
+                                ("Finished", "1")])
+        for question in range(questions):
+            response["Q%s" % question] = str(rng.randint(1, 5))
+        parts.append('"R_%015d": %s' % (i, json.dumps(response)))
+    return ("{" + ", ".join(parts) + "}").encode("utf-8")
+
+
+def main(argv):
+    responses = int(argv[1]) if len(argv) > 1 else 20000
+    questions = int(argv[2]) if len(argv) > 2 else 150
+    body = legacy_response_data(responses, questions)
+    print("%d responses, %d questions, body %.1f MB" % (responses, questions, len(body) / 1024.0 / 1024.0))
+    print("%-12s %10s %14s %10s" % ("result", "peak, MB", "retained, MB", "time, s"))
+    with StubServer(body=body) as server:
+        with Qualtrics("user", "token") as qualtrics:
+            qualtrics.url = server.url
+            for name, columnar in (("OrderedDict", False), ("columnar", True)):
+                gc.collect()
+                tracemalloc.start()
+                start = time.time()
+                data = qualtrics.getLegacyResponseData("SV_123", columnar=columnar)
+                elapsed = time.time() - start
+                assert data is not None and len(data) == responses, qualtrics.last_error_message
+                # Debugging copy of the body is not part of the result
+                qualtrics.response = None
+                gc.collect()
+                current, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                print("%-12s %10.1f %14.1f %10.2f" % (name, peak / 1024.0 / 1024.0, current / 1024.0 / 1024.0,
+                                                     elapsed))
+                del data
+
+
+if __name__ == "__main__":
+    main(sys.argv)
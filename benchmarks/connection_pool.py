@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the pyqualtrics package.
+# For copyright and licensing information about this package, see the
+# NOTICE.txt and LICENSE.txt files in its top-level directory; they are
+# available at https://github.com/Baguage/pyqualtrics
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Per-call latency of v2 API calls with and without connection reuse.
+
+Usage: python benchmarks/connection_pool.py [number of calls]
+
+The stub server runs on localhost over plain HTTP, so only the TCP handshake is saved here.
+Against survey.qualtrics.com the difference is much bigger, because TLS handshake is saved too.
+"""
+import sys
+import time
+
+from pyqualtrics import Qualtrics
+from stub_server import StubServer
+
+
+def run(qualtrics, calls):
+    timings = []
+    for i in range(calls):
+        start = time.time()
+        recipient_id = qualtrics.addRecipient("UR_123", "ML_123", "Py", "Qualtrics", "pyqualtrics@gmail.com", "", "EN",
+                                              {"SubjectID": str(i)})
+        timings.append(time.time() - start)
+        assert recipient_id is not None, qualtrics.last_error_message
+    timings.sort()
+    return sum(timings) / calls, timings[calls // 2], timings[int(calls * 0.99)]
+
+
+def main(argv):
+    calls = int(argv[1]) if len(argv) > 1 else 2000
+    with StubServer() as server:
+        print("%-22s %10s %10s %10s" % ("mode", "mean, ms", "p50, ms", "p99, ms"))
+        for name, keep_alive in (("new connection/call", False), ("pooled session", True)):
+            with Qualtrics("user", "token", keep_alive=keep_alive) as qualtrics:
+                qualtrics.url = server.url
+                mean, p50, p99 = run(qualtrics, calls)
+            print("%-22s %10.3f %10.3f %10.3f" % (name, mean * 1000, p50 * 1000, p99 * 1000))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the pyqualtrics package.
+# For copyright and licensing information about this package, see the
+# NOTICE.txt and LICENSE.txt files in its top-level directory; they are
+# available at https://github.com/Baguage/pyqualtrics
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+""" Peak memory usage and throughput of importResponsesAsDict: CSV document built in memory
+(list of responses, StringIO and multipart upload, as in pyqualtrics <= 0.6.6) vs streamed CSV
+(generator of responses, encoded and uploaded in chunks).
+
+Usage: python benchmarks/csv_import.py [number of responses]
+
+Every mode runs in a separate process, because peak RSS of a process never goes down.
+Requests are sent to a local stub server, which reads and discards the upload.
+"""
+import resource
+import subprocess
+import sys
+import time
+from collections import OrderedDict
+
+from pyqualtrics import Qualtrics
+from stub_server import StubServer
+
+
+def responses(count):
+    for i in range(count):
+        response = OrderedDict([("ResponseID", "R_%015d" % i), ("ResponseSet", "Default Response Set"),
+                                ("Name", "Qualtrics, Py"), ("EmailAddress", "pyqualtrics+%s@gmail.com" % i),
+                                ("StartDate", "2017-06-01 10:10:10"), ("EndDate", "2017-06-01 10:20:10"),
+                                ("Finished", "1")])
+        for question in range(10):
+            response["Q%s" % question] = str((i + question) % 5 + 1)
+        yield response
+
+
+def peak_rss_mb():
+    # Kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def run(mode, count):
+    with StubServer() as server:
+        with Qualtrics("user", "token") as qualtrics:
+            qualtrics.url = server.url
+            baseline = peak_rss_mb()
+            start = time.time()
+            if mode == "stringio":
+                rows = list(responses(count))
+                contents = qualtrics._dicts_to_csv(rows, rows[0].keys(), header_rows=2)
+                result = qualtrics.request("importResponses", SurveyID="SV_123",
+                                           post_files={"FileContents": contents})
+            else:
+                result = qualtrics.importResponsesAsDict("SV_123", responses(count))
+            assert result, qualtrics.last_error_message
+            elapsed = time.time() - start
+            print("%-9s %10s %12.1f %10.2f %12.0f" % (mode, count, peak_rss_mb() - baseline, elapsed,
+                                                      count / elapsed))
+
+
+def main(argv):
+    if len(argv) > 2:
+        run(argv[1], int(argv[2]))
+        return
+    count = argv[1] if len(argv) > 1 else "1000000"
+    print("%-9s %10s %12s %10s %12s" % ("mode", "responses", "peak RSS, MB", "time, s", "responses/s"))
+    for mode in ("stringio", "stream"):
+        sys.stdout.flush()
+        subprocess.check_call([sys.executable, __file__, mode, count])
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the pyqualtrics package.
+# For copyright and licensing information about this package, see the
+# NOTICE.txt and LICENSE.txt files in its top-level directory; they are
+# available at https://github.com/Baguage/pyqualtrics
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+""" Decoding speed of JSON backends (see pyqualtrics.jsonbackend) on typical Qualtrics responses.
+
+Usage: python benchmarks/json_backend.py
+
+Payloads: a short v2 call result (addRecipient), a page of 1000 panel members (getPanel), a v3 export progress
+response, and 5000 survey responses (getLegacyResponseData, decoded with order of fields preserved,
+and without it for comparison).
+"""
+import json
+import sys
+import timeit
+from collections import OrderedDict
+
+from pyqualtrics import jsonbackend
+
+
+def payloads():
+    recipient = {"Meta": {"Status": "Success", "Debug": ""}, "Result": {"RecipientID": "MLRP_0123456789abcde"}}
+    panel = [OrderedDict([("RecipientID", "MLRP_%015d" % i), ("FirstName", "Py"), ("LastName", "Qualtrics"),
+                          ("Email", "pyqualtrics+%s@gmail.com" % i), ("ExternalDataReference", ""),
+                          ("Language", "EN"), ("EmbeddedData", {"SubjectID": str(i), "Zip": "46556"})])
+             for i in range(1000)]
+    progress = {"meta": {"httpStatus": "200 - OK"}, "result": {"percentComplete": 42.5, "status": "in progress"}}
+    responses = OrderedDict()
+    for i in range(5000):
+        response = OrderedDict([("ResponseSet", "Default Response Set"), ("Name", "Qualtrics, Py"),
+                                ("EmailAddress", "pyqualtrics+%s@gmail.com" % i), ("Status", "0"),
+                                ("StartDate", "2017-06-01 10:10:10"), ("EndDate", "2017-06-01 10:20:10"),
+                                ("Finished", "1")])
+        for question in range(30):
+            response["Q%s" % question] = "Answer %s to question %s" % (i, question)
+        responses["R_%015d" % i] = response
+    return [
+        ("addRecipient", json.dumps(recipient), False),
+        ("GetResponseExportProgress", json.dumps(progress), False),
+        ("getPanel (1000)", json.dumps(panel), False),
+        ("getLegacyResponseData (5000)", json.dumps(responses), False),
+        ("getLegacyResponseData, ordered", json.dumps(responses), True),
+    ]
+
+
+def main(argv):
+    backends = [jsonbackend.get_backend(name) for name in jsonbackend.available_backends()]
+    print("%-32s %10s %s" % ("payload", "size, KB", " ".join("%12s" % backend.name for backend in backends)))
+    for name, text, ordered in payloads():
+        timings = []
+        for backend in backends:
+            decode = backend.loads_ordered if ordered else backend.loads
+            number, total = timeit.Timer(lambda: decode(text)).autorange()
+            timings.append(total / number)
+        print("%-32s %10.1f %s" % (name, len(text) / 1024.0, " ".join("%9.1f us" % (t * 1e6) for t in timings)))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the pyqualtrics package.
+# For copyright and licensing information about this package, see the
+# NOTICE.txt and LICENSE.txt files in its top-level directory; they are
+# available at https://github.com/Baguage/pyqualtrics
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+""" Peak memory usage of a large getLegacyResponseData call with and without lean mode, and of
+streamLegacyResponseData (responses are parsed one at a time and not kept).
+
+Usage: python benchmarks/lean_mode.py [number of responses]
+
+Every mode runs in a separate process, because peak RSS of a process never goes down. The canned response is
+generated once and read from a temporary file, so building it does not inflate peak RSS of the measured process.
+Reported values: growth of peak RSS during the API call (Unix only, resource module), and memory allocated by Python
+(tracemalloc, Python 3 only) at peak and after the call, while the result is still referenced.
+"""
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import OrderedDict
+
+from pyqualtrics import Qualtrics
+from stub_server import StubServer
+
+
+def legacy_response_data(responses):
+    parts = []
+    for i in range(responses):
+        response = OrderedDict([("ResponseSet", "Default Response Set"), ("Name", "Qualtrics, Py"),
+                                ("ExternalDataReference", ""), ("EmailAddress", "pyqualtrics+%s@gmail.com" % i),
+                                ("IPAddress", "129.74.236.110"), ("Status", "0"),
+                                ("StartDate", "2017-06-01 10:10:10"), ("EndDate", "2017-06-01 10:20:10"),
+                                ("Finished", "1")])
+        for question in range(30):
+            response["Q%s" % question] = "Answer %s to question %s" % (i, question)
+        parts.append('"R_%015d": %s' % (i, json.dumps(response)))
+    return ("{" + ", ".join(parts) + "}").encode("utf-8")
+
+
+def peak_rss_mb():
+    # Kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def run(mode, body_file, traced):
+    with open(body_file, "rb") as fp:
+        body = fp.read()
+    with StubServer(body=body) as server:
+        with Qualtrics("user", "token", lean=(mode == "lean")) as qualtrics:
+            qualtrics.url = server.url
+            if traced:
+                tracemalloc.start()
+            baseline = peak_rss_mb()
+            start = time.time()
+            if mode == "stream":
+                data = sum(1 for _ in qualtrics.streamLegacyResponseData("SV_123"))
+                assert qualtrics.last_error_message is None, qualtrics.last_error_message
+            else:
+                data = qualtrics.getLegacyResponseData("SV_123")
+                assert data is not None, qualtrics.last_error_message
+            elapsed = time.time() - start
+            if traced:
+                current, peak = tracemalloc.get_traced_memory()
+                print("%-8s %12.1f %12.1f %14.1f" % (mode, len(body) / 1024.0 / 1024.0, peak / 1024.0 / 1024.0,
+                                                    current / 1024.0 / 1024.0))
+            else:
+                print("%-8s %12.1f %12.1f %10.2f" % (mode, len(body) / 1024.0 / 1024.0, peak_rss_mb() - baseline,
+                                                    elapsed))
+
+
+def main(argv):
+    if len(argv) > 3:
+        run(argv[1], argv[2], argv[3] == "traced")
+        return
+    responses = int(argv[1]) if len(argv) > 1 else 20000
+    fd, body_file = tempfile.mkstemp(suffix=".json")
+    try:
+        with os.fdopen(fd, "wb") as fp:
+            fp.write(legacy_response_data(responses))
+        print("%-8s %12s %12s %10s" % ("mode", "body, MB", "peak RSS, MB", "time, s"))
+        for mode in ("default", "lean", "stream"):
+            sys.stdout.flush()
+            subprocess.check_call([sys.executable, __file__, mode, body_file, "rss"])
+        print("\n%-8s %12s %12s %14s" % ("mode", "body, MB", "peak, MB", "after call, MB"))
+        for mode in ("default", "lean", "stream"):
+            sys.stdout.flush()
+            subprocess.check_call([sys.executable, __file__, mode, body_file, "traced"])
+    finally:
+        os.remove(body_file)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
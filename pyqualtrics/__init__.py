@@ -20,6 +20,9 @@
 import io
 import csv
 import json
+import tempfile
+import threading
+import time
 import zipfile
 from collections import OrderedDict
 import collections
@@ -29,7 +32,24 @@ import requests
 import os
 import sys
 
-from requests.exceptions import ConnectionError, Timeout, TooManyRedirects, HTTPError
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, ConnectTimeout, Timeout, TooManyRedirects, HTTPError, \
+    ChunkedEncodingError
+from urllib3.exceptions import NewConnectionError, ProtocolError, ReadTimeoutError
+
+from pyqualtrics.bulk import imap_bounded, iter_pages, PageError
+from pyqualtrics.cache import MetadataCache, ResponseCache
+from pyqualtrics.columnar import ColumnarResponses
+from pyqualtrics.csvstream import CSVBody, peek_fieldnames, replayable, split_csv
+from pyqualtrics.export import ExportReader, ExportOrchestrator, PARSERS
+from pyqualtrics import jsonbackend
+from pyqualtrics.links import UniqueLinkGenerator
+from pyqualtrics.polling import AdaptivePoller
+from pyqualtrics.ratelimit import rate_limiter
+from pyqualtrics.retry import NON_IDEMPOTENT
+from pyqualtrics.streaming import iter_json_items
+from pyqualtrics.sync import ResponseSync
+from pyqualtrics.updates import EmbeddedDataUpdater
 
 __version__ = "0.6.6"
 
@@ -49,9 +69,37 @@ if os.path.exists('.env'):
         if len(var) == 2:
             os.environ[var[0]] = var[1]
 
-class Qualtrics(object):
+# Result of one API call, returned by Qualtrics.call and Qualtrics.call3.
+# ok: True if API call was successful
+# status_code: HTTP status code (None if server was not reached)
+# body: Parsed JSON document (or text of the response, see Qualtrics.request), None if API call failed
+# error: Error message, None if API call was successful
+# url: URL of the API call
+# elapsed: Time spent on the call (including retries), in seconds
+# retries: Number of times the call was repeated
+CallResult = collections.namedtuple("CallResult", "ok status_code body error url elapsed retries")
+
+
+class _PerThread(object):
+    """ Attribute which has separate value in every thread (see QualtricsBase debugging attributes)
     """
-    This is representation of Qualtrics REST API
+    def __init__(self, name, default=None):
+        self.name = name
+        self.default = default
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        return getattr(obj._local, self.name, self.default)
+
+    def __set__(self, obj, value):
+        setattr(obj._local, self.name, value)
+
+
+class QualtricsBase(object):
+    """
+    Credentials, request building and response parsing shared by Qualtrics and pyqualtrics.aio.AsyncQualtrics.
+    How HTTP requests are actually sent is up to subclasses.
     """
     # Export formats (API v3)
     CSV_FORMAT = "csv"
@@ -60,11 +108,21 @@ class Qualtrics(object):
     XML_FORMAT = "xml"
     SPSS_FORMAT = "spss"
 
-    # Additional options passed to requests.get or request.post
-    # For example, to disable SSL certificate validations, set requests_kwargs to {"verify": False"}
-    # Can also be used to specify custom certificate and so on
-    # http://docs.python-requests.org/en/master/user/advanced/#ssl-cert-verification
-    requests_kwargs = dict()
+    # Information about the last API call made by the current thread.
+    # One object can be used by many threads, each of them sees results of its own calls only
+    last_error_message = _PerThread("last_error_message")
+    last_status_code = _PerThread("last_status_code")
+    last_url = _PerThread("last_url")
+    last_data = _PerThread("last_data")
+    last_retries = _PerThread("last_retries", 0)  # Number of times the last API call was repeated
+    json_response = _PerThread("json_response")
+    r = _PerThread("r")  # requests.Response object, for debugging purpose
+    response = _PerThread("response")  # For debugging purpose
+
+    # If True, response and r are not kept after API call (see Qualtrics.__init__)
+    lean = False
+    # jsonbackend.Backend used to decode responses. If None, jsonbackend default backend is used
+    json_backend = None
 
     def __init__(self, user=None, token=None, api_version="2.5"):
         """
@@ -86,13 +144,7 @@ class Qualtrics(object):
         self.default_api_version = api_version
         # Version must be a string, not an integer or float
         assert self.default_api_version, STR
-        self.last_error_message = None
-        self.last_status_code = None
-        self.last_url = None
-        self.last_data = None
-        self.json_response = None
-        self.r = None  # requests.Response object, for debugging purpose
-        self.response = None  # For debugging purpose
+        self._local = threading.local()
         self.url = None # For debugging purpose
 
     def __str__(self):
@@ -104,25 +156,501 @@ class Qualtrics(object):
         # Note this will print Qualtrics token - may be dangerous for logging
         return "%s(%r)" % (self.__class__, self.__dict__)
 
-    def request3(self, url, method="post", stream=False, data=None):
+    def _loads(self, text, ordered=False):
+        """ Decode JSON response using json_backend
+
+        :param ordered: If True, objects are decoded to OrderedDict
+        :raise ValueError: If text is not a JSON document
+        """
+        backend = self.json_backend if self.json_backend is not None else jsonbackend.get_backend()
+        if ordered:
+            return backend.loads_ordered(text)
+        return backend.loads(text)
+
+    def _call_result(self, body, started):
+        """ CallResult of the API call made by the current thread
+        """
+        return CallResult(ok=body is not None,
+                          status_code=self.last_status_code,
+                          body=body,
+                          error=self.last_error_message if body is None else None,
+                          url=self.last_url,
+                          elapsed=time.time() - started,
+                          retries=self.last_retries)
+
+    def _prepare_request3(self, url, data):
+        """ Reset debugging attributes and build body and headers of v3 API call
+
+        :return: tuple (body as JSON string, headers)
+        """
         self.last_url = url
         self.last_data = None
+        self.last_status_code = None
         self.r = None
         self.response = None
         self.last_error_message = "Not yet set by request3 function"
         if data is None:
             data = dict()
-        data_json = json.dumps(data)
         headers = {
             "X-API-TOKEN": self.token,
             "Content-Type": "application/json"
         }
+        return json.dumps(data), headers
+
+    def _process_response3(self, status_code, text):
+        """ Parse body of v3 API call response. Sets self.response, self.json_response and self.last_error_message
+
+        :return: True if API call was successful
+        """
+        if not self.lean:
+            self.response = text   # Keep this for backward compatibility with previous versions
+        self.last_status_code = status_code
+        try:
+            self.json_response = self._loads(text)
+        except:
+            self.json_response = None
+        if status_code != 200:
+            # HTTP server error: 404, 500 etc
+            # Apparently http code 401 Unauthorized is returned when incorrect token is provided
+            self.last_error_message = "HTTP Code %s" % status_code
+            try:
+                if "error" in self.json_response["meta"]:
+                    self.last_error_message = self.json_response["meta"]["error"]["errorMessage"]
+                    return False
+            except:
+                # Mailformed response from the server
+                pass
+            return False
+        return True
+
+    def _prepare_request(self, Request, Product, kwargs):
+        """ Build URL and query parameters of v2 API call. Version and ED are removed from kwargs
+
+        :return: tuple (url, params)
+        """
+        Version = kwargs.pop("Version", self.default_api_version)
+        # Version must be a string, not an integer or float
+        assert Version, STR
+
+        # Handling for Multi Product API calls
+        if self.url:
+            # Force URL, for use in unittests.
+            url = self.url
+        elif Product == 'RS':
+            url = "https://survey.qualtrics.com/WRAPI/ControlPanel/api.php"
+        elif Product == 'TA':
+            url = "https://survey.qualtrics.com/WRAPI/Contacts/api.php"
+        else:
+            raise NotImplementedError('Please specify a valid product api')
+
+        # Special case for handling embedded data
+        ed = kwargs.pop("ED", None)
+
+        # http://stackoverflow.com/questions/38987/how-can-i-merge-two-python-dictionaries-in-a-single-expression
+        params = {"User": self.user,
+                       "Token": self.token,
+                       "Format": "JSON",
+                       "Version": Version,
+                       "Request": Request,
+                       }
+        # Python 2 and 3 compatible dictionary merge
+        for item in kwargs:
+            params[item] = kwargs[item]
+
+        # Format embedded data properly,
+        # Example: ED[SubjectID]=CLE10235&ED[Zip]=74534
+        if ed is not None:
+            for key in ed:
+                params["ED[%s]" % key] = ed[key]
+
+        self.json_response = None
+        self.last_error_message = "Not yet set by request function"
+        self.last_status_code = None
+        return url, params
+
+    def _process_response(self, Request, kwargs, status_code, text, url):
+        """ Parse response to v2 API call. Sets self.json_response, self.last_error_message and so on
+
+        :return: Parsed JSON document (string for getSurvey call) or None if API call failed
+        """
+        self.last_url = url
+        if not self.lean:
+            self.response = text
+        self.last_status_code = status_code
+        if status_code == 403:
+            self.last_error_message = "API Error: HTTP Code %s (Forbidden)" % status_code
+            return None
+        if status_code == 401 and Request == "getSurvey":
+            # I'm don't know if 401 is returned for requests other than getSurvey
+            self.last_error_message = "API Error: HTTP Code %s (Unauthorized)" % status_code
+            return None
+
+        try:
+            if Request == "getLegacyResponseData":
+                # Preserve order of responses and fields in each response using OrderedDict
+                json_response = self._loads(text, ordered=True)
+            else:
+                # Don't not use OrderedDict for simplicity.
+                json_response = self._loads(text)
+        except ValueError:
+            # If the data being deserialized is not a valid JSON document, a ValueError will be raised.
+            self.json_response = None
+            if "Format" not in kwargs:
+                self.last_error_message = "Unexpected response from Qualtrics: not a JSON document"
+                return None
+            else:
+                # Special case - getSurvey. That request has a custom response format (xml).
+                # It does not follow the default response format
+                self.last_error_message = None
+                if not isinstance(text, STR):
+                    # Raw body in lean mode
+                    text = text.decode("utf-8")
+                return text
+
+        self.json_response = json_response
+        # Sanity check.
+        if (Request == "getLegacyResponseData" or Request == "getPanel" or Request ==
+            "getListContacts") and "Meta" not in json_response:
+            # Special cases - getLegacyResponseData, getPanel and getListContacts
+            # Success
+            self.last_error_message = None
+            return json_response
+        if "Meta" not in json_response:
+            # Should never happen
+            self.last_error_message = "Unexpected response from Qualtrics: no Meta key in JSON response"
+            return None
+        if "Status" not in json_response["Meta"]:
+            # Should never happen
+            self.last_error_message = "Unexpected response from Qualtrics: no Status key in JSON response"
+            return None
+
+        if json_response["Meta"]["Status"] == "Success":
+            self.last_error_message = None
+            return json_response
+
+        # If error happens, it returns JSON object too
+        # Error message is in json_response["Meta"]["ErrorMessage"]
+        self.last_error_message = json_response["Meta"]["ErrorMessage"]
+        return None
+
+    @staticmethod
+    def _response_export_data(format, surveyId, lastResponseId=None, limit=None, includedQuestionIds=None,
+                              useLabels=None):
+        """ Body of CreateResponseExport API call
+        """
+        data = {
+            "format": format,
+            "surveyId": surveyId
+        }
+        if lastResponseId is not None:
+            data["lastResponseId"] = lastResponseId
+        #     "startDate": startDate,
+        #     "endDate": endDate,
+        if limit is not None:
+            data["limit"] = limit
+        if isinstance(includedQuestionIds, STR):
+            includedQuestionIds = json.loads(includedQuestionIds)
+        if includedQuestionIds:
+            data["includedQuestionIds"] = includedQuestionIds
+        if useLabels is True:
+            data["useLabels"] = True
+        #     "decimalSeparator": decimalSeparator,
+        #     "seenUnansweredRecode": seenUnansweredRecode,
+        #     "useLocalTime": useLocalTime,
+        # }
+        return data
+
+    @staticmethod
+    def _set_column_indexes(CSV, kwargs):
+        """ importPanel and importContacts need column numbers of Email, FirstName, LastName and ExternalRef.
+        If CSV file has column headers (ColumnHeaders=1), compute them automatically (unless passed explicitly)
+        """
+        if kwargs.get("ColumnHeaders", None) == "1" or kwargs.get("ColumnHeaders", None) == 1:
+            if isinstance(CSV, CSVBody):
+                headers = CSV.fieldnames
+            elif sys.version_info >= (3, 0) and isinstance(CSV, bytes):
+                # Only the header row is decoded
+                headers = next(csv.reader(io.TextIOWrapper(BytesIO(CSV), encoding="utf-8-sig", newline="")))
+            else:
+                headers = next(csv.reader(StringIO(CSV)))
+            if headers and isinstance(headers[0], type(u"")) and headers[0].startswith(u"\ufeff"):
+                # Byte order mark of a decoded UTF-8 file
+                headers[0] = headers[0][1:]
+            if "Email" in headers and "Email" not in kwargs:
+                kwargs["Email"] = headers.index("Email") + 1
+            if "FirstName" in headers and "FirstName" not in kwargs:
+                kwargs["FirstName"] = headers.index("FirstName") + 1
+            if "LastName" in headers and "LastName" not in kwargs:
+                kwargs["LastName"] = headers.index("LastName") + 1
+            if "ExternalRef" in headers and "ExternalRef" not in kwargs:
+                kwargs["ExternalRef"] = headers.index("ExternalRef") + 1
+
+    @staticmethod
+    def _dicts_to_csv(rows, fieldnames, header_rows=1):
+        """ Convert list of dictionaries to CSV document (string)
+        """
+        fp = StringIO()
+        dictwriter = csv.DictWriter(fp, fieldnames=fieldnames)
+        for i in range(header_rows):
+            dictwriter.writeheader()
+        for row in rows:
+            dictwriter.writerow(row)
+        return fp.getvalue()
+
+    def _survey_link_prefix(self, SurveyID, DistributionID):
+        """ Unique survey link is this prefix followed by RecipientID. Returns None if IDs are not valid
+        """
+        if "_" not in SurveyID:
+            self.last_error_message = "Invalid SurveyID format (must be SV_xxxxxxxxxx)"
+            return None
+
+        if "_" not in DistributionID:
+            self.last_error_message = "Invalid DistributionID format (must be EMD_xxxxxxxxxx)"
+            return None
+
+        link = DistributionID.split("_")[1] + "_" + SurveyID.split("_")[1] + "_"
+        return "http://new.qualtrics.com/SE?Q_DL=%s" % link
+
+    def _parse_response_export_id(self, json_response):
+        """ Extract ID of the response export from CreateResponseExport response
+        """
+        try:
+            responseExportId = json_response["result"]["id"]
+        except Exception as e:
+            self.last_error_message = "Mailformed response from server: %s" % e
+            return None
+        self.last_error_message = None
+        return responseExportId
+
+    @staticmethod
+    def _response_export_file_url(responseExportId):
+        if "https://" in responseExportId:
+            return responseExportId
+        return "https://survey.qualtrics.com/API/v3/responseexports/%s/file" % responseExportId
+
+    def _parse_response_export_progress(self, json_response):
+        """ Extract status of the response export from GetResponseExportProgress response
+
+        :return: tuple (status, URL of the file or percentage)
+        """
+        try:
+            status = json_response["result"]["status"]
+
+            if status == "complete":
+                # Return URL to download the data
+                data = json_response["result"]["file"]
+            else:
+                # Return Percentage
+                data = json_response["result"]["percentComplete"]
+            self.last_error_message = None
+        except (ValueError, KeyError, TypeError) as e:
+            self.last_error_message = "Mailformed server response: %s" % e
+            return "servfail", self.last_error_message
+
+        return status, data
+
+    def _open_response_export_file(self, content):
+        """ Open the only file in response export zip archive as a text stream
+
+        :param content: zip archive (bytes)
+        :return: open file or None if content is not a zip archive
+        """
+        try:
+            # Python 3.5
+            iofile = BytesIO(content)
+        except:
+            # Python 2.7
+            iofile = StringIO(content)
+        try:
+            archive = zipfile.ZipFile(iofile)
+            # https://docs.python.org/2/library/zipfile.html#zipfile.ZipFile.namelist
+            # Assuming there is only one file in zip archive returned by Qualtrics
+            fh = archive.open(archive.namelist()[0], mode="r")
+
+            # Converting binary file stream to text stream, so it can be fed to csv module etc
+            # Note this may not work for large csv files that do not fit in memory
+            # Use Qualtrics.StreamResponseExportFile for such files
+            fp = io.TextIOWrapper(fh)
+        except BadZipfile as e:
+            self.last_error_message = str(e)
+            return None
+        self.last_error_message = None
+        return fp
+
+
+class Qualtrics(QualtricsBase):
+    """
+    This is representation of Qualtrics REST API
+
+    One Qualtrics object (and its connection pool) can be shared by many threads: last_error_message,
+    json_response and other debugging attributes are kept separately for every thread.
+    """
+    # Maximum size in bytes of CSV document uploaded by one importPanel or importContacts call (Qualtrics limits are
+    # approximately 8 and 50 megabytes). Larger documents are split
+    IMPORT_PANEL_MAX_SIZE = 7 * 1024 * 1024
+    IMPORT_CONTACTS_MAX_SIZE = 45 * 1024 * 1024
+
+    # Additional options passed to requests.get or request.post
+    # For example, to disable SSL certificate validations, set requests_kwargs to {"verify": False"}
+    # Can also be used to specify custom certificate and so on
+    # http://docs.python-requests.org/en/master/user/advanced/#ssl-cert-verification
+    requests_kwargs = dict()
+
+    def __init__(self, user=None, token=None, api_version="2.5", pool_connections=10, pool_maxsize=10,
+                 pool_block=False, keep_alive=True, rate_limit=None, rate_limit3=None, retry=None, lean=False,
+                 json_backend=None, response_cache=None, metadata_cache=None):
+        """
+        :param user: The user name. If omitted, value of environment variable QUALTRICS_USER will be used.
+        :param token: API token for the user. If omitted, value of environment variable QUALTRICS_TOKEN will be used.
+        :param api_version: API version to use (this library has been tested with version 2.5).
+        :param pool_connections: Number of per-host connection pools to cache (both v2 and v3 calls share them)
+        :param pool_maxsize: Maximum number of connections kept open to a single host
+        :param pool_block: If True, wait for a free connection instead of opening one above pool_maxsize
+        :param keep_alive: If False, every API call uses a new connection (behaviour of pyqualtrics <= 0.6.6)
+        :param rate_limit: Maximum number of v2 API calls (request) per second, or rate limiter object shared with
+        other Qualtrics objects (ratelimit.TokenBucket, or ratelimit.FileTokenBucket shared by several processes)
+        :param rate_limit3: Same for v3 API calls (request3)
+        :param retry: retry.RetryPolicy used to repeat API calls failed because of network errors, throttling or
+        server errors. If None, failed calls are not repeated
+        :param lean: If True, response and r attributes are not set, so no copies of response bodies
+        are kept after API call (json_response is still set), and raw body is released before it is parsed.
+        Reduces memory usage when large responses (getLegacyResponseData) are downloaded
+        :param json_backend: Name of JSON library used to decode responses (orjson, ujson or json, see jsonbackend
+        module). If None, the fastest installed library is used
+        :param response_cache: cache.ResponseCache (or path to its SQLite database) used by getResponse and
+        getSingleResponseHTML. Entries of a response are removed by updateResponseEmbeddedData
+        :param metadata_cache: cache.MetadataCache used by getSurveys, getSurvey, getPanels and getPanelMemberCount,
+        or True for MetadataCache with default settings. Entries are removed by calls changing surveys and panels
+        (importSurvey, activateSurvey, deleteSurvey, createPanel, deletePanel, addRecipient etc)
+        """
+        super(Qualtrics, self).__init__(user, token, api_version)
+        self.lean = lean
+        if json_backend is not None:
+            self.json_backend = jsonbackend.get_backend(json_backend)
+        # Qualtrics throttles API calls per token (HTTP 429). Limiters are shared by all threads using this object
+        self.rate_limiter = rate_limiter(rate_limit)
+        self.rate_limiter3 = rate_limiter(rate_limit3)
+        self.retry_policy = retry
+        if response_cache is not None and not isinstance(response_cache, ResponseCache):
+            response_cache = ResponseCache(response_cache)
+        self.response_cache = response_cache
+        if metadata_cache is True:
+            metadata_cache = MetadataCache()
+        self.metadata_cache = metadata_cache or None
+
+        # All API calls (v2 and v3) go through one requests.Session, so TCP connections and TLS sessions
+        # to survey.qualtrics.com are reused instead of being negotiated for every single call.
+        # http://docs.python-requests.org/en/master/user/advanced/#session-objects
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if not keep_alive:
+            self.session.headers["Connection"] = "close"
+
+    def close(self):
+        """ Close all pooled connections. The object can still be used after that, new connections will be opened
+        """
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _metadata(self, endpoint, params, fetch):
+        """ Result of fetch() (API call endpoint with params), from metadata_cache if possible.
+        Note that json_response and other last_* attributes are not updated if result comes from the cache
+        """
+        if self.metadata_cache is None:
+            return fetch()
+        value = self.metadata_cache.get(endpoint, params, fetch)
+        if value is not None:
+            self.last_error_message = None
+        return value
+
+    def _invalidate_metadata(self, endpoint, **params):
+        if self.metadata_cache is not None:
+            self.metadata_cache.invalidate(endpoint, **params)
+
+    def _paginate(self, fetch, page_size, cursor=None, prefetch=False):
+        """ Iterate over items of paginated API call using bulk.iter_pages.
+        fetch(cursor) should return tuple (list of items, next cursor) or raise PageError.
+        If API call fails, iteration stops and self.last_error_message is set
+        """
+        self.last_error_message = None
+        try:
+            for item in iter_pages(fetch, page_size, cursor=cursor, prefetch=prefetch):
+                yield item
+        except PageError as e:
+            self.last_error_message = str(e)
+
+    def _imap(self, func, iterable, workers, rate_limit):
+        """ Call func(item) for every item on a pool of worker threads.
+        Generator of (index, item, result, error) tuples, see bulk.imap_bounded
+        """
+        return imap_bounded(func, iterable, workers=workers, rate_limiter=rate_limiter(rate_limit))
+
+    def _body(self, r):
+        """ Body of the response passed to _process_response.
+        In lean mode the response is requested with stream=True and read here, so r does not keep the raw body
+        (r.content) while JSON is being parsed. Raw bytes are returned (JSON backends parse them without decoding
+        the whole document to str first)
+        """
+        if not self.lean:
+            return r.text
+        content = b"".join(r.iter_content(65536))
+        r.close()
+        return content
+
+    def _send(self, send, limiter, idempotent, retry=True):
+        """ Call send() (which returns requests.Response), repeating it according to self.retry_policy.
+        Sets self.last_retries. Exception raised by the last attempt is propagated to the caller
+
+        :param limiter: Rate limiter to acquire before every attempt (or None)
+        :param idempotent: False if repeating the call may have side effects
+        :param retry: False if the call can not be repeated (request body is a generator consumed by the first
+        attempt)
+        """
+        retry_policy = self.retry_policy if retry else None
+        self.last_retries = 0
+        while True:
+            if limiter is not None:
+                limiter.acquire()
+            try:
+                r = send()
+            except (ConnectionError, Timeout) as e:
+                if retry_policy is None:
+                    raise
+                # Only failure to connect guarantees that the server has not received the request
+                reason = getattr(e.args[0], "reason", None) if e.args else None
+                sent = not isinstance(e, ConnectTimeout) and not isinstance(reason, NewConnectionError)
+                delay = retry_policy.next_delay(self.last_retries + 1, idempotent, sent=sent)
+                if delay is None:
+                    raise
+            else:
+                if retry_policy is None:
+                    return r
+                delay = retry_policy.next_delay(self.last_retries + 1, idempotent, status=r.status_code,
+                                                retry_after=r.headers.get("Retry-After"))
+                if delay is None:
+                    return r
+                r.close()
+            time.sleep(delay)
+            self.last_retries += 1
+
+    def request3(self, url, method="post", stream=False, data=None):
+        data_json, headers = self._prepare_request3(url, data)
         try:
             if method == "post":
                 self.last_data = data
-                r = requests.post(url, data=data_json, headers=headers)
+                r = self._send(lambda: self.session.post(url, data=data_json, headers=headers,
+                                                         stream=stream or self.lean),
+                               self.rate_limiter3, idempotent=False)
             elif method == "get":
-                r = requests.get(url, headers=headers)
+                r = self._send(lambda: self.session.get(url, headers=headers, stream=stream or self.lean),
+                               self.rate_limiter3, idempotent=True)
             else:
                 raise NotImplementedError("method %s is not supported" % method)
         except (ConnectionError, Timeout, TooManyRedirects, HTTPError) as e:
@@ -133,27 +661,28 @@ class Qualtrics(object):
             # TooManyRedirects: If a request exceeds the configured number of maximum redirections, a TooManyRedirects exception is raised.
             self.last_error_message = str(e)
             return None
-        self.r = r
-        self.response = r.text   # Keep this for backward compatibility with previous versions
-        try:
-            self.json_response = r.json()
-        except:
-            self.json_response = None
-        if r.status_code != 200:
-            # HTTP server error: 404, 500 etc
-            # Apparently http code 401 Unauthorized is returned when incorrect token is provided
-            self.last_error_message = "HTTP Code %s" % r.status_code
-            try:
-                if "error" in self.json_response["meta"]:
-                    self.last_error_message = self.json_response["meta"]["error"]["errorMessage"]
-                    return None
-            except:
-                # Mailformed response from the server
-                pass
+        if stream and r.status_code == 200:
+            # Body will be consumed by the caller (r.iter_content etc), don't read it here
+            if not self.lean:
+                self.r = r
+            return r
+        if not self.lean:
+            self.r = r
+        if not self._process_response3(r.status_code, self._body(r)):
             return None
-
         return r
 
+    def call3(self, url, method="post", data=None):
+        """ Send GET or POST request to Qualtrics API v3.
+        Unlike request3, this function returns all information about the call, so it is convenient when
+        one Qualtrics object is used by many threads
+
+        :return: CallResult, body is parsed JSON response
+        """
+        started = time.time()
+        r = self.request3(url, method=method, data=data)
+        return self._call_result(self.json_response if r is not None else None, started)
+
     def CreateResponseExport(self, format, surveyId, lastResponseId=None, startDate=None, endDate=None, limit=None,
                              includedQuestionIds=None, useLabels=None, decimalSeparator=None, seenUnansweredRecode=None,
                              useLocalTime=None):
@@ -187,36 +716,14 @@ class Qualtrics(object):
         :return: ID of the response export for GetResponseExportProgress/GetResponseExportFile or None if error occurs
         """
         url = "https://survey.qualtrics.com/API/v3/responseexports"
-        data = {
-            "format": format,
-            "surveyId": surveyId
-        }
-        if lastResponseId is not None:
-            data["lastResponseId"] = lastResponseId
-        #     "startDate": startDate,
-        #     "endDate": endDate,
-        if limit is not None:
-            data["limit"] = limit
-        if isinstance(includedQuestionIds, STR):
-            includedQuestionIds = json.loads(includedQuestionIds)
-        if includedQuestionIds:
-            data["includedQuestionIds"] = includedQuestionIds
-        if useLabels is True:
-            data["useLabels"] = True
-        #     "decimalSeparator": decimalSeparator,
-        #     "seenUnansweredRecode": seenUnansweredRecode,
-        #     "useLocalTime": useLocalTime,
-        # }
+        data = self._response_export_data(format, surveyId, lastResponseId=lastResponseId, limit=limit,
+                                          includedQuestionIds=includedQuestionIds, useLabels=useLabels)
         response = self.request3(url, method="post", data=data)
         if response is None:
             return response
-        try:
-            responseExportId = response.json()["result"]["id"]
-        except Exception as e:
-            self.last_error_message = "Mailformed response from server: %s" % e
-            return None
-        self.response = response
-        self.last_error_message = None
+        responseExportId = self._parse_response_export_id(self.json_response)
+        if responseExportId is not None and not self.lean:
+            self.response = response
         return responseExportId
 
     def GetResponseExportProgress(self, responseExportId):
@@ -232,21 +739,7 @@ class Qualtrics(object):
         if response is None:
             # Server or network error
             return "servfail", self.last_error_message
-        try:
-            status = response.json()["result"]["status"]
-
-            if status == "complete":
-                # Return URL to download the data
-                data = response.json()["result"]["file"]
-            else:
-                # Return Percentage
-                data = response.json()["result"]["percentComplete"]
-            self.last_error_message = None
-        except (ValueError, KeyError, TypeError) as e:
-            self.last_error_message = "Mailformed server response: %s" % e
-            return "servfail", self.last_error_message
-
-        return status, data
+        return self._parse_response_export_progress(self.json_response)
 
     def GetResponseExportFile(self, responseExportId):
         """ Retrieve the response export file after the export is complete
@@ -255,35 +748,53 @@ class Qualtrics(object):
         :type responseExportId: str
         :return: open file, can be read using .read() function or passed to csv library etc
         """
-        if "https://" in responseExportId:
-            url = responseExportId
-        else:
-            url = "https://survey.qualtrics.com/API/v3/responseexports/%s/file" % responseExportId
-        response = self.request3(url, method="get")
+        url = self._response_export_file_url(responseExportId)
+        # Zip archive is not a JSON document, don't try to decode it
+        response = self.request3(url, method="get", stream=True)
         if response is None:
             return None
+        return self._open_response_export_file(response.content)
 
+    def StreamResponseExportFile(self, responseExportId, format=None, spool_dir=None, chunk_size=65536):
+        """ Retrieve the response export file after the export is complete and iterate over responses in it
+        without loading the file into memory. The zip archive is downloaded in chunks to a temporary file
+        (deleted when returned object is closed), responses are decompressed and parsed one at a time.
+        https://api.qualtrics.com/docs/get-response-export-file
+
+        Example:
+            with qualtrics.StreamResponseExportFile(url) as reader:
+                for response in reader:
+                    print(response["ResponseID"])
+            print(reader.bytes_downloaded, reader.rows_parsed)
+
+        :param responseExportId: The ID given to you after running your Response Export call or URL return by GetResponseExportProgress
+        :type responseExportId: str
+        :param format: Export format (csv, csv2013, json or xml). If None, it is guessed from file name in the archive
+        (additional CSV header rows are skipped only if format is specified)
+        :param spool_dir: Directory for the temporary file (default is system temporary directory)
+        :param chunk_size: Download chunk size in bytes
+        :return: export.ExportReader object or None if error occurs
+        """
+        url = self._response_export_file_url(responseExportId)
+        response = self.request3(url, method="get", stream=True)
+        if response is None:
+            return None
+        spool = tempfile.TemporaryFile(dir=spool_dir)
+        bytes_downloaded = 0
         try:
-            # Python 3.5
-            iofile = BytesIO(response.content)
-        except:
-            # Python 2.7
-            iofile = StringIO(response.content)
-        try:
-            archive = zipfile.ZipFile(iofile)
-            # https://docs.python.org/2/library/zipfile.html#zipfile.ZipFile.namelist
-            # Assuming there is only one file in zip archive returned by Qualtrics
-            fh = archive.open(archive.namelist()[0], mode="r")
-
-            # Converting binary file stream to text stream, so it can be fed to csv module etc
-            # Note this may not work for large csv files that do not fit in memory
-            # Not sure how typical is that with Qualtrics surveys, though
-            fp = io.TextIOWrapper(fh)
-        except BadZipfile as e:
+            for chunk in response.iter_content(chunk_size):
+                spool.write(chunk)
+                bytes_downloaded += len(chunk)
+            spool.seek(0)
+            reader = ExportReader(spool, bytes_downloaded=bytes_downloaded, format=format)
+        except (ConnectionError, Timeout, ChunkedEncodingError, BadZipfile, ValueError) as e:
+            spool.close()
             self.last_error_message = str(e)
             return None
+        finally:
+            response.close()
         self.last_error_message = None
-        return fp
+        return reader
 
     def DownloadResponseExportFile(self, responseExportId, filename):
         """ Download the response export file after the export is complete to the local file system
@@ -294,10 +805,7 @@ class Qualtrics(object):
         :type filename: str
         :return: True is success, None if error
         """
-        if "https://" in responseExportId:
-            url = responseExportId
-        else:
-            url = "https://survey.qualtrics.com/API/v3/responseexports/%s/file" % responseExportId
+        url = self._response_export_file_url(responseExportId)
         response = self.request3(url, method="get", stream=True)
         if response is None:
             return None
@@ -307,6 +815,112 @@ class Qualtrics(object):
                 fp.write(chunk)
         return True
 
+    def WaitForResponseExport(self, responseExportId, timeout=None, cancel=None, min_interval=0.5, max_interval=30):
+        """ Poll GetResponseExportProgress until the export is complete. Delay between status checks adapts to
+        the progress reported by Qualtrics (see polling.AdaptivePoller)
+
+        :param responseExportId: ID returned by CreateResponseExport
+        :param timeout: Give up after that many seconds (None - wait forever)
+        :param cancel: threading.Event (or any object with wait(seconds) and is_set() methods). Set it from another
+        thread to stop waiting
+        :param min_interval: Minimum delay between status checks, in seconds
+        :param max_interval: Maximum delay between status checks, in seconds
+        :return: URL of the export file or None if error occurs
+        """
+        poller = AdaptivePoller(min_interval=min_interval, max_interval=max_interval)
+        while True:
+            status, data = self.GetResponseExportProgress(responseExportId)
+            if status == "complete":
+                return data
+            if status == "servfail":
+                # last_error_message is set by GetResponseExportProgress
+                return None
+            if status != "in progress":
+                self.last_error_message = "Response export %s failed: status %s" % (responseExportId, status)
+                return None
+            delay = poller.next_delay(data)
+            if timeout is not None:
+                remaining = poller.started + timeout - time.time()
+                if remaining <= 0:
+                    self.last_error_message = "Response export %s did not complete in %s seconds" % (
+                        responseExportId, timeout)
+                    return None
+                delay = min(delay, remaining)
+            if cancel is not None:
+                cancel.wait(delay)
+                if cancel.is_set():
+                    self.last_error_message = "Response export %s was cancelled" % responseExportId
+                    return None
+            else:
+                time.sleep(delay)
+
+    def export_responses(self, surveyId, format="csv", filename=None, timeout=None, cancel=None, min_interval=0.5,
+                         max_interval=30, columnar=None, **kwargs):
+        """ Export responses using API v3: start the export, wait for it to complete and download the result.
+
+        Example:
+            with qualtrics.export_responses("SV_8pqqcl4sy2316ZF", format="json") as reader:
+                for response in reader:
+                    ...
+
+        :param surveyId: ID of the survey for which to export responses
+        :param format: Export format. Must be supported by ExportReader (csv, csv2013, json, xml),
+        unless filename is specified
+        :param filename: If specified, zip archive returned by Qualtrics is saved to this file
+        :param timeout: Give up if export is not complete after that many seconds
+        :param cancel: threading.Event, set it from another thread to cancel the export
+        :param min_interval: Minimum delay between status checks, in seconds
+        :param max_interval: Maximum delay between status checks, in seconds
+        :param columnar: If specified, responses are written to this typed columnar file (Parquet if pyarrow
+        is installed, see export.ExportReader.to_columnar) instead of being returned
+        :param kwargs: Additional parameters for CreateResponseExport (lastResponseId, limit, useLabels etc)
+        :return: export.ExportReader, filename if filename is specified or columnar.ColumnarWriter if columnar is
+        specified. None if error occurs
+        """
+        if filename is None and format not in PARSERS:
+            # Detect it before the export is created and downloaded
+            self.last_error_message = "Export format %s is not supported by ExportReader" % format
+            return None
+        responseExportId = self.CreateResponseExport(format, surveyId, **kwargs)
+        if responseExportId is None:
+            return None
+        url = self.WaitForResponseExport(responseExportId, timeout=timeout, cancel=cancel,
+                                         min_interval=min_interval, max_interval=max_interval)
+        if url is None:
+            return None
+        if filename is not None:
+            if not self.DownloadResponseExportFile(url, filename):
+                return None
+            return filename
+        reader = self.StreamResponseExportFile(url, format=format)
+        if reader is None or columnar is None:
+            return reader
+        with reader:
+            try:
+                return reader.to_columnar(columnar)
+            except (ValueError, OverflowError, IOError, OSError) as e:
+                self.last_error_message = str(e)
+                return None
+
+    def export_surveys(self, surveyIds, target_dir, format="csv", max_concurrency=8, timeout=None, unzip=True,
+                       **kwargs):
+        """ Export responses of many surveys concurrently to target_dir (see export.ExportOrchestrator)
+
+        :param surveyIds: list of Survey IDs
+        :param target_dir: Directory for downloaded files. Responses of each survey are saved to <SurveyID>.<format>
+        (or <SurveyID>.zip if unzip is False). Summary is saved to manifest.json
+        :param format: Export format
+        :param max_concurrency: Maximum number of API calls and downloads running at the same time
+        :param timeout: Exports not completed in that many seconds are reported as failed
+        :param unzip: Extract downloaded zip archives
+        :param kwargs: Additional parameters for CreateResponseExport (useLabels, limit etc)
+        and ExportOrchestrator (min_interval, max_interval)
+        :return: manifest: status, error message, file name and time spent in each phase for every survey
+        """
+        orchestrator = ExportOrchestrator(self, target_dir, format=format, max_concurrency=max_concurrency,
+                                          timeout=timeout, unzip=unzip, **kwargs)
+        return orchestrator.run(surveyIds)
+
     def request(self, Request, Product='RS', post_data=None, post_files=None, **kwargs):
         """ Send GET or POST request to Qualtrics API using v2.x format
         https://survey.qualtrics.com/WRAPI/ControlPanel/docs.php#overview_2.5
@@ -319,61 +933,33 @@ class Qualtrics(object):
         :param kwargs: Additional parameters for this API Call (LibraryID="abd", PanelID="123")
         :return: None if request failed
         """
-        Version = kwargs.pop("Version", self.default_api_version)
-        # Version must be a string, not an integer or float
-        assert Version, STR
-
-        # Handling for Multi Product API calls
-        if self.url:
-            # Force URL, for use in unittests.
-            url = self.url
-        elif Product == 'RS':
-            url = "https://survey.qualtrics.com/WRAPI/ControlPanel/api.php"
-        elif Product == 'TA':
-            url = "https://survey.qualtrics.com/WRAPI/Contacts/api.php"
-        else:
-            raise NotImplementedError('Please specify a valid product api')
-
-        # Special case for handling embedded data
-        ed = kwargs.pop("ED", None)
-
-        # http://stackoverflow.com/questions/38987/how-can-i-merge-two-python-dictionaries-in-a-single-expression
-        params = {"User": self.user,
-                       "Token": self.token,
-                       "Format": "JSON",
-                       "Version": Version,
-                       "Request": Request,
-                       }
-        # Python 2 and 3 compatible dictionary merge
-        for item in kwargs:
-            params[item] = kwargs[item]
-
-        # Format embedded data properly,
-        # Example: ED[SubjectID]=CLE10235&ED[Zip]=74534
-        if ed is not None:
-            for key in ed:
-                params["ED[%s]" % key] = ed[key]
+        url, params = self._prepare_request(Request, Product, kwargs)
 
-        self.json_response = None
-        self.last_error_message = "Not yet set by request function"
-        self.last_status_code = None
-        try:
+        def send():
             if post_data:
-                r = requests.post(url,
-                                  data=post_data,
-                                  params=params,
-                                  **self.requests_kwargs)
+                return self.session.post(url,
+                                         data=post_data,
+                                         params=params,
+                                         stream=self.lean,
+                                         **self.requests_kwargs)
             elif post_files:
-                r = requests.post(url,
-                                  files=post_files,
-                                  params=params,
-                                  **self.requests_kwargs)
+                return self.session.post(url,
+                                         files=post_files,
+                                         params=params,
+                                         stream=self.lean,
+                                         **self.requests_kwargs)
             else:
-                r = requests.get(
+                return self.session.get(
                     url,
                     params=params,
+                    stream=self.lean,
                     **self.requests_kwargs
                 )
+
+        try:
+            # Body made of a generator is consumed by the first attempt, repeating the call would send it empty
+            r = self._send(send, self.rate_limiter, idempotent=Request not in NON_IDEMPOTENT,
+                           retry=replayable(post_data))
         except (ConnectionError, Timeout, TooManyRedirects, HTTPError) as e:
             # http://docs.python-requests.org/en/master/user/quickstart/#errors-and-exceptions
             # ConnectionError: In the event of a network problem (e.g. DNS failure, refused connection, etc) Requests will raise a ConnectionError exception.
@@ -385,61 +971,25 @@ class Qualtrics(object):
             self.last_error_message = str(e)
             return None
 
-        self.last_url = r.url
-        self.response = r.text
-        self.last_status_code = r.status_code
-        if r.status_code == 403:
-            self.last_error_message = "API Error: HTTP Code %s (Forbidden)" % r.status_code
-            return None
-        if r.status_code == 401 and Request == "getSurvey":
-            # I'm don't know if 401 is returned for requests other than getSurvey
-            self.last_error_message = "API Error: HTTP Code %s (Unauthorized)" % r.status_code
-            return None
-
-        try:
-            if Request == "getLegacyResponseData":
-                # Preserve order of responses and fields in each response using OrderedDict
-                json_response = json.loads(r.text, object_pairs_hook=collections.OrderedDict)
-            else:
-                # Don't not use OrderedDict for simplicity.
-                json_response = json.loads(r.text)
-        except ValueError:
-            # If the data being deserialized is not a valid JSON document, a ValueError will be raised.
-            self.json_response = None
-            if "Format" not in kwargs:
-                self.last_error_message = "Unexpected response from Qualtrics: not a JSON document"
-                return None
-            else:
-                # Special case - getSurvey. That request has a custom response format (xml).
-                # It does not follow the default response format
-                self.last_error_message = None
-                return r.text
+        return self._process_response(Request, kwargs, r.status_code, self._body(r), r.url)
 
-        self.json_response = json_response
-        # Sanity check.
-        if (Request == "getLegacyResponseData" or Request == "getPanel" or Request == 
-            "getListContacts") and "Meta" not in json_response:
-            # Special cases - getLegacyResponseData, getPanel and getListContacts
-            # Success
-            self.last_error_message = None
-            return json_response
-        if "Meta" not in json_response:
-            # Should never happen
-            self.last_error_message = "Unexpected response from Qualtrics: no Meta key in JSON response"
-            return None
-        if "Status" not in json_response["Meta"]:
-            # Should never happen
-            self.last_error_message = "Unexpected response from Qualtrics: no Status key in JSON response"
-            return None
+    def call(self, Request, Product='RS', post_data=None, post_files=None, **kwargs):
+        """ Send GET or POST request to Qualtrics API using v2.x format.
+        Unlike request, this function returns all information about the call, so it is convenient when
+        one Qualtrics object is used by many threads
 
-        if json_response["Meta"]["Status"] == "Success":
-            self.last_error_message = None
-            return json_response
+        Example:
+            result = qualtrics.call("getPanelMemberCount", LibraryID="UR_123", PanelID="ML_123")
+            if result.ok:
+                print(result.body["Result"]["Count"])
+            else:
+                print("Error: %s" % result.error)
 
-        # If error happens, it returns JSON object too
-        # Error message is in json_response["Meta"]["ErrorMessage"]
-        self.last_error_message = json_response["Meta"]["ErrorMessage"]
-        return None
+        :return: CallResult, body is the value returned by request
+        """
+        started = time.time()
+        body = self.request(Request, Product=Product, post_data=post_data, post_files=post_files, **kwargs)
+        return self._call_result(body, started)
 
     def createPanel(self, LibraryID, Name, **kwargs):
         """ Creates a new Panel in the Qualtrics System and returns the id of the new panel
@@ -451,6 +1001,7 @@ class Qualtrics(object):
         """
         if self.request("createPanel", LibraryID=LibraryID, Name=Name, **kwargs) is None:
             return None
+        self._invalidate_metadata("getPanels", LibraryID=LibraryID)
         return self.json_response["Result"]["PanelID"]
 
     def deletePanel(self, LibraryID, PanelID, **kwargs):
@@ -463,6 +1014,8 @@ class Qualtrics(object):
         """
         if self.request("deletePanel", LibraryID=LibraryID, PanelID=PanelID, **kwargs) is None:
             return False
+        self._invalidate_metadata("getPanels", LibraryID=LibraryID)
+        self._invalidate_metadata("getPanelMemberCount", LibraryID=LibraryID, PanelID=PanelID)
         return True
 
     def getPanelMemberCount(self, LibraryID, PanelID, **kwargs):
@@ -473,9 +1026,13 @@ class Qualtrics(object):
         :param kwargs: Additional parameters (used by unittest)
         :return: The Number of members
         """
-        if self.request("getPanelMemberCount", LibraryID=LibraryID, PanelID=PanelID, **kwargs) is None:
-            return None
-        return int(self.json_response["Result"]["Count"])
+        def fetch():
+            if self.request("getPanelMemberCount", LibraryID=LibraryID, PanelID=PanelID, **kwargs) is None:
+                return None
+            return int(self.json_response["Result"]["Count"])
+
+        params = dict(kwargs, LibraryID=LibraryID, PanelID=PanelID)
+        return self._metadata("getPanelMemberCount", params, fetch)
 
     def addRecipient(self, LibraryID, PanelID, FirstName, LastName, Email, ExternalDataRef, Language, ED):
         """ Add a new recipient to a panel
@@ -501,8 +1058,53 @@ class Qualtrics(object):
                             Language=Language,
                             ED=ED):
             return None
+        self._invalidate_metadata("getPanelMemberCount", LibraryID=LibraryID, PanelID=PanelID)
         return self.json_response["Result"]["RecipientID"]
 
+    def iterAddRecipients(self, LibraryID, PanelID, recipients, workers=4, rate_limit=None):
+        """ Add many recipients to a panel using several concurrent addRecipient calls.
+        Results are returned as soon as they are available (not in input order), so the caller can
+        record progress while the rest of the recipients are being added.
+
+        :param LibraryID: The library the recipients belong to
+        :param PanelID: The panel to add the recipients
+        :param recipients: Iterable of dictionaries with FirstName, LastName, Email, ExternalDataRef, Language and
+        ED (embedded data dictionary) keys. Missing keys are not sent to Qualtrics
+        :param workers: Number of concurrent API calls
+        :param rate_limit: Maximum number of API calls per second (None - unlimited)
+        :return: generator of (index, recipient, RecipientID, error message) tuples. index is position of
+        recipient in recipients, RecipientID is None if error occurs
+        """
+        def add(recipient):
+            recipient_id = self.addRecipient(LibraryID,
+                                               PanelID,
+                                               FirstName=recipient.get("FirstName"),
+                                               LastName=recipient.get("LastName"),
+                                               Email=recipient.get("Email"),
+                                               ExternalDataRef=recipient.get("ExternalDataRef"),
+                                               Language=recipient.get("Language"),
+                                               ED=recipient.get("ED"))
+            return recipient_id, self.last_error_message
+
+        for index, recipient, result, error in self._imap(add, recipients, workers, rate_limit):
+            if error is not None:
+                yield index, recipient, None, str(error)
+            else:
+                yield (index, recipient) + result
+
+    def addRecipients(self, LibraryID, PanelID, recipients, workers=4, rate_limit=None):
+        """ Add many recipients to a panel using several concurrent addRecipient calls.
+        See iterAddRecipients for description of parameters
+
+        :return: list of (RecipientID, error message) tuples, in the same order as recipients.
+        RecipientID is None if recipient was not added
+        """
+        results = {}
+        for index, recipient, recipient_id, error in self.iterAddRecipients(LibraryID, PanelID, recipients,
+                                                                            workers=workers, rate_limit=rate_limit):
+            results[index] = (recipient_id, error)
+        return [results[index] for index in range(len(results))]
+
     def getRecipient(self, LibraryID, RecipientID):
         """Get a representation of the recipient and their history
         https://survey.qualtrics.com/WRAPI/ControlPanel/docs.php#getRecipient_2.5
@@ -525,6 +1127,7 @@ class Qualtrics(object):
         """
         if not self.request("removeRecipient", LibraryID=LibraryID, PanelID=PanelID, RecipientID=RecipientID, **kwargs):
             return False
+        self._invalidate_metadata("getPanelMemberCount", LibraryID=LibraryID, PanelID=PanelID)
         return True
 
     def sendSurveyToIndividual(self, **kwargs):
@@ -651,19 +1254,23 @@ class Qualtrics(object):
         :return: ordered dictionary of surveys. {survey_id:metadata}
         :rtype dict:
         """
-        response = self.request("getSurveys", **kwargs)
-        # print response
-        surveys = None
-        if response:
-            surveys = OrderedDict()
-            for survey in response["Result"]["Surveys"]:
-                surveys[survey['SurveyID']] = survey
-        return surveys
+        def fetch():
+            response = self.request("getSurveys", **kwargs)
+            # print response
+            surveys = None
+            if response:
+                surveys = OrderedDict()
+                for survey in response["Result"]["Surveys"]:
+                    surveys[survey['SurveyID']] = survey
+            return surveys
+
+        return self._metadata("getSurveys", kwargs, fetch)
 
     def getSurvey(self, SurveyID):
         # Good luck dealing with XML
         # Response does not include answers though
-        return self.request("getSurvey", SurveyID=SurveyID, Format=None)
+        return self._metadata("getSurvey", {"SurveyID": SurveyID},
+                              lambda: self.request("getSurvey", SurveyID=SurveyID, Format=None))
 
     def importSurvey(self, ImportFormat, Name, Activate=None, URL=None, FileContents=None, OwnerID=None, **kwargs):
         """
@@ -692,6 +1299,7 @@ class Qualtrics(object):
              **kwargs
         )
         if result is not None:
+            self._invalidate_metadata("getSurveys")
             return result["Result"]["SurveyID"]
 
     def deleteSurvey(self, SurveyID, **kwargs):
@@ -704,6 +1312,10 @@ class Qualtrics(object):
         :return:
         """
         if self.request("deleteSurvey", SurveyID=SurveyID) is not None:
+            if self.response_cache is not None:
+                self.response_cache.invalidate(SurveyID)
+            self._invalidate_metadata("getSurveys")
+            self._invalidate_metadata("getSurvey", SurveyID=SurveyID)
             return True
         return False
 
@@ -714,6 +1326,8 @@ class Qualtrics(object):
         :return:
         """
         if self.request("activateSurvey", SurveyID=SurveyID, **kwargs):
+            self._invalidate_metadata("getSurveys")
+            self._invalidate_metadata("getSurvey", SurveyID=SurveyID)
             return True
         return False
 
@@ -724,6 +1338,8 @@ class Qualtrics(object):
         :return:
         """
         if self.request("deactivateSurvey", SurveyID=SurveyID, **kwargs):
+            self._invalidate_metadata("getSurveys")
+            self._invalidate_metadata("getSurvey", SurveyID=SurveyID)
             return True
         return False
 
@@ -746,14 +1362,40 @@ class Qualtrics(object):
             PanelID=None,
             ResponsesInProgress=None,
             LocationData=None,
+            columnar=False,
             **kwargs):
         """ Returns all of the response data for a survey in the original (legacy) data format.
         https://survey.qualtrics.com/WRAPI/ControlPanel/docs.php#getLegacyResponseData_2.5
 
         :param SurveyID:    The survey you will be getting the responses for.
+        :param columnar: If True, responses are parsed incrementally (see streamLegacyResponseData) into
+        columnar.ColumnarResponses, read-only mapping which uses much less memory than OrderedDict of OrderedDicts
         :param kwargs: Additional parameters allowed by getLegacyResponseData API call
-        :return:
+        :return: OrderedDict (or ColumnarResponses) of responses, None if error occurs
         """
+        if columnar:
+            responses = ColumnarResponses.from_items(self.streamLegacyResponseData(
+                SurveyID,
+                LastResponseID=LastResponseID,
+                Limit=Limit,
+                ResponseID=ResponseID,
+                ResponseSetID=ResponseSetID,
+                SubgroupID=SubgroupID,
+                StartDate=StartDate,
+                EndDate=EndDate,
+                Questions=Questions,
+                Labels=Labels,
+                ExportTags=ExportTags,
+                ExportQuestionIDs=ExportQuestionIDs,
+                LocalTime=LocalTime,
+                UnansweredRecode=UnansweredRecode,
+                PanelID=PanelID,
+                ResponsesInProgress=ResponsesInProgress,
+                LocationData=LocationData,
+                **kwargs))
+            if self.last_error_message is not None:
+                return None
+            return responses
         return self.request(
             "getLegacyResponseData",
             SurveyID=SurveyID,
@@ -775,6 +1417,101 @@ class Qualtrics(object):
             LocationData=LocationData,
             **kwargs)
 
+    def streamLegacyResponseData(self, SurveyID, chunk_size=65536, **kwargs):
+        """ Iterate over responses to a survey, parsing response of one getLegacyResponseData API call
+        incrementally, as it is received from the server. Only one response is kept in memory at a time,
+        order of fields in each response is preserved.
+        If an API call fails (even after some responses have been returned), iteration stops and
+        last_error_message is set
+
+        Example:
+            for response_id, response in qualtrics.streamLegacyResponseData("SV_8pqqcl4sy2316ZF"):
+                print(response_id + " : " + response["Finished"])
+            if qualtrics.last_error_message:
+                print("Error: %s" % qualtrics.last_error_message)
+
+        :param SurveyID: The survey you will be getting the responses for.
+        :param chunk_size: Number of bytes read from the connection at once
+        :param kwargs: Additional parameters allowed by getLegacyResponseData API call
+        :return: generator of (ResponseID, response) tuples, response is an OrderedDict
+        """
+        kwargs["SurveyID"] = SurveyID
+        url, params = self._prepare_request("getLegacyResponseData", "RS", kwargs)
+        try:
+            r = self._send(lambda: self.session.get(url, params=params, stream=True, **self.requests_kwargs),
+                           self.rate_limiter, idempotent=True)
+        except (ConnectionError, Timeout, TooManyRedirects, HTTPError) as e:
+            self.last_url = ""
+            self.response = None
+            self.last_error_message = str(e)
+            return
+        try:
+            if r.status_code != 200:
+                self._process_response("getLegacyResponseData", kwargs, r.status_code, r.text, r.url)
+                return
+            self.last_url = r.url
+            self.last_status_code = r.status_code
+            # Let urllib3 decompress gzip-encoded body
+            r.raw.decode_content = True
+            for response_id, response in iter_json_items(r.raw, object_pairs_hook=collections.OrderedDict,
+                                                         chunk_size=chunk_size):
+                if response_id == "Meta":
+                    # Error is returned as {"Meta": {"Status": "Error", "ErrorMessage": "..."}}
+                    self.last_error_message = response.get("ErrorMessage",
+                                                           "Unexpected response from Qualtrics: Meta key in "
+                                                           "JSON response")
+                    return
+                yield response_id, response
+            self.last_error_message = None
+        except ValueError as e:
+            self.last_error_message = "Unexpected response from Qualtrics: %s" % e
+        except (ConnectionError, ChunkedEncodingError, ProtocolError, ReadTimeoutError) as e:
+            # r.raw is read directly, so urllib3 exceptions are not wrapped by requests
+            self.last_error_message = str(e)
+        finally:
+            r.close()
+
+    def iterLegacyResponseData(self, SurveyID, page_size=1000, prefetch=False, LastResponseID=None, **kwargs):
+        """ Iterate over responses to a survey. Responses are requested page by page (using Limit and
+        LastResponseID parameters of getLegacyResponseData), so memory usage is bounded by the page size.
+        If an API call fails, iteration stops and last_error_message is set
+
+        Example:
+            for response_id, response in qualtrics.iterLegacyResponseData("SV_8pqqcl4sy2316ZF", prefetch=True):
+                print(response_id + " : " + response["Finished"])
+            if qualtrics.last_error_message:
+                print("Error: %s" % qualtrics.last_error_message)
+
+        :param SurveyID: The survey you will be getting the responses for.
+        :param page_size: Number of responses requested by one API call
+        :param prefetch: If True, next page is downloaded in background thread while the current one is processed
+        :param LastResponseID: Start with the response following this one
+        :param kwargs: Additional parameters allowed by getLegacyResponseData API call
+        :return: generator of (ResponseID, response) tuples
+        """
+        def fetch(cursor):
+            page = self.getLegacyResponseData(SurveyID, LastResponseID=cursor, Limit=page_size, **kwargs)
+            if page is None:
+                raise PageError(self.last_error_message)
+            items = list(page.items())
+            return items, items[-1][0] if items else cursor
+
+        return self._paginate(fetch, page_size, cursor=LastResponseID, prefetch=prefetch)
+
+    def sync_responses(self, SurveyID, dataset_path, store, page_size=1000, **kwargs):
+        """ Append responses received since the previous call to a local JSON Lines file (one response per line).
+        Only new responses are downloaded (see sync.ResponseSync)
+
+        :param SurveyID: The survey you will be getting the responses for.
+        :param dataset_path: JSON Lines file, created if does not exist
+        :param store: Where to keep position of the last synchronized response:
+        sync.JSONCheckpointStore("checkpoints.json") or sync.SQLiteCheckpointStore("checkpoints.db")
+        :param page_size: Number of responses requested by one API call, checkpoint is saved after every page
+        :param kwargs: Additional parameters for getLegacyResponseData (Labels, ExportTags etc)
+        :return: Number of new responses or None if error occurs
+        """
+        return ResponseSync(self, store).sync(SurveyID, dataset_path, page_size=page_size, **kwargs)
+
     def getResponse(self, SurveyID, ResponseID, **kwargs):
         """ Get data for a single response ResponseID in SurveyID. SurveyID is required by API
         Refer to https://survey.qualtrics.com/WRAPI/ControlPanel/docs.php#getLegacyResponseData_2.5 for additional
@@ -788,7 +1525,14 @@ class Qualtrics(object):
         {u'Status': u'0', u'StartDate': u'2015-10-23 10:59:12', u'Q1': 2, u'Q2': 1, u'EndDate': u'2015-10-23 10:59:23',
         u'Name': u'Freeborni, Anopheles', u'IPAddress': u'129.74.236.110', u'Q3': 2, u'ExternalDataReference': u'',
         u'Finished': u'1', u'EmailAddress': u'pyqualtrics+2@gmail.com', u'ResponseSet': u'Default Response Set'}
+
+        If response_cache is set, response is returned from the cache when possible
         """
+        if self.response_cache is not None:
+            cached = self.response_cache.get(SurveyID, ResponseID, "response", kwargs)
+            if cached is not None:
+                self.last_error_message = None
+                return cached
         response = self.getLegacyResponseData(SurveyID=SurveyID, ResponseID=ResponseID, **kwargs)
         # Don't do "if not response:" - because getLegacyResponseData can return empty dict in some cases
         if response is None:
@@ -797,6 +1541,8 @@ class Qualtrics(object):
             # Should never happen
             self.last_error_message = "Qualtrics error: ResponseID %s not in response (probably deleted)" % ResponseID
             return None
+        if self.response_cache is not None:
+            self.response_cache.set(SurveyID, ResponseID, "response", kwargs, response[ResponseID])
         return response[ResponseID]
 
     def importResponses(self, SurveyID,
@@ -845,12 +1591,17 @@ class Qualtrics(object):
         """ Import responses from a python dictionary
         Refer to https://survey.qualtrics.com/WRAPI/ControlPanel/docs.php#importResponses_2.5 for additional info
 
+        The CSV document is encoded and uploaded incrementally (chunked request body), so responses can be
+        a generator of any length. A generator can be uploaded only once, so such calls are not repeated by
+        the retry policy (pass a list to allow retries).
+
         :param SurveyID:
-        :param responses: list of responses. Each response is represented as a dictionary
+        :param responses: list (or any iterable) of responses. Each response is represented as a dictionary
             [
             {"ResponseID": "R_1234", ...},
             {"ResponseID": "R_1235", "Finished": "1", ...},
             ]
+        Columns are the keys of the first response
         :param ResponseSetID: The ID of the response set the responses will be placed in.
         :param Delimiter: Separate values by this character. Default is , (comma)
         :param Enclosure: Allows a value to contain the delimiter. Default is " (quote)
@@ -859,27 +1610,24 @@ class Qualtrics(object):
         :param kwargs: Additional parameters
         :return:
         """
-        assert(isinstance(responses, list))
-        if len(responses) < 1:
+        headers, responses = peek_fieldnames(responses)
+        if headers is None:
             return True
-        headers = responses[0].keys()
-        fp = StringIO()
-        dictwriter = csv.DictWriter(fp, fieldnames=headers)
-        dictwriter.writeheader()
-        dictwriter.writeheader()
-        for response in responses:
-            dictwriter.writerow(response)
-
-        contents = fp.getvalue()
-        return self.importResponses(
-            SurveyID=SurveyID,
-            ResponseSetID=ResponseSetID,
-            Delimiter=Delimiter,
-            Enclosure=Enclosure,
-            IgnoreValidation=IgnoreValidation,
-            DecimalFormat=DecimalFormat,
-            FileContents=contents,
-            **kwargs)
+        # Legacy response format has two header rows (column names and question texts)
+        contents = CSVBody(responses, headers, header_rows=2)
+        # Without FileURL and FileContents, importResponses reads the file from request body
+        if not self.request(
+                "importResponses",
+                SurveyID=SurveyID,
+                ResponseSetID=ResponseSetID,
+                Delimiter=Delimiter,
+                Enclosure=Enclosure,
+                IgnoreValidation=IgnoreValidation,
+                DecimalFormat=DecimalFormat,
+                post_data=contents,
+                **kwargs):
+            return False
+        return True
 
     def updateResponseEmbeddedData(self, SurveyID, ResponseID, ED, **kwargs):
         """
@@ -899,8 +1647,28 @@ class Qualtrics(object):
                 ED=ED,
                 **kwargs):
             return False
+        if self.response_cache is not None:
+            self.response_cache.invalidate(SurveyID, ResponseID)
         return True
 
+    def updateResponsesEmbeddedData(self, SurveyID, updates, workers=4, rate_limit=None, batch_size=10000,
+                                    journal=None):
+        """ Update embedded data of many responses using concurrent updateResponseEmbeddedData calls.
+        Updates of the same response within a batch are merged, outcomes can be recorded in a journal, so an
+        interrupted run can be repeated without setting fields to the same values again (see updates module)
+
+        :param SurveyID: The survey ID of the responses
+        :param updates: Iterable of (ResponseID, embedded data dictionary) tuples
+        :param workers: Number of concurrent API calls
+        :param rate_limit: Maximum number of API calls per second (None - unlimited)
+        :param batch_size: Number of updates read (and merged) at once
+        :param journal: JSON Lines file with outcome of every update (None - no journal)
+        :return: tuple (number of successful updates, list of (ResponseID, error message) tuples)
+        """
+        updater = EmbeddedDataUpdater(self, SurveyID, workers=workers, rate_limit=rate_limit,
+                                      batch_size=batch_size, journal=journal)
+        return updater.run(updates)
+
     def getPanels(self, LibraryID):
         """ This request returns all the panels contained in the library
 
@@ -909,10 +1677,13 @@ class Qualtrics(object):
         :param LibraryID: The id of the library that contains the panels
         :return:
         """
-        response = self.request("getPanels", LibraryID=LibraryID)
-        if not response:
-            return None
-        return response["Result"]["Panels"]
+        def fetch():
+            response = self.request("getPanels", LibraryID=LibraryID)
+            if not response:
+                return None
+            return response["Result"]["Panels"]
+
+        return self._metadata("getPanels", {"LibraryID": LibraryID}, fetch)
 
     def getPanel(self, LibraryID, PanelID, EmbeddedData=None, LastRecipientID=None, NumberOfRecords=None,
                  ExportLanguage=None, Unsubscribed=None, Subscribed=None, **kwargs):
@@ -941,37 +1712,138 @@ class Qualtrics(object):
             **kwargs
         )
 
+    def iterPanel(self, LibraryID, PanelID, page_size=1000, prefetch=False, LastRecipientID=None, **kwargs):
+        """ Iterate over panel members. Members are requested page by page (using NumberOfRecords and
+        LastRecipientID parameters of getPanel), so memory usage is bounded by the page size.
+        If an API call fails, iteration stops and last_error_message is set
+
+        :param LibraryID: The library id for this panel
+        :param PanelID: The panel id you want to export
+        :param page_size: Number of panel members requested by one API call
+        :param prefetch: If True, next page is downloaded in background thread while the current one is processed
+        :param LastRecipientID: Start with the panel member following this one
+        :param kwargs: Additional parameters allowed by getPanel API call (EmbeddedData, Subscribed etc)
+        :return: generator of panel members (dictionaries)
+        """
+        def fetch(cursor):
+            members = self.getPanel(LibraryID, PanelID, LastRecipientID=cursor, NumberOfRecords=page_size,
+                                      **kwargs)
+            if members is None:
+                raise PageError(self.last_error_message)
+            return members, members[-1]["RecipientID"] if members else cursor
+
+        return self._paginate(fetch, page_size, cursor=LastRecipientID, prefetch=prefetch)
+
+    def _import_csv(self, CSV, kwargs, max_size, workers, id_param, upload):
+        """ Upload CSV document (importPanel, importContacts) in parts of at most max_size bytes
+        (see csvstream.split_csv). upload(part, params) sends one part and returns Result of the API call
+        (None if error occurs). The first part creates the panel (list), the others are appended to it by
+        concurrent calls with id_param=ID, where ID is result[id_param] of the first part
+
+        :return: tuple (ID, failures, results). failures: see import_panel. results: Result of every part
+        (None for failed parts), in order of parts
+        """
+        self._set_column_indexes(CSV, kwargs)
+        header = kwargs.get("ColumnHeaders", None) in ("1", 1)
+        parts = split_csv(CSV, max_size, header=header)
+        first = upload(next(parts), kwargs)
+        if first is None:
+            return None, [(0, self.last_error_message)], [None]
+        ID = first[id_param]
+        params = dict(kwargs)
+        params[id_param] = ID
+
+        def append(part):
+            result = upload(part, params)
+            return result, self.last_error_message if result is None else None
+
+        failures = []
+        # Parts are completed out of order
+        results = {0: first}
+        for index, part, outcome, error in self._imap(append, parts, workers, None):
+            result, message = outcome if error is None else (None, str(error))
+            results[index + 1] = result
+            if message is not None:
+                failures.append((index + 1, message))
+        failures.sort()
+        return ID, failures, [results[index] for index in sorted(results)]
+
+    @staticmethod
+    def _parts_error(failures):
+        """ Error message of failed parts of an import (see import_panel)
+        """
+        return "; ".join("Part %s: %s" % failure for failure in failures)
+
+    def import_panel(self, LibraryID, Name, CSV, max_size=None, workers=2, **kwargs):
+        """ Import CSV document of any size as a new panel (or append it to PanelID).
+        Document larger than max_size is split into parts on row boundaries (column headers, if ColumnHeaders=1,
+        are repeated in every part). The first part creates the panel, the others are appended to it by
+        concurrent importPanel calls. Up to 2 * workers parts are kept in memory.
+
+        :param LibraryID:
+        :param Name:
+        :param CSV: contents of CSV file to be imported (string or csvstream.CSVBody)
+        :param max_size: Maximum size of one part in bytes (default is IMPORT_PANEL_MAX_SIZE)
+        :param workers: Number of parts uploaded concurrently
+        :param kwargs: Additional parameters for importPanel API call
+        :return: tuple (PanelID, failures). PanelID is None if panel could not be created. failures is a list
+        of (part number, error message) tuples, part 0 is the first one
+        """
+        def upload(part, params):
+            result = self.request("importPanel", post_data=part, LibraryID=LibraryID, Name=Name, **params)
+            if result is None:
+                return None
+            return result["Result"]
+
+        PanelID, failures, _ = self._import_csv(CSV, kwargs, max_size or self.IMPORT_PANEL_MAX_SIZE, workers,
+                                                "PanelID", upload)
+        if PanelID is not None:
+            self._invalidate_metadata("getPanels", LibraryID=LibraryID)
+            self._invalidate_metadata("getPanelMemberCount", LibraryID=LibraryID, PanelID=PanelID)
+        return PanelID, failures
+
     def importPanel(self, LibraryID, Name, CSV, **kwargs):
         """ Imports a csv file as a new panel (optionally it can append to a previously made panel) into the database
         and returns the panel id.  The csv file can be posted (there is an approximate 8 megabytes limit)  or a url can
         be given to retrieve the file from a remote server.
         The csv file must be comma separated using " for encapsulation.
+        Larger files are split and uploaded in several calls, see import_panel.
 
         https://survey.qualtrics.com/WRAPI/ControlPanel/docs.php#importPanel_2.5
 
         :param LibraryID:
         :param Name:
-        :param CSV: contents of CSV file to be imported
-        :return:
+        :param CSV: contents of CSV file to be imported (string or csvstream.CSVBody)
+        :param kwargs: Additional parameters for API call and import_panel (max_size, workers)
+        :return: PanelID, None if error occurs (in any part of the file)
         """
+        PanelID, failures = self.import_panel(LibraryID, Name, CSV, **kwargs)
+        if failures:
+            self.last_error_message = self._parts_error(failures)
+            return None
+        return PanelID
+
+    def import_contacts(self, LibraryID, Name, CSV, max_size=None, workers=2, **kwargs):
+        """ Import CSV document of any size as a new contact list (or append it to ListID).
+        Document larger than max_size is split into parts on row boundaries, see import_panel. Every part is
+        imported by a separate importContacts call and a separate import job: the import is complete when jobs of
+        all parts are complete (see checkImportContactsStatus and imports.ImportJobManager)
+
+        :param max_size: Maximum size of one part in bytes (default is IMPORT_CONTACTS_MAX_SIZE)
+        :param workers: Number of parts uploaded concurrently
+        :return: tuple (ListID, failures, JobIDs). ListID and failures: see import_panel. JobIDs: IDs of import jobs
+        of parts uploaded successfully (None if Qualtrics did not return JobID), in order of parts
+        """
+        def upload(part, params):
+            result = self.request("importContacts", Product="TA", post_data=part, LibraryID=LibraryID, Name=Name,
+                                  **params)
+            if result is None:
+                return None
+            return result["Result"]
 
-        if kwargs.get("ColumnHeaders", None) == "1" or kwargs.get("ColumnHeaders", None) == 1:
-            fp = StringIO(CSV)
-            headers = next(csv.reader(fp))
-            if "Email" in headers and "Email" not in kwargs:
-                kwargs["Email"] = headers.index("Email") + 1
-            if "FirstName" in headers and "FirstName" not in kwargs:
-                kwargs["FirstName"] = headers.index("FirstName") + 1
-            if "LastName" in headers and "LastName" not in kwargs:
-                kwargs["LastName"] = headers.index("LastName") + 1
-            if "ExternalRef" in headers and "ExternalRef" not in kwargs:
-                kwargs["ExternalRef"] = headers.index("ExternalRef") + 1
-            fp.close()
-
-        result = self.request("importPanel", post_data=CSV, LibraryID=LibraryID, Name=Name, **kwargs)
-        if result is not None:
-            return result["Result"]["PanelID"]
-        return None
+        ListID, failures, results = self._import_csv(CSV, kwargs, max_size or self.IMPORT_CONTACTS_MAX_SIZE,
+                                                     workers, "ListID", upload)
+        return ListID, failures, [result.get("JobID") for result in results if result is not None]
 
     def importContacts(self, LibraryID, Name, CSV, **kwargs):
         """ Asynchronously imports a csv file into your directory
@@ -980,32 +1852,38 @@ class Qualtrics(object):
          * The csv file can be posted (there is an approximate 50 megabyte limit) or a url can be given to retrieve the file from a remote server via http or https.
          * The csv file must be comma separated using " for encapsulation. It must also contain headers with appropriately-named columns for Email, FirstName, LastName, ExternalRef, Language, and Unsubscribed.
           * A job id is returned and can be used to check the status of the import using the checkImportContactsStatus API call
+         * Larger files are split and uploaded in several calls, see import_contacts.
 
         https://survey.qualtrics.com/WRAPI/Contacts/docs.php#importContacts_2.3
 
         :param LibraryID:
         :param Name:
-        :param CSV: contents of CSV file to be imported
-        :return:
+        :param CSV: contents of CSV file to be imported (string or csvstream.CSVBody)
+        :param kwargs: Additional parameters for API call and import_contacts (max_size, workers)
+        :return: ListID, None if error occurs (in any part of the file)
         """
+        ListID, failures, _ = self.import_contacts(LibraryID, Name, CSV, **kwargs)
+        if failures:
+            self.last_error_message = self._parts_error(failures)
+            return None
+        return ListID
 
-        if kwargs.get("ColumnHeaders", None) == "1" or kwargs.get("ColumnHeaders", None) == 1:
-            fp = StringIO(CSV)
-            headers = csv.reader(fp).next()
-            if "Email" in headers and "Email" not in kwargs:
-                kwargs["Email"] = headers.index("Email") + 1
-            if "FirstName" in headers and "FirstName" not in kwargs:
-                kwargs["FirstName"] = headers.index("FirstName") + 1
-            if "LastName" in headers and "LastName" not in kwargs:
-                kwargs["LastName"] = headers.index("LastName") + 1
-            if "ExternalRef" in headers and "ExternalRef" not in kwargs:
-                kwargs["ExternalRef"] = headers.index("ExternalRef") + 1
-            fp.close()
+    def checkImportContactsStatus(self, LibraryID, ListID=None, JobID=None, **kwargs):
+        """ Check status of contact import started by importContacts.
+        See imports.ImportJobManager for running many imports and waiting for them
 
-        result = self.request("importContacts", Product="TA", post_data=CSV, LibraryID=LibraryID, Name=Name, **kwargs)
-        if result is not None:
-            return result["Result"]["ListID"]
-        return None
+        https://survey.qualtrics.com/WRAPI/Contacts/docs.php#checkImportContactsStatus_2.3
+
+        :param LibraryID: The library id of the list
+        :param ListID: The list id returned by importContacts
+        :param JobID: The job id returned by importContacts (if any)
+        :param kwargs: Additional parameters for API call
+        :return: Result dictionary (Status etc), None if error occurs
+        """
+        if self.request("checkImportContactsStatus", Product="TA", LibraryID=LibraryID, ListID=ListID, JobID=JobID,
+                        **kwargs) is None:
+            return None
+        return self.json_response["Result"]
 
     def importJsonPanel(self, LibraryID, Name, panel, headers=None, **kwargs):
         """ Import JSON document as a new panel. Example document:
@@ -1016,20 +1894,14 @@ class Qualtrics(object):
 
         :param LibraryID:
         :param Name:
-        :param panel:
+        :param panel: list (or any iterable, CSV document is encoded and uploaded incrementally) of panel members
         :param kwargs:
         :param headers:
         :return:
         """
         if headers is None:
             headers = ["Email", "FirstName", "LastName", "ExternalRef"]
-        fp = StringIO()
-        dictwriter = csv.DictWriter(fp, fieldnames=headers)
-        dictwriter.writeheader()
-        for subject in panel:
-            dictwriter.writerow(subject)
-
-        contents = fp.getvalue()
+        contents = CSVBody(panel, headers)
         return self.importPanel(LibraryID=LibraryID,
                                 Name=Name,
                                 CSV=contents,
@@ -1045,14 +1917,21 @@ class Qualtrics(object):
         :param SurveyID:   The response's associated survey ID
         :param ResponseID: The response to get HTML for
         :param kwargs:     Addition parameters
-        :return:  html response as a string
+        :return:  html response as a string (from response_cache if possible)
         """
+        if self.response_cache is not None:
+            cached = self.response_cache.get(SurveyID, ResponseID, "html", kwargs)
+            if cached is not None:
+                self.last_error_message = None
+                return cached
         if not self.request("getSingleResponseHTML",
                             SurveyID=SurveyID,
                             ResponseID=ResponseID,
                             **kwargs):
             return None
 
+        if self.response_cache is not None:
+            self.response_cache.set(SurveyID, ResponseID, "html", kwargs, self.json_response["Result"])
         return self.json_response["Result"]
 
     def getAllSubscriptions(self):
@@ -1123,23 +2002,36 @@ class Qualtrics(object):
 
         if EmbeddedData is None:
             EmbeddedData = {}
+        # Validate IDs before the recipient is added
+        prefix = self._survey_link_prefix(SurveyID, DistributionID)
+        if prefix is None:
+            return None
         recipient_id = self.addRecipient(LibraryID, PanelID, FirstName=FirstName, LastName=LastName, Email=Email, ExternalDataRef=ExternalDataRef, Language=Language, ED=EmbeddedData)
         if recipient_id is None:
             # last_error_message is set by addRecipient function
             return None
-        if "_" not in SurveyID:
-            self.last_error_message = "Invalid SurveyID format (must be SV_xxxxxxxxxx)"
-            return None
-
-        if "_" not in DistributionID:
-            self.last_error_message = "Invalid DistributionID format (must be EMD_xxxxxxxxxx)"
-            return None
-
-        link = DistributionID.split("_")[1] + "_" + SurveyID.split("_")[1] + "_" + recipient_id
-
-        link = "http://new.qualtrics.com/SE?Q_DL=%s" % link
-
-        return link
+        return prefix + recipient_id
+
+    def generate_unique_survey_links(self, SurveyID, LibraryID, PanelID, DistributionID, people, path, format=None,
+                                     workers=4, rate_limit=None, checkpoint_every=1000, columns=None):
+        """ Generate unique survey links for many people using concurrent addRecipient calls and write them to
+        a CSV or JSON Lines file, in input order. Interrupted run can be resumed (see links module)
+
+        :param people: Iterable of dictionaries with FirstName, LastName, Email, ExternalDataRef, Language and
+        EmbeddedData keys
+        :param path: Output file: input rows followed by RecipientID, Link and Error fields
+        :param format: csv or jsonl (guessed from path extension if None)
+        :param workers: Number of concurrent API calls
+        :param rate_limit: Maximum number of API calls per second (None - unlimited)
+        :param checkpoint_every: Number of rows between checkpoints
+        :param columns: Input columns written to CSV file. If None, keys of the first row are used and keys which
+        appear only in later rows are not written
+        :return: tuple (number of links generated, list of (row index, error message) tuples).
+        None if SurveyID or DistributionID is not valid
+        """
+        generator = UniqueLinkGenerator(self, SurveyID, LibraryID, PanelID, DistributionID, workers=workers,
+                                        rate_limit=rate_limit, checkpoint_every=checkpoint_every, columns=columns)
+        return generator.run(people, path, format=format)
 
     def getListContacts(self, LibraryID, ListID, EmbeddedData=None, ContactHistory=None, LastRecipientID=None, NumberOfRecords=None,
                  ExportLanguage=None, Unsubscribed=None, Subscribed=None, **kwargs):
@@ -1173,6 +2065,28 @@ class Qualtrics(object):
             return None
         return self.json_response
 
+    def iterListContacts(self, LibraryID, ListID, page_size=1000, prefetch=False, LastRecipientID=None, **kwargs):
+        """ Iterate over list members. Members are requested page by page (using NumberOfRecords and
+        LastRecipientID parameters of getListContacts), so memory usage is bounded by the page size.
+        If an API call fails, iteration stops and last_error_message is set
+
+        :param LibraryID: The library id for this list
+        :param ListID: The list id you want to export
+        :param page_size: Number of list members requested by one API call
+        :param prefetch: If True, next page is downloaded in background thread while the current one is processed
+        :param LastRecipientID: Start with the list member following this one
+        :param kwargs: Additional parameters allowed by getListContacts API call (EmbeddedData, Subscribed etc)
+        :return: generator of list members (dictionaries)
+        """
+        def fetch(cursor):
+            contacts = self.getListContacts(LibraryID, ListID, LastRecipientID=cursor, NumberOfRecords=page_size,
+                                              **kwargs)
+            if contacts is None:
+                raise PageError(self.last_error_message)
+            return contacts, contacts[-1]["RecipientID"] if contacts else cursor
+
+        return self._paginate(fetch, page_size, cursor=LastRecipientID, prefetch=prefetch)
+
     def removeContact(self, LibraryID, ListID, RecipientID, **kwargs):
         """ Remove contact from the specified list
 
@@ -1193,23 +2107,60 @@ class Qualtrics(object):
             return None
         return self.json_response
 
-    def truncate_contact_list(self, LibraryID, ListID):
-        """ Removes all contacts from list but keeps existing list
+    def truncate_contact_list(self, LibraryID, ListID, workers=4, rate_limit=None, page_size=1000,
+                              LastRecipientID=None, progress=None):
+        """ Removes all contacts from list but keeps existing list.
+        Contacts are listed page by page (see iterListContacts) and removed by several concurrent removeContact
+        calls.
+
+        If truncation is interrupted, it can be resumed by passing the last RecipientID reported to progress
+        callback as LastRecipientID.
+
         :param LibraryID: The library id for this panel
         :param ListID:     The list id you want to export
-        :return success or failure
+        :param workers: Number of concurrent removeContact calls
+        :param rate_limit: Maximum number of API calls per second (None - unlimited)
+        :param page_size: Number of contacts requested by one getListContacts call
+        :param LastRecipientID: Start with the contact following this one
+        :param progress: Optional function progress(RecipientID), called when all contacts up to and including
+        RecipientID have been processed (removed or reported as failures)
+        :return: tuple (success, failures). success is True if all contacts were removed. failures is a list of
+        (RecipientID, error message) tuples. If contacts could not be listed, success is False and
+        last_error_message is set
         """
-        list_of_contacts = self.getListContacts(LibraryID=LibraryID, ListID=ListID)
+        contacts = self.iterListContacts(LibraryID, ListID, page_size=page_size, LastRecipientID=LastRecipientID)
+
+        def recipient_ids():
+            # Next page is requested with LastRecipientID of the last contact of the current page, so that contact
+            # is not removed until the next page is received
+            previous = None
+            for contact in contacts:
+                if previous is not None:
+                    yield previous
+                previous = contact["RecipientID"]
+            if previous is not None:
+                yield previous
+
+        def remove(RecipientID):
+            if self.removeContact(LibraryID=LibraryID, ListID=ListID, RecipientID=RecipientID) is None:
+                return self.last_error_message
+            return None
+
         failures = []
-        if list_of_contacts:
-            for contact in list_of_contacts:
-                RecipientID = contact['RecipientID']
-                try:
-                    self.removeContact(LibraryID=LibraryID, ListID=ListID, RecipientID=RecipientID)
-                except Exception as e:
-                    # print e
-                    failures.append(RecipientID)
-        if failures:
-            return True, []
-        else:
-            return False, failures
+        processed = {}
+        next_index = 0
+        for index, RecipientID, result, error in self._imap(remove, recipient_ids(), workers, rate_limit):
+            if error is not None:
+                result = str(error)
+            if result is not None:
+                failures.append((RecipientID, result))
+            # Calls complete out of order, progress is reported for the longest processed prefix of the list
+            processed[index] = RecipientID
+            if next_index in processed:
+                while next_index in processed:
+                    last = processed.pop(next_index)
+                    next_index += 1
+                if progress is not None:
+                    progress(last)
+        # last_error_message is set by iterListContacts if listing failed
+        return not failures and self.last_error_message is None, failures
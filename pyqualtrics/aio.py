@@ -0,0 +1,611 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the pyqualtrics package.
+# For copyright and licensing information about this package, see the
+# NOTICE.txt and LICENSE.txt files in its top-level directory; they are
+# available at https://github.com/Baguage/pyqualtrics
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" asyncio version of Qualtrics object (Python 3.5+, requires aiohttp library)
+
+Example:
+
+    async with AsyncQualtrics(user, token, max_concurrency=200) as qualtrics:
+        responses = await asyncio.gather(*[qualtrics.getResponse(survey_id, response_id)
+                                           for response_id in response_ids])
+
+Every API call is a coroutine with the same parameters and return values as the corresponding method
+of pyqualtrics.Qualtrics. Note that last_error_message and other debugging attributes are shared by all
+coroutines running on the same object, so they describe whichever call finished last. Use call and call3 to get
+result of a particular API call.
+"""
+import asyncio
+import time
+
+try:
+    import aiohttp
+except ImportError:
+    raise ImportError("pyqualtrics.aio requires aiohttp library (pip install aiohttp)")
+
+from collections import OrderedDict
+
+from pyqualtrics import QualtricsBase, jsonbackend
+from pyqualtrics.ratelimit import rate_limiter
+from pyqualtrics.retry import NON_IDEMPOTENT
+
+
+class AsyncQualtrics(QualtricsBase):
+    """
+    asyncio representation of Qualtrics REST API
+    """
+    # Additional options passed to aiohttp.ClientSession.request, for example {"ssl": False}
+    aiohttp_kwargs = dict()
+
+    def __init__(self, user=None, token=None, api_version="2.5", max_concurrency=100, timeout=300, retry=None,
+                 json_backend=None):
+        """
+        :param user: The user name. If omitted, value of environment variable QUALTRICS_USER will be used.
+        :param token: API token for the user. If omitted, value of environment variable QUALTRICS_TOKEN will be used.
+        :param api_version: API version to use (this library has been tested with version 2.5).
+        :param max_concurrency: Maximum number of API calls in flight at the same time
+        :param timeout: Total timeout of a single API call, in seconds
+        :param retry: retry.RetryPolicy used to repeat failed API calls. If None, failed calls are not repeated
+        :param json_backend: Name of JSON library used to decode responses, see Qualtrics.__init__
+        """
+        super(AsyncQualtrics, self).__init__(user, token, api_version)
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retry_policy = retry
+        if json_backend is not None:
+            self.json_backend = jsonbackend.get_backend(json_backend)
+        self.session = None
+        self._semaphore = None
+
+    def _get_session(self):
+        # aiohttp session and semaphore must be created inside a running event loop
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self.session
+
+    async def close(self):
+        """ Close all connections
+        """
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def __enter__(self):
+        raise TypeError("Use 'async with' with AsyncQualtrics object")
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    async def _send(self, method, url, idempotent, stream=False, data=None, **kwargs):
+        """ Send HTTP request, repeating it according to self.retry_policy. Sets self.last_retries.
+        Exception raised by the last attempt is propagated to the caller
+
+        :param data: Body of the request or function returning it (aiohttp.FormData can be sent only once)
+        :return: tuple (aiohttp.ClientResponse, text of the response). If stream is True and status is 200,
+        body is not read and text is None
+        """
+        self.last_retries = 0
+        session = self._get_session()
+        while True:
+            try:
+                async with self._semaphore:
+                    r = await session.request(method, url, data=data() if callable(data) else data,
+                                              **dict(kwargs, **self.aiohttp_kwargs))
+                    if stream and r.status == 200:
+                        return r, None
+                    text = await r.text()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if self.retry_policy is None:
+                    raise
+                # Only failure to connect guarantees that the server has not received the request
+                delay = self.retry_policy.next_delay(self.last_retries + 1, idempotent,
+                                                     sent=not isinstance(e, aiohttp.ClientConnectorError))
+                if delay is None:
+                    raise
+            else:
+                if self.retry_policy is None:
+                    return r, text
+                delay = self.retry_policy.next_delay(self.last_retries + 1, idempotent, status=r.status,
+                                                     retry_after=r.headers.get("Retry-After"))
+                if delay is None:
+                    return r, text
+            await asyncio.sleep(delay)
+            self.last_retries += 1
+
+    async def request3(self, url, method="post", stream=False, data=None):
+        """ Send GET or POST request to Qualtrics API v3
+
+        :return: aiohttp.ClientResponse object or None if request failed.
+        Body of the response is already read, unless stream is True
+        """
+        data_json, headers = self._prepare_request3(url, data)
+        if method == "post":
+            self.last_data = data
+        elif method != "get":
+            raise NotImplementedError("method %s is not supported" % method)
+        try:
+            r, text = await self._send(method.upper(), url, method == "get", stream=stream,
+                                       data=data_json if method == "post" else None, headers=headers)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.last_error_message = str(e) or e.__class__.__name__
+            return None
+        self.r = r
+        if text is None:
+            # Body will be consumed by the caller (r.content.iter_chunked etc)
+            return r
+        if not self._process_response3(r.status, text):
+            return None
+        return r
+
+    async def call3(self, url, method="post", data=None):
+        """ Coroutine version of Qualtrics.call3
+        """
+        started = time.time()
+        r = await self.request3(url, method=method, data=data)
+        # No await between the end of request3 and this line, so attributes belong to this call
+        return self._call_result(self.json_response if r is not None else None, started)
+
+    async def CreateResponseExport(self, format, surveyId, lastResponseId=None, startDate=None, endDate=None,
+                                   limit=None, includedQuestionIds=None, useLabels=None, decimalSeparator=None,
+                                   seenUnansweredRecode=None, useLocalTime=None):
+        """ Coroutine version of Qualtrics.CreateResponseExport
+        """
+        url = "https://survey.qualtrics.com/API/v3/responseexports"
+        data = self._response_export_data(format, surveyId, lastResponseId=lastResponseId, limit=limit,
+                                          includedQuestionIds=includedQuestionIds, useLabels=useLabels)
+        response = await self.request3(url, method="post", data=data)
+        if response is None:
+            return None
+        return self._parse_response_export_id(self.json_response)
+
+    async def GetResponseExportProgress(self, responseExportId):
+        """ Coroutine version of Qualtrics.GetResponseExportProgress
+        """
+        url = "https://survey.qualtrics.com/API/v3/responseexports/%s" % responseExportId
+        response = await self.request3(url, method="get")
+        if response is None:
+            # Server or network error
+            return "servfail", self.last_error_message
+        return self._parse_response_export_progress(self.json_response)
+
+    async def GetResponseExportFile(self, responseExportId):
+        """ Coroutine version of Qualtrics.GetResponseExportFile
+        """
+        url = self._response_export_file_url(responseExportId)
+        response = await self.request3(url, method="get", stream=True)
+        if response is None:
+            return None
+        try:
+            content = await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.last_error_message = str(e) or e.__class__.__name__
+            return None
+        return self._open_response_export_file(content)
+
+    async def DownloadResponseExportFile(self, responseExportId, filename):
+        """ Coroutine version of Qualtrics.DownloadResponseExportFile
+        """
+        url = self._response_export_file_url(responseExportId)
+        response = await self.request3(url, method="get", stream=True)
+        if response is None:
+            return None
+        try:
+            with open(filename, "wb") as fp:
+                async for chunk in response.content.iter_chunked(8192):
+                    fp.write(chunk)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.last_error_message = str(e) or e.__class__.__name__
+            return None
+        finally:
+            response.release()
+        self.last_error_message = None
+        return True
+
+    async def request(self, Request, Product='RS', post_data=None, post_files=None, **kwargs):
+        """ Coroutine version of Qualtrics.request
+        """
+        url, params = self._prepare_request(Request, Product, kwargs)
+        # Unlike requests library, aiohttp does not skip None values and does not convert numbers to strings
+        params = dict((key, str(value)) for key, value in params.items() if value is not None)
+        data = None
+        if post_data:
+            method = "POST"
+            data = post_data
+        elif post_files:
+            method = "POST"
+
+            def data():
+                form = aiohttp.FormData()
+                for name, contents in post_files.items():
+                    form.add_field(name, contents, filename=name)
+                return form
+        else:
+            method = "GET"
+        try:
+            r, text = await self._send(method, url, Request not in NON_IDEMPOTENT, params=params, data=data)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.last_url = ""
+            self.response = None
+            self.last_error_message = str(e) or e.__class__.__name__
+            return None
+
+        return self._process_response(Request, kwargs, r.status, text, str(r.url))
+
+    async def call(self, Request, Product='RS', post_data=None, post_files=None, **kwargs):
+        """ Coroutine version of Qualtrics.call
+        """
+        started = time.time()
+        body = await self.request(Request, Product=Product, post_data=post_data, post_files=post_files, **kwargs)
+        return self._call_result(body, started)
+
+    async def createPanel(self, LibraryID, Name, **kwargs):
+        result = await self.request("createPanel", LibraryID=LibraryID, Name=Name, **kwargs)
+        if result is None:
+            return None
+        return result["Result"]["PanelID"]
+
+    async def deletePanel(self, LibraryID, PanelID, **kwargs):
+        if await self.request("deletePanel", LibraryID=LibraryID, PanelID=PanelID, **kwargs) is None:
+            return False
+        return True
+
+    async def getPanelMemberCount(self, LibraryID, PanelID, **kwargs):
+        result = await self.request("getPanelMemberCount", LibraryID=LibraryID, PanelID=PanelID, **kwargs)
+        if result is None:
+            return None
+        return int(result["Result"]["Count"])
+
+    async def addRecipient(self, LibraryID, PanelID, FirstName, LastName, Email, ExternalDataRef, Language, ED):
+        result = await self.request("addRecipient",
+                                    LibraryID=LibraryID,
+                                    PanelID=PanelID,
+                                    FirstName=FirstName,
+                                    LastName=LastName,
+                                    Email=Email,
+                                    ExternalDataRef=ExternalDataRef,
+                                    Language=Language,
+                                    ED=ED)
+        if not result:
+            return None
+        return result["Result"]["RecipientID"]
+
+    async def getRecipient(self, LibraryID, RecipientID):
+        result = await self.request("getRecipient", LibraryID=LibraryID, RecipientID=RecipientID)
+        if not result:
+            return None
+        return result["Result"]["Recipient"]
+
+    async def removeRecipient(self, LibraryID, PanelID, RecipientID, **kwargs):
+        if not await self.request("removeRecipient", LibraryID=LibraryID, PanelID=PanelID, RecipientID=RecipientID,
+                                  **kwargs):
+            return False
+        return True
+
+    async def sendSurveyToIndividual(self, **kwargs):
+        result = await self.request("sendSurveyToIndividual", **kwargs)
+        if not result:
+            return None
+        return result["Result"]["EmailDistributionID"]
+
+    async def sendSurveyToPanel(self, SurveyID, SendDate, SentFromAddress, FromEmail, FromName, Subject, MessageID,
+                                MessageLibraryID, PanelID, PanelLibraryID, LinkType, **kwargs):
+        result = await self.request("sendSurveyToPanel",
+                                    SurveyID=SurveyID,
+                                    SendDate=SendDate,
+                                    SentFromAddress=SentFromAddress,
+                                    FromEmail=FromEmail,
+                                    FromName=FromName,
+                                    Subject=Subject,
+                                    MessageID=MessageID,
+                                    MessageLibraryID=MessageLibraryID,
+                                    PanelID=PanelID,
+                                    PanelLibraryID=PanelLibraryID,
+                                    LinkType=LinkType,
+                                    **kwargs)
+        if not result:
+            return None
+        return result["Result"]["EmailDistributionID"]
+
+    async def sendReminder(self, ParentEmailDistributionID, SendDate, SentFromAddress, FromEmail, FromName, Subject,
+                           MessageID, LibraryID, **kwargs):
+        result = await self.request("sendReminder",
+                                    ParentEmailDistributionID=ParentEmailDistributionID,
+                                    SendDate=SendDate,
+                                    SentFromAddress=SentFromAddress,
+                                    FromEmail=FromEmail,
+                                    FromName=FromName,
+                                    Subject=Subject,
+                                    MessageID=MessageID,
+                                    LibraryID=LibraryID,
+                                    **kwargs)
+        if not result:
+            return None
+        return result["Result"]["EmailDistributionID"]
+
+    async def createDistribution(self, SurveyID, PanelID, Description, PanelLibraryID, **kwargs):
+        result = await self.request("createDistribution",
+                                    SurveyID=SurveyID,
+                                    PanelID=PanelID,
+                                    Description=Description,
+                                    PanelLibraryID=PanelLibraryID,
+                                    **kwargs)
+        if not result:
+            return None
+        return result["Result"]["EmailDistributionID"]
+
+    async def getDistributions(self, **kwargs):
+        result = await self.request("getDistributions", **kwargs)
+        if not result:
+            return None
+        return result
+
+    async def getSurveys(self, **kwargs):
+        response = await self.request("getSurveys", **kwargs)
+        surveys = None
+        if response:
+            surveys = OrderedDict()
+            for survey in response["Result"]["Surveys"]:
+                surveys[survey['SurveyID']] = survey
+        return surveys
+
+    async def getSurvey(self, SurveyID):
+        return await self.request("getSurvey", SurveyID=SurveyID, Format=None)
+
+    async def importSurvey(self, ImportFormat, Name, Activate=None, URL=None, FileContents=None, OwnerID=None,
+                           **kwargs):
+        result = await self.request(
+            "importSurvey",
+            ImportFormat=ImportFormat,
+            Name=Name,
+            Activate=Activate,
+            URL=URL,
+            OwnerID=OwnerID,
+            post_files={"FileContents": FileContents} if FileContents else None,
+            **kwargs
+        )
+        if result is not None:
+            return result["Result"]["SurveyID"]
+
+    async def deleteSurvey(self, SurveyID, **kwargs):
+        if await self.request("deleteSurvey", SurveyID=SurveyID) is not None:
+            return True
+        return False
+
+    async def activateSurvey(self, SurveyID, **kwargs):
+        if await self.request("activateSurvey", SurveyID=SurveyID, **kwargs):
+            return True
+        return False
+
+    async def deactivateSurvey(self, SurveyID, **kwargs):
+        if await self.request("deactivateSurvey", SurveyID=SurveyID, **kwargs):
+            return True
+        return False
+
+    async def getLegacyResponseData(self, SurveyID, **kwargs):
+        """ Coroutine version of Qualtrics.getLegacyResponseData. Takes the same keyword arguments
+        (LastResponseID, Limit, ResponseID, Labels etc)
+        """
+        return await self.request("getLegacyResponseData", SurveyID=SurveyID, **kwargs)
+
+    async def getResponse(self, SurveyID, ResponseID, **kwargs):
+        response = await self.getLegacyResponseData(SurveyID=SurveyID, ResponseID=ResponseID, **kwargs)
+        # Don't do "if not response:" - because getLegacyResponseData can return empty dict in some cases
+        if response is None:
+            return None
+        if ResponseID not in response:
+            # Should never happen
+            self.last_error_message = "Qualtrics error: ResponseID %s not in response (probably deleted)" % ResponseID
+            return None
+        return response[ResponseID]
+
+    async def importResponses(self, SurveyID, ResponseSetID=None, FileURL=None, Delimiter=None, Enclosure=None,
+                              IgnoreValidation=None, DecimalFormat=None, FileContents=None, **kwargs):
+        if not await self.request(
+                "importResponses",
+                SurveyID=SurveyID,
+                ResponseSetID=ResponseSetID,
+                FileURL=FileURL,
+                Delimiter=Delimiter,
+                Enclosure=Enclosure,
+                IgnoreValidation=IgnoreValidation,
+                DecimalFormat=DecimalFormat,
+                post_files={"FileContents": FileContents} if FileContents else None,
+                **kwargs):
+            return False
+        return True
+
+    async def importResponsesAsDict(self, SurveyID, responses, ResponseSetID=None, Delimiter=None, Enclosure=None,
+                                    IgnoreValidation=None, DecimalFormat=None, **kwargs):
+        assert(isinstance(responses, list))
+        if len(responses) < 1:
+            return True
+        headers = responses[0].keys()
+        contents = self._dicts_to_csv(responses, headers, header_rows=2)
+        return await self.importResponses(
+            SurveyID=SurveyID,
+            ResponseSetID=ResponseSetID,
+            Delimiter=Delimiter,
+            Enclosure=Enclosure,
+            IgnoreValidation=IgnoreValidation,
+            DecimalFormat=DecimalFormat,
+            FileContents=contents,
+            **kwargs)
+
+    async def updateResponseEmbeddedData(self, SurveyID, ResponseID, ED, **kwargs):
+        if not await self.request(
+                "updateResponseEmbeddedData",
+                SurveyID=SurveyID,
+                ResponseID=ResponseID,
+                ED=ED,
+                **kwargs):
+            return False
+        return True
+
+    async def getPanels(self, LibraryID):
+        response = await self.request("getPanels", LibraryID=LibraryID)
+        if not response:
+            return None
+        return response["Result"]["Panels"]
+
+    async def getPanel(self, LibraryID, PanelID, **kwargs):
+        """ Coroutine version of Qualtrics.getPanel. Takes the same keyword arguments
+        (EmbeddedData, LastRecipientID, NumberOfRecords etc)
+        """
+        return await self.request("getPanel", LibraryID=LibraryID, PanelID=PanelID, **kwargs)
+
+    async def importPanel(self, LibraryID, Name, CSV, **kwargs):
+        self._set_column_indexes(CSV, kwargs)
+        result = await self.request("importPanel", post_data=CSV, LibraryID=LibraryID, Name=Name, **kwargs)
+        if result is not None:
+            return result["Result"]["PanelID"]
+        return None
+
+    async def importContacts(self, LibraryID, Name, CSV, **kwargs):
+        self._set_column_indexes(CSV, kwargs)
+        result = await self.request("importContacts", Product="TA", post_data=CSV, LibraryID=LibraryID, Name=Name,
+                                    **kwargs)
+        if result is not None:
+            return result["Result"]["ListID"]
+        return None
+
+    async def importJsonPanel(self, LibraryID, Name, panel, headers=None, **kwargs):
+        if headers is None:
+            headers = ["Email", "FirstName", "LastName", "ExternalRef"]
+        contents = self._dicts_to_csv(panel, headers)
+        return await self.importPanel(LibraryID=LibraryID, Name=Name, CSV=contents, ColumnHeaders="1", **kwargs)
+
+    async def getSingleResponseHTML(self, SurveyID, ResponseID, **kwargs):
+        result = await self.request("getSingleResponseHTML", SurveyID=SurveyID, ResponseID=ResponseID, **kwargs)
+        if not result:
+            return None
+        return result["Result"]
+
+    async def getAllSubscriptions(self):
+        return await self.request("getAllSubscriptions")
+
+    async def subscribe(self, Name, PublicationURL, Topics, Encrypt=None, SharedKey=None, BrandID=None, **kwargs):
+        return await self.request(
+            "subscribe",
+            Name=Name,
+            PublicationURL=PublicationURL,
+            Topics=Topics,
+            Encrypt=Encrypt,
+            SharedKey=SharedKey,
+            BrandID=BrandID,
+        )
+
+    async def generate_unique_survey_link(self, SurveyID, LibraryID, PanelID, DistributionID, FirstName, LastName,
+                                          Email, ExternalDataRef="", Language="English", EmbeddedData=None):
+        assert isinstance(EmbeddedData, (dict, type(None)))
+        assert isinstance(SurveyID, str)
+        assert isinstance(DistributionID, str)
+
+        if EmbeddedData is None:
+            EmbeddedData = {}
+        # Validate IDs before the recipient is added
+        prefix = self._survey_link_prefix(SurveyID, DistributionID)
+        if prefix is None:
+            return None
+        recipient_id = await self.addRecipient(LibraryID, PanelID, FirstName=FirstName, LastName=LastName,
+                                               Email=Email, ExternalDataRef=ExternalDataRef, Language=Language,
+                                               ED=EmbeddedData)
+        if recipient_id is None:
+            # last_error_message is set by addRecipient function
+            return None
+        return prefix + recipient_id
+
+    async def getListContacts(self, LibraryID, ListID, **kwargs):
+        """ Coroutine version of Qualtrics.getListContacts. Takes the same keyword arguments
+        (EmbeddedData, LastRecipientID, NumberOfRecords etc)
+        """
+        result = await self.request("getListContacts", Product='TA', LibraryID=LibraryID, ListID=ListID, **kwargs)
+        if not result:
+            return None
+        return result
+
+    async def removeContact(self, LibraryID, ListID, RecipientID, **kwargs):
+        result = await self.request("removeContact", Product='TA', LibraryID=LibraryID, ListID=ListID,
+                                    RecipientID=RecipientID, **kwargs)
+        if not result:
+            return None
+        return result
+
+    async def truncate_contact_list(self, LibraryID, ListID, workers=4, rate_limit=None, page_size=1000,
+                                    LastRecipientID=None, progress=None):
+        """ Coroutine version of Qualtrics.truncate_contact_list. Contacts are listed page by page and up to
+        `workers` removeContact calls of the current page run at the same time.
+
+        :param rate_limit: Maximum number of API calls per second (None - unlimited) or ratelimit.TokenBucket
+        :return: tuple (success, failures), failures is a list of (RecipientID, error message) tuples
+        """
+        limiter = rate_limiter(rate_limit)
+        semaphore = asyncio.Semaphore(workers)
+
+        async def remove(RecipientID):
+            async with semaphore:
+                if limiter is not None:
+                    await _acquire(limiter)
+                if await self.removeContact(LibraryID=LibraryID, ListID=ListID, RecipientID=RecipientID) is None:
+                    # No await since removeContact returned, so the message belongs to this call
+                    return RecipientID, self.last_error_message
+                return None
+
+        failures = []
+        cursor = LastRecipientID
+        # Next page is requested with LastRecipientID of the last contact of the current page, so that contact
+        # is removed together with the next page
+        pending = []
+        while True:
+            contacts = await self.getListContacts(LibraryID, ListID, LastRecipientID=cursor,
+                                                  NumberOfRecords=page_size)
+            if contacts is None:
+                return False, failures
+            recipient_ids = [contact["RecipientID"] for contact in contacts]
+            last_page = len(recipient_ids) < page_size
+            if not last_page:
+                cursor = recipient_ids.pop()
+            results = await asyncio.gather(*[remove(RecipientID) for RecipientID in pending + recipient_ids])
+            failures.extend(result for result in results if result is not None)
+            processed = pending + recipient_ids
+            if processed and progress is not None:
+                progress(processed[-1])
+            if last_page:
+                break
+            pending = [cursor]
+        self.last_error_message = None
+        return not failures, failures
+
+
+async def _acquire(limiter):
+    """ Wait until rate limiter (ratelimit.TokenBucket) allows the next call without blocking the event loop
+    """
+    while True:
+        delay = limiter._take(1)
+        if not delay:
+            return
+        await asyncio.sleep(delay)
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the pyqualtrics package.
+# For copyright and licensing information about this package, see the
+# NOTICE.txt and LICENSE.txt files in its top-level directory; they are
+# available at https://github.com/Baguage/pyqualtrics
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Helpers for running many API calls on a thread pool
+"""
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+def imap_bounded(func, iterable, workers=4, rate_limiter=None):
+    """ Call func(item) for every item of iterable on a pool of worker threads.
+    Items are read from iterable lazily: no more than 2 * workers calls are queued at any time,
+    so iterable can be a generator of any length.
+
+    :param func: function of one argument. It should return result of the call or raise an exception
+    :param iterable: items to process
+    :param workers: Number of threads
+    :param rate_limiter: Optional object with acquire() method (for example ratelimit.TokenBucket), called before
+    every call
+    :return: generator of (index, item, result, error) tuples, in order of completion. index is position of item
+    in iterable, error is None if func did not raise an exception
+    """
+    def call(item):
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        return func(item)
+
+    iterator = enumerate(iterable)
+    pending = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            while True:
+                for index, item in iterator:
+                    pending[executor.submit(call, item)] = (index, item)
+                    if len(pending) >= 2 * workers:
+                        break
+                if not pending:
+                    return
+                done, not_done = wait(list(pending), return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, item = pending.pop(future)
+                    error = future.exception()
+                    yield index, item, None if error is not None else future.result(), error
+        finally:
+            # Generator was closed before all items were processed, don't start queued calls
+            for future in pending:
+                future.cancel()
+
+
+class PageError(Exception):
+    """ Raised by fetch function passed to iter_pages if API call fails
+    """
+
+
+def iter_pages(fetch, page_size, cursor=None, prefetch=False):
+    """ Iterate over items of a paginated API call (getLegacyResponseData, getPanel etc).
+
+    :param fetch: function fetch(cursor) returning tuple (list of items, cursor of the next page).
+    cursor is None for the first page
+    :param page_size: Number of items requested per page. Page with fewer items is the last one
+    :param cursor: Cursor of the first page
+    :param prefetch: If True, next page is fetched in background thread while items of the current page
+    are processed
+    :return: generator of items
+    """
+    executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+    future = None
+    try:
+        while True:
+            if future is not None:
+                items, cursor = future.result()
+            else:
+                items, cursor = fetch(cursor)
+            future = None
+            last_page = len(items) < page_size
+            if not last_page and executor is not None:
+                future = executor.submit(fetch, cursor)
+            for item in items:
+                yield item
+            if last_page:
+                return
+    finally:
+        if executor is not None:
+            if future is not None:
+                future.cancel()
+            executor.shutdown(wait=False)
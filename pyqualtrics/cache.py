@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the pyqualtrics package.
+# For copyright and licensing information about this package, see the
+# NOTICE.txt and LICENSE.txt files in its top-level directory; they are
+# available at https://github.com/Baguage/pyqualtrics
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Local caches of API results.
+
+ResponseCache keeps single responses (getResponse) and their HTML (getSingleResponseHTML) in a SQLite database,
+so repeated lookups of the same response do not call Qualtrics API. Entries are keyed by SurveyID, ResponseID
+and parameters of the call (Labels etc), expire after ttl seconds and the least recently used entries are removed
+when there are more than max_entries of them.
+
+MetadataCache keeps results of getSurveys, getSurvey, getPanels and getPanelMemberCount in memory (and optionally
+in a SQLite database shared by several processes). Qualtrics object removes affected entries after calls which
+change surveys or panels (importSurvey, deleteSurvey, createPanel etc).
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def _key(params):
+    return json.dumps(params, sort_keys=True)
+
+
+class ResponseCache(object):
+    """ Persistent cache of responses in SQLite database. See module description
+    """
+    def __init__(self, path, ttl=None, max_entries=None):
+        """
+        :param path: SQLite database file (created if does not exist)
+        :param ttl: Number of seconds after which cached response is requested again. If None, entries never expire
+        :param max_entries: Maximum number of cached entries. If None, cache size is not limited
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        db = self._connect()
+        try:
+            with db:
+                db.execute("CREATE TABLE IF NOT EXISTS responses ("
+                           "survey_id TEXT, response_id TEXT, kind TEXT, params TEXT, value TEXT, "
+                           "created REAL, accessed REAL, PRIMARY KEY (survey_id, response_id, kind, params))")
+                db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        finally:
+            db.close()
+
+    def _connect(self):
+        # New connection for every operation, so the cache can be used from any thread
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, SurveyID, ResponseID, kind, params):
+        """
+        :param kind: Type of cached value ("response" or "html")
+        :param params: Dictionary of additional parameters of the API call
+        :return: cached value, None if it is not in the cache or expired
+        """
+        key = (SurveyID, ResponseID, kind, _key(params))
+        now = time.time()
+        db = self._connect()
+        try:
+            with db:
+                row = db.execute("SELECT value, created FROM responses WHERE survey_id = ? AND response_id = ? "
+                                 "AND kind = ? AND params = ?", key).fetchone()
+                if row is not None and self.ttl is not None and row[1] + self.ttl <= now:
+                    db.execute("DELETE FROM responses WHERE survey_id = ? AND response_id = ? AND kind = ? "
+                               "AND params = ?", key)
+                    row = None
+                if row is not None:
+                    db.execute("UPDATE responses SET accessed = ? WHERE survey_id = ? AND response_id = ? "
+                               "AND kind = ? AND params = ?", (now,) + key)
+        finally:
+            db.close()
+        self._count(row is not None)
+        if row is None:
+            return None
+        return json.loads(row[0], object_pairs_hook=OrderedDict)
+
+    def set(self, SurveyID, ResponseID, kind, params, value):
+        """ Save value, removing the least recently used entries if cache is full
+        """
+        now = time.time()
+        db = self._connect()
+        try:
+            with db:
+                db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                           (SurveyID, ResponseID, kind, _key(params), json.dumps(value), now, now))
+                if self.max_entries is not None:
+                    db.execute("DELETE FROM responses WHERE rowid IN "
+                               "(SELECT rowid FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                               (self.max_entries,))
+        finally:
+            db.close()
+
+    def invalidate(self, SurveyID, ResponseID=None):
+        """ Remove cached entries of a response (or of all responses of the survey if ResponseID is None)
+
+        :return: Number of removed entries
+        """
+        db = self._connect()
+        try:
+            with db:
+                if ResponseID is None:
+                    cursor = db.execute("DELETE FROM responses WHERE survey_id = ?", (SurveyID,))
+                else:
+                    cursor = db.execute("DELETE FROM responses WHERE survey_id = ? AND response_id = ?",
+                                        (SurveyID, ResponseID))
+                return cursor.rowcount
+        finally:
+            db.close()
+
+    def clear(self):
+        """ Remove all entries
+        """
+        db = self._connect()
+        try:
+            with db:
+                db.execute("DELETE FROM responses")
+        finally:
+            db.close()
+
+    def __len__(self):
+        db = self._connect()
+        try:
+            return db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        finally:
+            db.close()
+
+
+class MetadataCache(object):
+    """ In-process cache of metadata API calls with least recently used eviction, optionally backed by SQLite.
+
+    Each endpoint has its own time to live. When an entry has expired less than stale_ttl seconds ago, the expired
+    value is returned immediately and refreshed in a background thread (stale-while-revalidate).
+    Cached values are shared, they must not be modified.
+    """
+    # Time to live of each endpoint, in seconds
+    DEFAULT_TTL = {
+        "getSurveys": 300,
+        "getSurvey": 300,
+        "getPanels": 300,
+        "getPanelMemberCount": 60,
+    }
+
+    def __init__(self, ttl=None, stale_ttl=0, max_entries=1024, path=None):
+        """
+        :param ttl: Time to live in seconds: number (for all endpoints) or dictionary of endpoint name to number,
+        updating DEFAULT_TTL
+        :param stale_ttl: Number of seconds after expiration during which stale value is returned while it is
+        refreshed in background
+        :param max_entries: Maximum number of entries kept in memory
+        :param path: SQLite database file. If specified, entries are also saved there and survive process restarts
+        """
+        self.ttl = dict(self.DEFAULT_TTL)
+        if isinstance(ttl, dict):
+            self.ttl.update(ttl)
+        elif ttl is not None:
+            self.ttl = dict((endpoint, ttl) for endpoint in self.ttl)
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        # (endpoint, key) -> (value, created, params), the most recently used last
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        # (endpoint, key) -> [params, number of running fetches, generation] of keys being fetched. invalidate
+        # increments generation, so values fetched before the invalidation are not stored
+        self._fetching = {}
+        self._lock = threading.Lock()
+        if path is not None:
+            db = self._connect()
+            try:
+                with db:
+                    db.execute("CREATE TABLE IF NOT EXISTS metadata ("
+                               "endpoint TEXT, params TEXT, value TEXT, created REAL, PRIMARY KEY (endpoint, params))")
+            finally:
+                db.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _load(self, endpoint, key):
+        db = self._connect()
+        try:
+            row = db.execute("SELECT value, created FROM metadata WHERE endpoint = ? AND params = ?",
+                             (endpoint, key)).fetchone()
+        finally:
+            db.close()
+        if row is None:
+            return None
+        return json.loads(row[0], object_pairs_hook=OrderedDict), row[1]
+
+    def _store(self, endpoint, key, params, value, created):
+        with self._lock:
+            self._store_locked(endpoint, key, params, value, created)
+
+    def _store_locked(self, endpoint, key, params, value, created):
+        self._entries.pop((endpoint, key), None)
+        self._entries[(endpoint, key)] = (value, created, params)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _fetch(self, endpoint, key, params, fetch):
+        with self._lock:
+            fetching = self._fetching.setdefault((endpoint, key), [params, 0, 0])
+            fetching[1] += 1
+            generation = fetching[2]
+        try:
+            value = fetch()
+        except Exception:
+            with self._lock:
+                self._fetch_done(endpoint, key)
+            raise
+        with self._lock:
+            # Entry was invalidated while the API call was running: value may be out of date, return it but
+            # don't cache it. SQLite is updated under the lock too, so invalidate deletes the row after it is written
+            if value is not None and fetching[2] == generation:
+                created = time.time()
+                self._store_locked(endpoint, key, params, value, created)
+                if self.path is not None:
+                    db = self._connect()
+                    try:
+                        with db:
+                            db.execute("INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?)",
+                                       (endpoint, key, json.dumps(value), created))
+                    finally:
+                        db.close()
+            self._fetch_done(endpoint, key)
+        # None if API call failed, nothing is cached
+        return value
+
+    def _fetch_done(self, endpoint, key):
+        fetching = self._fetching[(endpoint, key)]
+        fetching[1] -= 1
+        if not fetching[1]:
+            del self._fetching[(endpoint, key)]
+
+    def _refresh(self, endpoint, key, params, fetch):
+        try:
+            self._fetch(endpoint, key, params, fetch)
+        finally:
+            with self._lock:
+                self._refreshing.discard((endpoint, key))
+
+    def get(self, endpoint, params, fetch):
+        """ Cached result of API call, or result of fetch() if it is not cached or expired
+
+        :param endpoint: API call name (getSurveys etc)
+        :param params: Dictionary of parameters of the API call
+        :param fetch: function without arguments making the API call. It returns None if the call fails
+        (failed calls are not cached)
+        :return: value
+        """
+        key = _key(params)
+        with self._lock:
+            entry = self._entries.get((endpoint, key))
+            if entry is not None:
+                # Most recently used
+                del self._entries[(endpoint, key)]
+                self._entries[(endpoint, key)] = entry
+        if entry is None and self.path is not None:
+            entry = self._load(endpoint, key)
+            if entry is not None:
+                self._store(endpoint, key, params, entry[0], entry[1])
+        age = time.time() - entry[1] if entry is not None else None
+        ttl = self.ttl.get(endpoint, 0)
+        if entry is not None and age < ttl + self.stale_ttl:
+            with self._lock:
+                self.hits += 1
+                refresh = age >= ttl and (endpoint, key) not in self._refreshing
+                if refresh:
+                    self._refreshing.add((endpoint, key))
+            if refresh:
+                thread = threading.Thread(target=self._refresh, args=(endpoint, key, params, fetch))
+                thread.daemon = True
+                thread.start()
+            return entry[0]
+        with self._lock:
+            self.misses += 1
+        return self._fetch(endpoint, key, params, fetch)
+
+    def invalidate(self, endpoint, **params):
+        """ Remove entries of endpoint whose parameters include all given params
+        (for example invalidate("getPanelMemberCount", PanelID="ML_123")). All entries of endpoint if no params given
+        """
+        def matches(entry_params):
+            return all(entry_params.get(name) == value for name, value in params.items())
+
+        with self._lock:
+            for endpoint_key, (value, created, entry_params) in list(self._entries.items()):
+                if endpoint_key[0] == endpoint and matches(entry_params):
+                    del self._entries[endpoint_key]
+            for endpoint_key, fetching in self._fetching.items():
+                if endpoint_key[0] == endpoint and matches(fetching[0]):
+                    fetching[2] += 1
+        if self.path is not None:
+            db = self._connect()
+            try:
+                with db:
+                    for (key,) in db.execute("SELECT params FROM metadata WHERE endpoint = ?", (endpoint,)).fetchall():
+                        if matches(json.loads(key)):
+                            db.execute("DELETE FROM metadata WHERE endpoint = ? AND params = ?", (endpoint, key))
+            finally:
+                db.close()
+
+    def clear(self):
+        """ Remove all entries
+        """
+        with self._lock:
+            self._entries.clear()
+            for fetching in self._fetching.values():
+                fetching[2] += 1
+        if self.path is not None:
+            db = self._connect()
+            try:
+                with db:
+                    db.execute("DELETE FROM metadata")
+            finally:
+                db.close()
@@ -0,0 +1,575 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the pyqualtrics package.
+# For copyright and licensing information about this package, see the
+# NOTICE.txt and LICENSE.txt files in its top-level directory; they are
+# available at https://github.com/Baguage/pyqualtrics
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+""" Columnar representations of survey responses.
+
+ColumnarResponses is a compact in-memory representation of API v2 legacy response data.
+getLegacyResponseData returns an OrderedDict of OrderedDicts: every response has its own dictionary and its own
+copy of every value. ColumnarResponses keeps one list of values per column, and equal short strings (answer
+codes, dates, "Default Response Set" etc) are stored only once. Responses are accessed through read-only views,
+so ColumnarResponses can be used wherever the result of getLegacyResponseData is only read.
+
+ColumnarWriter writes a stream of responses (for example rows of a v3 export file) to a typed columnar file:
+Parquet if pyarrow library is installed, otherwise a simple compressed format of this module (read_columnar).
+"""
+import array
+import json
+import os
+import re
+import struct
+import sys
+import zlib
+from collections import OrderedDict
+
+from pyqualtrics.sync import _replace
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    # Python 2.7
+    from collections import Mapping
+
+
+if sys.version_info >= (3, 0):
+    _STRING_TYPES = (str,)
+else:
+    # Python 2.7
+    _STRING_TYPES = (str, unicode)
+
+# Longer strings (free-text answers) are not interned by ColumnarResponses
+INTERN_MAX_LENGTH = 64
+
+
+class ResponseRow(Mapping):
+    """ Read-only view of one response: mapping of field name to value, in column order.
+    Fields missing in the response (but present in other responses) have None value
+    """
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, table, row):
+        self._table = table
+        self._row = row
+
+    def __getitem__(self, name):
+        return self._table._data[self._table._column_index[name]][self._row]
+
+    def __iter__(self):
+        return iter(self._table.columns)
+
+    def __len__(self):
+        return len(self._table.columns)
+
+    def __repr__(self):
+        return "ResponseRow(%r)" % list(self.items())
+
+
+class ColumnarResponses(Mapping):
+    """ Read-only mapping of ResponseID to ResponseRow, values are stored column by column.
+
+    Example:
+        responses = qualtrics.getLegacyResponseData(SurveyID, columnar=True)
+        for response_id, response in responses.items():
+            print(response_id + " : " + response["Finished"])
+        finished = responses.column("Finished")
+        df = responses.to_dataframe()
+    """
+    def __init__(self):
+        self.columns = []
+        self._column_index = {}
+        self._data = []
+        self._ids = []
+        self._id_index = {}
+        # Every distinct short string is stored once, keyed by (type, value): in Python 2.7 "1" == u"1"
+        self._values = {}
+
+    @classmethod
+    def from_items(cls, items):
+        """ Build from (ResponseID, response) pairs, for example getLegacyResponseData(...).items() or
+        streamLegacyResponseData(...). Responses are not kept after they are added
+        """
+        table = cls()
+        for response_id, response in items:
+            table.append(response_id, response)
+        return table
+
+    def _value(self, value):
+        # Only short strings are likely to repeat. Other values are kept as they are: interning them by equality
+        # would mix 1, 1.0 and True, and an entry for every unique free-text answer would only cost memory
+        if isinstance(value, _STRING_TYPES) and len(value) <= INTERN_MAX_LENGTH:
+            return self._values.setdefault((type(value), value), value)
+        return value
+
+    def append(self, response_id, response):
+        """ Add a response (mapping of field name to value)
+        """
+        row = len(self._ids)
+        if response_id in self._id_index:
+            raise ValueError("Duplicate ResponseID %s" % response_id)
+        for name in response:
+            if name not in self._column_index:
+                # New column, None for all previous responses
+                self._column_index[name] = len(self.columns)
+                self.columns.append(name)
+                self._data.append([None] * row)
+        for name, values in zip(self.columns, self._data):
+            values.append(self._value(response.get(name)))
+        self._id_index[response_id] = row
+        self._ids.append(response_id)
+
+    def __getitem__(self, response_id):
+        return ResponseRow(self, self._id_index[response_id])
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __repr__(self):
+        return "ColumnarResponses(%s responses, %s columns)" % (len(self._ids), len(self.columns))
+
+    def _rows(self):
+        if not self._data:
+            return [()] * len(self._ids)
+        return zip(*self._data)
+
+    def column(self, name):
+        """
+        :return: list of values of one field, in the same order as responses
+        """
+        return list(self._data[self._column_index[name]])
+
+    def to_dict(self):
+        """
+        :return: OrderedDict of OrderedDicts, same as getLegacyResponseData returns
+        """
+        return OrderedDict((response_id, OrderedDict(zip(self.columns, values)))
+                           for response_id, values in zip(self._ids, self._rows()))
+
+    def to_records(self):
+        """
+        :return: list of dictionaries with ResponseID and all fields of every response
+        """
+        return [OrderedDict([("ResponseID", response_id)] + list(zip(self.columns, values)))
+                for response_id, values in zip(self._ids, self._rows())]
+
+    def to_dataframe(self):
+        """
+        :return: pandas.DataFrame indexed by ResponseID, one column per field
+        :raise ImportError: if pandas is not installed
+        """
+        import pandas
+        return pandas.DataFrame(OrderedDict(zip(self.columns, self._data)),
+                                index=pandas.Index(self._ids, name="ResponseID"), columns=self.columns)
+
+
+# Column types
+INT = "int"
+FLOAT = "float"
+STRING = "string"
+
+_INT_RE = re.compile(r"^-?(0|[1-9][0-9]*)$")
+# Range of int column (int64)
+_INT_MIN = -2 ** 63
+_INT_MAX = 2 ** 63 - 1
+# Numbers with leading zeros (zip codes, phone numbers) are kept as strings
+_FLOAT_RE = re.compile(r"^-?(0|[1-9][0-9]*)(\.[0-9]+)?([eE][-+]?[0-9]+)?$")
+
+if sys.version_info >= (3, 0):
+    _TEXT = str
+else:
+    # Python 2.7
+    _TEXT = (str, unicode)
+
+
+def _is_null(value):
+    return value is None or value == ""
+
+
+def _matches(value, type):
+    if type == STRING:
+        return True
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, _TEXT):
+        value = value.strip()
+        if _INT_RE.match(value):
+            # Integers out of int64 range (long IDs) match neither int nor float, so all digits are kept
+            return len(value.lstrip("-")) <= 19 and _INT_MIN <= int(value) <= _INT_MAX
+        return type == FLOAT and _FLOAT_RE.match(value) is not None
+    if isinstance(value, int) or (sys.version_info < (3, 0) and isinstance(value, long)):
+        return _INT_MIN <= value <= _INT_MAX
+    return type == FLOAT and isinstance(value, float)
+
+
+def infer_type(values):
+    """ Most specific type (int, float or string) of all non-empty values. Column without values is string
+    """
+    values = [value for value in values if not _is_null(value)]
+    if not values:
+        return STRING
+    for type in (INT, FLOAT):
+        if all(_matches(value, type) for value in values):
+            return type
+    return STRING
+
+
+def _convert(value, type):
+    if _is_null(value):
+        return None
+    if type == INT:
+        return int(value)
+    if type == FLOAT:
+        return float(value)
+    if isinstance(value, _TEXT):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    if isinstance(value, float):
+        # str() of Python 2.7 rounds floats to 12 digits
+        return repr(value)
+    return str(value)
+
+
+def _widen(type, value):
+    """ Narrowest type wider than type which matches value
+    """
+    if type == INT and _matches(value, FLOAT):
+        return FLOAT
+    return STRING
+
+
+class ColumnarWriter(object):
+    """ Writes responses (mappings of field name to value) to a columnar file.
+
+    Type of every column (int, float or string) is inferred from the first sample_rows responses, empty strings
+    are stored as nulls. If a later value does not match the inferred type ("N/A" in a numeric column), the column
+    is widened (int to float or to string) and row groups already written are rewritten with the new type (numbers
+    converted to strings are written as str() of the number, "1.0" for 1 first widened to float); columns listed
+    in types parameter are never widened. Integers out of int64 range (20-digit IDs) are strings. Responses are written in row groups of row_group_size rows,
+    so memory usage does not depend on the number of responses.
+
+    The file is written to <path>.tmp and renamed to path by close(). If an exception occurs in the with block,
+    the partial file is deleted (see abort).
+
+    Engines:
+        parquet: Apache Parquet file (requires pyarrow library)
+        qcol: file format of this module, read by read_columnar. Columns are compressed separately,
+        so reading a few columns does not require decompressing the others
+
+    Example:
+        with ColumnarWriter("SV_123.parquet") as writer:
+            for response in reader:
+                writer.write(response)
+    """
+    def __init__(self, path, sample_rows=1000, row_group_size=65536, types=None, engine=None):
+        """
+        :param path: Output file
+        :param sample_rows: Number of responses used to infer column types
+        :param row_group_size: Number of responses in one row group
+        :param types: Dictionary of column name to type (int, float or string), overrides inferred types
+        :param engine: parquet or qcol. If None, parquet is used if pyarrow is installed
+        :raise ImportError: if engine is parquet and pyarrow is not installed
+        """
+        if engine is None:
+            try:
+                import pyarrow
+                engine = "parquet"
+            except ImportError:
+                engine = "qcol"
+        if engine not in ("parquet", "qcol"):
+            raise ValueError("Unknown engine %s, expected parquet or qcol" % engine)
+        if engine == "parquet":
+            import pyarrow
+            import pyarrow.parquet
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self.engine = engine
+        self.sample_rows = sample_rows
+        self.row_group_size = row_group_size
+        self.types = OrderedDict()
+        self._override = dict(types or {})
+        self.columns = None
+        # Column name to the type inferred from the sample, for columns widened later
+        self.widened = OrderedDict()
+        self.rows_written = 0
+        self._sample = []
+        self._buffer = None
+        self._writer = None
+
+    def write(self, response):
+        """ Add one response
+        :raise ValueError: if value does not match the type of its column specified in types parameter,
+        or the response has a field which was not present in the sample
+        """
+        if self.columns is None:
+            self._sample.append(response)
+            if len(self._sample) >= self.sample_rows:
+                self._start()
+            return
+        self._append(response)
+        if len(self._buffer[0]) >= self.row_group_size:
+            self._flush()
+
+    def _start(self):
+        columns = OrderedDict()
+        for response in self._sample:
+            for name in response:
+                columns[name] = True
+        self.columns = list(columns)
+        for name in self.columns:
+            self.types[name] = self._override.get(name) or infer_type(
+                response.get(name) for response in self._sample)
+        self._buffer = [[] for _ in self.columns]
+        self._open()
+        sample, self._sample = self._sample, None
+        for response in sample:
+            self.write(response)
+
+    def _append(self, response):
+        for name in response:
+            if name not in self.types:
+                raise ValueError("Column %s was not present in the first %s rows" % (name, self.sample_rows))
+        for index, name in enumerate(self.columns):
+            value = response.get(name)
+            type = self.types[name]
+            if not _is_null(value) and not _matches(value, type):
+                if name in self._override:
+                    raise ValueError("Value %r of column %s is not %s" % (value, name, type))
+                type = self._change_type(index, _widen(type, value))
+            self._buffer[index].append(_convert(value, type))
+
+    def _change_type(self, index, type):
+        """ Change type of a column. Buffered values are converted, row groups already written are rewritten
+
+        :return: type
+        """
+        name = self.columns[index]
+        self.widened.setdefault(name, self.types[name])
+        self.types[name] = type
+        self._buffer[index] = [_convert(value, type) for value in self._buffer[index]]
+        self._writer.close()
+        if not self.rows_written:
+            self._open()
+            return type
+        previous = self.tmp_path + ".old"
+        _replace(self.tmp_path, previous)
+        try:
+            self._open()
+            for buffer in _row_groups(previous, self.engine):
+                self._write_row_group([[_convert(value, self.types[name]) for value in values]
+                                       for name, values in zip(self.columns, buffer)])
+        finally:
+            os.remove(previous)
+        return type
+
+    def _open(self):
+        if self.engine == "parquet":
+            import pyarrow
+            import pyarrow.parquet
+            arrow_types = {INT: pyarrow.int64(), FLOAT: pyarrow.float64(), STRING: pyarrow.string()}
+            self._schema = pyarrow.schema([(name, arrow_types[self.types[name]]) for name in self.columns])
+            self._writer = pyarrow.parquet.ParquetWriter(self.tmp_path, self._schema)
+        else:
+            self._writer = _QcolWriter(self.tmp_path, [(name, self.types[name]) for name in self.columns])
+
+    def _write_row_group(self, buffer):
+        if self.engine == "parquet":
+            import pyarrow
+            arrays = [pyarrow.array(values, type=field.type) for values, field in zip(buffer, self._schema)]
+            self._writer.write_table(pyarrow.Table.from_arrays(arrays, schema=self._schema))
+        else:
+            self._writer.write_row_group(buffer)
+
+    def _flush(self):
+        rows = len(self._buffer[0]) if self._buffer else 0
+        if not rows:
+            return
+        self._write_row_group(self._buffer)
+        self.rows_written += rows
+        self._buffer = [[] for _ in self.columns]
+
+    def close(self):
+        """ Write remaining responses, close the file and rename it to path
+        """
+        if self._writer is None and self.columns is not None:
+            # Already closed
+            return
+        try:
+            if self.columns is None:
+                # Less than sample_rows responses
+                self._start()
+            self._flush()
+            self._writer.close()
+            self._writer = None
+            _replace(self.tmp_path, self.path)
+        except Exception:
+            self.abort()
+            raise
+
+    def abort(self):
+        """ Close and delete the partially written file. Nothing is written to path
+        """
+        writer, self._writer = self._writer, None
+        try:
+            if writer is not None:
+                writer.close()
+        finally:
+            if os.path.exists(self.tmp_path):
+                os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+# qcol format:
+#   MAGIC
+#   column chunks: zlib compressed (null flags: 1 byte per row, values)
+#   footer: JSON {"columns": [[name, type], ...], "row_groups": [{"rows": n, "chunks": [[offset, size], ...]}]}
+#   footer size (8 bytes, little endian), MAGIC
+# Values: int - 8 byte integers, float - 8 byte doubles, string - 4 byte lengths followed by UTF-8 data
+MAGIC = b"QCOL1\n"
+_ARRAY_CODES = {INT: "q", FLOAT: "d"}
+
+
+def _le_array(code, values):
+    data = array.array(code, values)
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data.tostring() if sys.version_info < (3, 0) else data.tobytes()
+
+
+def _from_le_array(code, data):
+    values = array.array(code)
+    if sys.version_info >= (3, 0):
+        values.frombytes(data)
+    else:
+        values.fromstring(data)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+def _encode_chunk(values, type):
+    nulls = bytearray(1 if value is None else 0 for value in values)
+    if type == STRING:
+        encoded = [value.encode("utf-8") if value is not None else b"" for value in values]
+        data = _le_array("I", [len(value) for value in encoded]) + b"".join(encoded)
+    else:
+        data = _le_array(_ARRAY_CODES[type], [0 if value is None else value for value in values])
+    return zlib.compress(bytes(nulls) + data)
+
+
+def _decode_chunk(chunk, type, rows):
+    data = zlib.decompress(chunk)
+    nulls, data = bytearray(data[:rows]), data[rows:]
+    if type == STRING:
+        lengths = _from_le_array("I", data[:4 * rows])
+        values = []
+        position = 4 * rows
+        for length in lengths:
+            values.append(data[position:position + length].decode("utf-8"))
+            position += length
+    else:
+        values = list(_from_le_array(_ARRAY_CODES[type], data))
+    return [None if null else value for null, value in zip(nulls, values)]
+
+
+class _QcolWriter(object):
+    def __init__(self, path, columns):
+        self.columns = columns
+        self.row_groups = []
+        self.fp = open(path, "wb")
+        self.fp.write(MAGIC)
+
+    def write_row_group(self, buffer):
+        chunks = []
+        for (name, type), values in zip(self.columns, buffer):
+            chunk = _encode_chunk(values, type)
+            chunks.append([self.fp.tell(), len(chunk)])
+            self.fp.write(chunk)
+        self.row_groups.append({"rows": len(buffer[0]), "chunks": chunks})
+
+    def close(self):
+        footer = json.dumps({"columns": self.columns, "row_groups": self.row_groups}).encode("utf-8")
+        self.fp.write(footer)
+        self.fp.write(struct.pack("<Q", len(footer)) + MAGIC)
+        self.fp.close()
+
+
+def read_columnar(path, columns=None):
+    """ Read file written by ColumnarWriter with qcol engine. Only requested columns are decompressed
+
+    :param columns: Names of columns to read (all columns if None)
+    :return: OrderedDict of column name to list of values
+    :raise ValueError: if file is not in qcol format
+    """
+    with open(path, "rb") as fp:
+        footer = _read_footer(fp, path)
+        positions = OrderedDict((name, (index, type)) for index, (name, type) in enumerate(footer["columns"]))
+        if columns is None:
+            columns = list(positions)
+        result = OrderedDict()
+        for name in columns:
+            index, type = positions[name]
+            values = []
+            for row_group in footer["row_groups"]:
+                offset, length = row_group["chunks"][index]
+                fp.seek(offset)
+                values.extend(_decode_chunk(fp.read(length), type, row_group["rows"]))
+            result[name] = values
+        return result
+
+
+def _read_footer(fp, path):
+    if fp.read(len(MAGIC)) != MAGIC:
+        raise ValueError("%s is not a qcol file" % path)
+    fp.seek(-(8 + len(MAGIC)), 2)
+    size = struct.unpack("<Q", fp.read(8))[0]
+    fp.seek(-(8 + len(MAGIC) + size), 2)
+    return json.loads(fp.read(size).decode("utf-8"))
+
+
+def _row_groups(path, engine):
+    """ Row groups of a file written by ColumnarWriter, one at a time
+
+    :return: generator of lists of columns (lists of values)
+    """
+    if engine == "parquet":
+        import pyarrow.parquet
+        parquet_file = pyarrow.parquet.ParquetFile(path)
+        for index in range(parquet_file.num_row_groups):
+            table = parquet_file.read_row_group(index)
+            yield [column.to_pylist() for column in table.columns]
+        return
+    with open(path, "rb") as fp:
+        footer = _read_footer(fp, path)
+        for row_group in footer["row_groups"]:
+            buffer = []
+            for (name, type), (offset, length) in zip(footer["columns"], row_group["chunks"]):
+                fp.seek(offset)
+                buffer.append(_decode_chunk(fp.read(length), type, row_group["rows"]))
+            yield buffer
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the pyqualtrics package.
+# For copyright and licensing information about this package, see the
+# NOTICE.txt and LICENSE.txt files in its top-level directory; they are
+# available at https://github.com/Baguage/pyqualtrics
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" CSV documents built incrementally, for uploading imports (importPanel, importResponses) without keeping
+the whole document in memory.
+
+CSVBody is passed to requests as request body: requests iterates over it and sends the document
+in chunked transfer encoding, one chunk of UTF-8 encoded CSV at a time.
+
+split_csv splits a CSV document into several smaller documents on row boundaries, for imports exceeding
+the size of POST request accepted by Qualtrics.
+"""
+import csv
+import io
+import itertools
+import sys
+
+
+class CSVBody(object):
+    """ CSV document made of dictionaries, encoded on the fly.
+
+    Iterating over CSVBody yields chunks (bytes) of the document. If rows is a list (or other re-iterable
+    collection), CSVBody can be iterated many times, so the upload can be repeated. If rows is an iterator
+    (generator etc), replayable is False and iterating over CSVBody again raises ValueError instead of producing
+    a document without rows.
+    """
+    def __init__(self, rows, fieldnames, header_rows=1, chunk_size=65536):
+        """
+        :param rows: iterable of dictionaries (list, generator etc)
+        :param fieldnames: Column names, in order
+        :param header_rows: Number of times the header row is written
+        :param chunk_size: Approximate size of chunks, in bytes
+        """
+        self.rows = rows
+        self.fieldnames = list(fieldnames)
+        self.header_rows = header_rows
+        self.chunk_size = chunk_size
+        self._consumed = False
+
+    @property
+    def replayable(self):
+        """ True if the document can be produced more than once
+        """
+        return replayable(self.rows)
+
+    def __iter__(self):
+        return self._iter(self.chunk_size)
+
+    def records(self):
+        """ Encoded rows (bytes) of the document, header rows included
+        """
+        return self._iter(0)
+
+    def _iter(self, chunk_size):
+        if self._consumed and not self.replayable:
+            raise ValueError("CSV document made of an iterator can be produced only once")
+        self._consumed = True
+        if sys.version_info >= (3, 0):
+            fp = io.StringIO()
+        else:
+            # Python 2.7, csv module works with byte strings
+            fp = io.BytesIO()
+        writer = csv.DictWriter(fp, fieldnames=self.fieldnames)
+        header = dict(zip(self.fieldnames, self.fieldnames))
+        for row in itertools.chain(itertools.repeat(header, self.header_rows), self.rows):
+            writer.writerow(_encode(row))
+            if fp.tell() >= chunk_size:
+                yield _chunk(fp)
+        if fp.tell():
+            yield _chunk(fp)
+
+
+def replayable(data):
+    """ True if data (request body, rows etc) can be iterated more than once. Iterators, generators and
+    files are consumed by the first iteration
+    """
+    if isinstance(data, CSVBody):
+        return data.replayable
+    try:
+        return iter(data) is not data
+    except TypeError:
+        # Not iterable
+        return True
+
+
+def _encode(row):
+    if sys.version_info >= (3, 0):
+        return row
+    # Python 2.7
+    return dict((name, value.encode("utf-8") if isinstance(value, unicode) else value)
+                for name, value in row.items())
+
+
+def _chunk(fp):
+    value = fp.getvalue()
+    fp.seek(0)
+    fp.truncate()
+    if sys.version_info >= (3, 0):
+        return value.encode("utf-8")
+    return value
+
+
+def peek_fieldnames(rows):
+    """ Column names of a CSV document made of rows: keys of the first row
+
+    :param rows: iterable of dictionaries
+    :return: tuple (list of column names or None if rows is empty, iterable of all rows)
+    """
+    if isinstance(rows, (list, tuple)):
+        # Keep rows re-iterable
+        return (list(rows[0].keys()) if rows else None), rows
+    iterator = iter(rows)
+    try:
+        first = next(iterator)
+    except StopIteration:
+        return None, []
+    return list(first.keys()), itertools.chain([first], iterator)
+
+
+def _records(document):
+    """ Rows of CSV document (bytes), including line terminators. Quoted values may contain line breaks
+    """
+    record = []
+    quotes = 0
+    for line in io.BytesIO(document):
+        record.append(line)
+        # Line break is inside quoted value if number of quotes so far is odd ("" is escaped quote)
+        quotes += line.count(b'"')
+        if quotes % 2 == 0:
+            yield b"".join(record)
+            record = []
+            quotes = 0
+    if record:
+        yield b"".join(record)
+
+
+def split_csv(document, max_size, header=True):
+    """ Split CSV document into documents of at most max_size bytes (unless a single row is larger),
+    on row boundaries. If header is True, the first row is repeated in every document.
+
+    :param document: CSV document (string, bytes or CSVBody)
+    :param max_size: Maximum size of a document in bytes
+    :param header: True if the first row contains column names
+    :return: generator of documents (bytes, UTF-8 encoded). At least one document is generated
+    """
+    if isinstance(document, CSVBody):
+        records = document.records()
+        header_size = document.header_rows if header else 0
+    else:
+        if not isinstance(document, bytes):
+            document = document.encode("utf-8")
+        records = _records(document)
+        header_size = 1 if header else 0
+    head = b"".join(itertools.islice(records, header_size))
+    chunk = []
+    size = len(head)
+    emitted = False
+    for record in records:
+        if chunk and size + len(record) > max_size:
+            yield head + b"".join(chunk)
+            emitted = True
+            chunk = []
+            size = len(head)
+        chunk.append(record)
+        size += len(record)
+    if chunk or not emitted:
+        yield head + b"".join(chunk)
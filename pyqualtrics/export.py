@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the pyqualtrics package.
+# For copyright and licensing information about this package, see the
+# NOTICE.txt and LICENSE.txt files in its top-level directory; they are
+# available at https://github.com/Baguage/pyqualtrics
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Reading response export files (API v3) without loading them into memory
+"""
+import csv
+import io
+import itertools
+import json
+import os
+import shutil
+import sys
+import time
+import zipfile
+from collections import OrderedDict
+from xml.etree import ElementTree
+
+from pyqualtrics.columnar import ColumnarWriter
+from pyqualtrics.polling import AdaptivePoller, DeadlineExceeded, Scheduler
+from pyqualtrics.streaming import iter_json_items
+
+# Parser used for each export format (and for each file extension in the zip archive)
+PARSERS = {
+    "csv": "csv",
+    "csv2013": "csv",
+    "json": "json",
+    "xml": "xml",
+}
+
+# Header rows of CSV exports after the first one (question texts, import IDs), which are not responses
+EXTRA_HEADER_ROWS = {
+    "csv": 2,
+    "csv2013": 1,
+}
+
+
+class ExportError(Exception):
+    """ Response export of one survey failed (used internally by ExportOrchestrator)
+    """
+
+
+def _iter_csv(fh):
+    if sys.version_info >= (3, 0):
+        # Python 3.5. utf-8-sig strips byte order mark Qualtrics puts in the beginning of CSV files
+        fp = io.TextIOWrapper(fh, encoding="utf-8-sig", newline="")
+    else:
+        # Python 2.7, csv module works with byte strings
+        fp = fh
+    return csv.DictReader(fp)
+
+
+def _iter_json(fh):
+    for index, response in iter_json_items(fh, key="responses", object_pairs_hook=OrderedDict):
+        yield response
+
+
+def _iter_xml(fh):
+    # <Responses><Response><startDate>...</startDate>...</Response>...</Responses>
+    root = None
+    for event, element in ElementTree.iterparse(fh, events=("start", "end")):
+        if root is None:
+            root = element
+        if event == "end" and element.tag == "Response":
+            yield OrderedDict((child.tag, child.text) for child in element)
+            # Parsed elements are not needed anymore
+            element.clear()
+            root.clear()
+
+
+class ExportReader(object):
+    """ Iterable over responses in a response export file. The zip archive is spooled to a temporary file,
+    the export file inside it is decompressed and parsed while iterating, one response at a time.
+
+    Each response is a dictionary (OrderedDict for json and xml formats, csv.DictReader row for csv formats).
+    For csv formats the first header row is used as field names. Additional header rows (question texts and
+    import IDs, header_rows is the number of such rows) are skipped if format was specified, because export
+    file name does not tell csv and csv2013 formats apart.
+
+    Attributes:
+        name: name of the file in the zip archive
+        format: export format (csv, json or xml)
+        bytes_downloaded: size of the zip archive downloaded from Qualtrics
+        rows_parsed: number of responses returned so far
+        header_rows: number of additional CSV header rows skipped by the reader
+    """
+    def __init__(self, archive_file, bytes_downloaded=0, format=None, skip_header_rows=True):
+        """
+        :param archive_file: Open file (seekable) with zip archive returned by Qualtrics
+        :param bytes_downloaded: Size of the archive
+        :param format: Export format. If None, it is guessed from file name in the archive
+        :param skip_header_rows: If False, additional CSV header rows are returned as responses
+        :raise zipfile.BadZipfile: if archive_file is not a zip archive
+        :raise ValueError: if format is not supported
+        """
+        self.archive_file = archive_file
+        self.archive = zipfile.ZipFile(archive_file)
+        # Assuming there is only one file in zip archive returned by Qualtrics
+        self.name = self.archive.namelist()[0]
+        self.header_rows = EXTRA_HEADER_ROWS.get(format, 0) if skip_header_rows else 0
+        if format is None:
+            format = os.path.splitext(self.name)[1].lstrip(".").lower()
+        if format not in PARSERS:
+            raise ValueError("Export format %s is not supported by ExportReader" % format)
+        self.format = PARSERS[format]
+        self.bytes_downloaded = bytes_downloaded
+        self.rows_parsed = 0
+
+    def __iter__(self):
+        parser = {"csv": _iter_csv, "json": _iter_json, "xml": _iter_xml}[self.format]
+        fh = self.archive.open(self.name, "r")
+        try:
+            for row in itertools.islice(parser(fh), self.header_rows, None):
+                self.rows_parsed += 1
+                yield row
+        finally:
+            fh.close()
+
+    def to_columnar(self, path, skip_rows=0, **kwargs):
+        """ Write responses to a typed columnar file (see columnar.ColumnarWriter)
+
+        :param path: Output file
+        :param skip_rows: Number of responses to skip (header rows are already skipped, see header_rows)
+        :param kwargs: Additional parameters for ColumnarWriter (sample_rows, row_group_size, types, engine)
+        :return: closed ColumnarWriter (rows_written, columns, types, widened and engine attributes)
+        """
+        with ColumnarWriter(path, **kwargs) as writer:
+            for response in itertools.islice(self, skip_rows, None):
+                writer.write(response)
+        return writer
+
+    def close(self):
+        self.archive.close()
+        self.archive_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class ExportOrchestrator(object):
+    """ Exports responses of many surveys at once (API v3).
+
+    All exports are started concurrently and polled from a single scheduling loop (polling.Scheduler, each export
+    has its own polling.AdaptivePoller), completed exports are downloaded and unzipped while others are still
+    in progress.
+    At most max_concurrency API calls or downloads run at the same time. Failure of one export does not affect
+    the others.
+
+    Result of run() is a manifest (also saved as manifest.json in the target directory):
+    {
+        "started": 1496000000.0, "elapsed": 123.4,
+        "surveys": {
+            "SV_123": {"status": "complete", "error": None, "responseExportId": "ES_abc",
+                       "file": "/data/SV_123.csv",
+                       "timings": {"create": 0.3, "wait": 61.2, "download": 3.5, "unzip": 0.8}},
+            "SV_456": {"status": "failed", "error": "Invalid surveyId parameter.", ...},
+        }
+    }
+    """
+    def __init__(self, qualtrics, target_dir, format="csv", max_concurrency=8, timeout=None, unzip=True,
+                 min_interval=1.0, max_interval=30.0, **kwargs):
+        """
+        :param qualtrics: Qualtrics object
+        :param target_dir: Directory for downloaded files (created if does not exist)
+        :param format: Export format
+        :param max_concurrency: Maximum number of API calls and downloads running at the same time
+        :param timeout: Exports not completed in that many seconds are reported as failed
+        :param unzip: If True, file from zip archive is extracted as <SurveyID>.<extension>, and archive is deleted.
+        Otherwise <SurveyID>.zip is kept
+        :param min_interval: Minimum delay between status checks of one export, in seconds
+        :param max_interval: Maximum delay between status checks of one export, in seconds
+        :param kwargs: Additional parameters for CreateResponseExport (useLabels, limit etc)
+        """
+        self.qualtrics = qualtrics
+        self.target_dir = target_dir
+        self.format = format
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.unzip = unzip
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.kwargs = kwargs
+
+    def _create(self, surveyId):
+        responseExportId = self.qualtrics.CreateResponseExport(self.format, surveyId, **self.kwargs)
+        if responseExportId is None:
+            raise ExportError(self.qualtrics.last_error_message)
+        return responseExportId
+
+    def _poll(self, responseExportId):
+        status, data = self.qualtrics.GetResponseExportProgress(responseExportId)
+        if status == "servfail":
+            raise ExportError(data)
+        if status not in ("complete", "in progress"):
+            raise ExportError("Response export %s failed: status %s" % (responseExportId, status))
+        return status, data
+
+    def _download(self, surveyId, url):
+        filename = os.path.join(self.target_dir, "%s.zip" % surveyId)
+        if not self.qualtrics.DownloadResponseExportFile(url, filename):
+            raise ExportError(self.qualtrics.last_error_message)
+        return filename
+
+    def _unzip(self, surveyId, filename):
+        with zipfile.ZipFile(filename) as archive:
+            # Assuming there is only one file in zip archive returned by Qualtrics
+            name = archive.namelist()[0]
+            extracted = os.path.join(self.target_dir, surveyId + os.path.splitext(name)[1])
+            with archive.open(name) as src, open(extracted, "wb") as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.remove(filename)
+        return extracted
+
+    def run(self, surveyIds):
+        """ Export responses of all surveys
+
+        :param surveyIds: list of Survey IDs
+        :return: manifest (dictionary), see class description
+        """
+        if not os.path.isdir(self.target_dir):
+            os.makedirs(self.target_dir)
+        started = time.time()
+        surveys = OrderedDict()
+        scheduler = Scheduler(self.max_concurrency)
+
+        def fail(surveyId, error):
+            surveys[surveyId]["status"] = "failed"
+            surveys[surveyId]["error"] = error
+
+        for surveyId in surveyIds:
+            surveys[surveyId] = {"status": "pending", "error": None, "responseExportId": None, "file": None,
+                                 "timings": OrderedDict()}
+            # Downloads which have already started are allowed to complete after the deadline
+            scheduler.submit(surveyId, "create", self._create, (surveyId,), interruptible=True)
+            if self.timeout is not None:
+                scheduler.set_deadline(surveyId, started + self.timeout)
+
+        for surveyId, phase, result, error, duration in scheduler.run():
+            survey = surveys[surveyId]
+            if isinstance(error, DeadlineExceeded):
+                fail(surveyId, "Response export did not complete in %s seconds" % self.timeout)
+            elif error is not None:
+                fail(surveyId, str(error))
+            elif phase == "create":
+                survey["status"] = "in progress"
+                survey["timings"]["create"] = duration
+                survey["responseExportId"] = result
+                survey["poller"] = AdaptivePoller(min_interval=self.min_interval, max_interval=self.max_interval)
+                scheduler.schedule(self.min_interval, surveyId, "poll", self._poll, (result,), interruptible=True)
+            elif phase == "poll":
+                status, data = result
+                if status == "complete":
+                    survey["timings"]["wait"] = time.time() - survey["poller"].started
+                    scheduler.submit(surveyId, "download", self._download, (surveyId, data))
+                else:
+                    scheduler.schedule(survey["poller"].next_delay(data), surveyId, "poll", self._poll,
+                                       (survey["responseExportId"],), interruptible=True)
+            elif phase == "download":
+                survey["timings"]["download"] = duration
+                if self.unzip:
+                    scheduler.submit(surveyId, "unzip", self._unzip, (surveyId, result))
+                else:
+                    survey["status"] = "complete"
+                    survey["file"] = result
+            elif phase == "unzip":
+                survey["timings"]["unzip"] = duration
+                survey["status"] = "complete"
+                survey["file"] = result
+
+        for survey in surveys.values():
+            survey.pop("poller", None)
+        manifest = OrderedDict([
+            ("started", started),
+            ("elapsed", time.time() - started),
+            ("surveys", surveys),
+        ])
+        with open(os.path.join(self.target_dir, "manifest.json"), "w") as fp:
+            json.dump(manifest, fp, indent=2)
+        return manifest
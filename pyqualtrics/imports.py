@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the pyqualtrics package.
+# For copyright and licensing information about this package, see the
+# NOTICE.txt and LICENSE.txt files in its top-level directory; they are
+# available at https://github.com/Baguage/pyqualtrics
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Running many contact imports (importContacts) at once and waiting for them to complete
+"""
+import time
+from collections import OrderedDict
+
+from pyqualtrics.polling import AdaptivePoller, DeadlineExceeded, Scheduler
+
+# Values of Status field returned by checkImportContactsStatus (compared case insensitively)
+COMPLETE_STATUSES = frozenset(["complete", "completed", "done", "finished", "success"])
+FAILED_STATUSES = frozenset(["failed", "error", "cancelled", "canceled"])
+
+
+class ContactImportError(Exception):
+    """ Contact import failed (used internally by ImportJobManager)
+    """
+
+
+def import_progress(result):
+    """ Interpret result of checkImportContactsStatus
+
+    :param result: Result dictionary returned by Qualtrics
+    :return: tuple (status, percent complete or None). status is "complete", "failed" or "in progress"
+    """
+    status = str(result.get("Status", "")).lower()
+    percent = result.get("PercentComplete", result.get("Percent"))
+    try:
+        percent = float(percent) if percent is not None else None
+    except (TypeError, ValueError):
+        percent = None
+    if status in COMPLETE_STATUSES:
+        return "complete", 100.0
+    if status in FAILED_STATUSES:
+        return "failed", percent
+    return "in progress", percent
+
+
+def jobs_progress(results):
+    """ Progress of an import made of several jobs (one per part of the file, see Qualtrics.import_contacts)
+
+    :param results: Last result of checkImportContactsStatus for every job (None if not checked yet)
+    :return: tuple (status, percent complete or None), see import_progress. Import is complete when all jobs
+    are complete, and failed if any of them failed
+    """
+    progress = [import_progress(result) if result is not None else ("in progress", None) for result in results]
+    statuses = [status for status, percent in progress]
+    if "failed" in statuses:
+        return "failed", None
+    if all(status == "complete" for status in statuses):
+        return "complete", 100.0
+    percents = [percent for status, percent in progress]
+    if None in percents:
+        return "in progress", None
+    return "in progress", sum(percents) / len(percents)
+
+
+class ImportJobManager(object):
+    """ Submits many importContacts jobs and polls their status (checkImportContactsStatus) from a single
+    scheduling loop (polling.Scheduler). Each job has its own polling.AdaptivePoller, at most max_concurrency
+    API calls run at the same time. Failure of one job does not affect the others.
+
+    Files larger than Qualtrics upload limit are imported in several parts (see Qualtrics.import_contacts),
+    each part by its own Qualtrics import job. The job is complete when import jobs of all parts are complete.
+    Status is checked by JobID only, so a job fails if Qualtrics did not return JobID of any of its parts.
+
+    Example:
+        manager = ImportJobManager(qualtrics)
+        for name, contents in files:
+            manager.submit(LibraryID, name, contents, ColumnHeaders="1")
+        for job in manager.as_completed():
+            print(job["Name"], job["status"], job["error"], job["ListID"], job["timings"])
+
+    Every job is a dictionary:
+        {"LibraryID": "UR_123", "Name": "List", "status": "complete", "error": None, "ListID": "ML_123",
+         "JobIDs": ["...", "..."], "results": [{...}, {...}], "timings": {"submit": 1.2, "wait": 35.0}}
+    results are the last Results returned by checkImportContactsStatus for every JobID, status is "pending",
+    "in progress", "complete" or "failed"
+    """
+    def __init__(self, qualtrics, max_concurrency=8, timeout=None, min_interval=1.0, max_interval=30.0):
+        """
+        :param qualtrics: Qualtrics object
+        :param max_concurrency: Maximum number of API calls running at the same time
+        :param timeout: Jobs not completed in that many seconds after submission are reported as failed
+        :param min_interval: Minimum delay between status checks of one job, in seconds
+        :param max_interval: Maximum delay between status checks of one job, in seconds
+        """
+        self.qualtrics = qualtrics
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.jobs = []
+
+    def submit(self, LibraryID, Name, CSV, **kwargs):
+        """ Add import job. Jobs are started by as_completed
+
+        :param kwargs: Additional parameters for import_contacts (ColumnHeaders, ListID, max_size etc)
+        :return: job dictionary (updated while the job is running)
+        """
+        job = OrderedDict([("LibraryID", LibraryID), ("Name", Name), ("status", "pending"), ("error", None),
+                           ("ListID", None), ("JobIDs", []), ("results", []), ("timings", OrderedDict())])
+        self.jobs.append((job, CSV, kwargs))
+        return job
+
+    def _submit(self, job, CSV, kwargs):
+        ListID, failures, JobIDs = self.qualtrics.import_contacts(job["LibraryID"], job["Name"], CSV, **kwargs)
+        if failures:
+            raise ContactImportError(self.qualtrics._parts_error(failures))
+        if not JobIDs or None in JobIDs:
+            # Without JobID checkImportContactsStatus reports the last import to the list, which may be another job
+            raise ContactImportError("Qualtrics did not return JobID of contact import to %s" % ListID)
+        return ListID, JobIDs
+
+    def _poll(self, job):
+        """ Check status of import jobs which are not complete yet
+
+        :return: list of results, see jobs_progress
+        """
+        results = list(job["results"])
+        for index, JobID in enumerate(job["JobIDs"]):
+            if results[index] is not None and import_progress(results[index])[0] == "complete":
+                continue
+            result = self.qualtrics.checkImportContactsStatus(job["LibraryID"], ListID=job["ListID"], JobID=JobID)
+            if result is None:
+                raise ContactImportError(self.qualtrics.last_error_message)
+            results[index] = result
+        return results
+
+    def as_completed(self):
+        """ Start all submitted jobs and wait for them
+
+        :return: generator of job dictionaries, in order of completion (or failure)
+        """
+        jobs, self.jobs = self.jobs, []
+        scheduler = Scheduler(self.max_concurrency)
+        for index, (job, CSV, kwargs) in enumerate(jobs):
+            # Upload is not interrupted by the timeout, status checks are
+            scheduler.submit(index, "submit", self._submit, (job, CSV, kwargs))
+            if self.timeout is not None:
+                scheduler.set_deadline(index, time.time() + self.timeout)
+
+        for index, phase, result, error, duration in scheduler.run():
+            job = jobs[index][0]
+            if isinstance(error, DeadlineExceeded):
+                job["status"] = "failed"
+                job["error"] = "Contact import did not complete in %s seconds" % self.timeout
+            elif error is not None:
+                job["status"] = "failed"
+                job["error"] = str(error)
+            elif phase == "submit":
+                job["timings"]["submit"] = duration
+                job["ListID"], job["JobIDs"] = result
+                job["results"] = [None] * len(job["JobIDs"])
+                job["status"] = "in progress"
+                job["poller"] = AdaptivePoller(min_interval=self.min_interval, max_interval=self.max_interval)
+                scheduler.schedule(self.min_interval, index, "poll", self._poll, (job,), interruptible=True)
+                continue
+            else:
+                job["results"] = result
+                status, percent = jobs_progress(result)
+                if status == "in progress":
+                    scheduler.schedule(job["poller"].next_delay(percent), index, "poll", self._poll, (job,),
+                                       interruptible=True)
+                    continue
+                job["timings"]["wait"] = time.time() - job["poller"].started
+                job["status"] = status
+                if status == "failed":
+                    failed = [result for result in job["results"] if import_progress(result)[0] == "failed"]
+                    job["error"] = "Contact import %s failed: status %s" % (job["ListID"], failed[0].get("Status"))
+            job.pop("poller", None)
+            yield job
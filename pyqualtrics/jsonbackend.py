@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the pyqualtrics package.
+# For copyright and licensing information about this package, see the
+# NOTICE.txt and LICENSE.txt files in its top-level directory; they are
+# available at https://github.com/Baguage/pyqualtrics
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+""" JSON decoders used to parse API responses.
+
+The fastest installed library is used by default: orjson, then ujson, then standard json module.
+Responses which must preserve order of fields (getLegacyResponseData) are always decoded to OrderedDict
+by standard json module, because other libraries do not support object_pairs_hook.
+
+Backend can be selected per Qualtrics object (json_backend parameter) or globally with set_default_backend.
+"""
+import collections
+import json
+import sys
+
+# Name -> module name, in order of preference
+_MODULES = collections.OrderedDict([
+    ("orjson", "orjson"),
+    ("ujson", "ujson"),
+    ("json", "json"),
+])
+
+
+class Backend(object):
+    """ JSON decoder. loads(text) accepts str or bytes and raises ValueError if document is not valid JSON
+    """
+    def __init__(self, name, loads):
+        self.name = name
+        self._loads = loads
+
+    def loads(self, text):
+        return self._loads(text)
+
+    def loads_ordered(self, text):
+        """ Decode JSON document preserving order of fields (objects are decoded to OrderedDict)
+        """
+        return _json_loads(text, object_pairs_hook=collections.OrderedDict)
+
+    def __repr__(self):
+        return "Backend(%r)" % self.name
+
+
+def _json_loads(text, **kwargs):
+    if isinstance(text, bytes) and not isinstance(text, str) and sys.version_info < (3, 6):
+        # Python 3.5 json module does not accept bytes
+        text = text.decode("utf-8")
+    return json.loads(text, **kwargs)
+
+
+def available_backends():
+    """
+    :return: names of installed backends, fastest first
+    """
+    names = []
+    for name, module in _MODULES.items():
+        try:
+            __import__(module)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def get_backend(name=None):
+    """
+    :param name: orjson, ujson or json. If None, the default backend is returned
+    :return: Backend
+    :raise ImportError: if library is not installed
+    :raise ValueError: if name is unknown
+    """
+    if name is None:
+        return _default
+    if name not in _MODULES:
+        raise ValueError("Unknown JSON backend %s, expected one of %s" % (name, ", ".join(_MODULES)))
+    if name == "json":
+        return Backend(name, _json_loads)
+    module = __import__(_MODULES[name])
+    return Backend(name, module.loads)
+
+
+def set_default_backend(name):
+    """ Change backend used by Qualtrics objects created without json_backend parameter
+    """
+    global _default
+    _default = get_backend(name)
+
+
+_default = get_backend(available_backends()[0])
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the pyqualtrics package.
+# For copyright and licensing information about this package, see the
+# NOTICE.txt and LICENSE.txt files in its top-level directory; they are
+# available at https://github.com/Baguage/pyqualtrics
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Generation of unique survey links for many people at once.
+
+Every person is added to a panel (concurrent addRecipient calls) and the link is the survey link prefix followed
+by RecipientID. Results are written to a CSV or JSON Lines file in input order: input row followed by RecipientID,
+Link and Error fields. CSV columns are declared by columns parameter, or taken from the first row (from the header
+of the file when a run is resumed); keys of later rows which are not among them are not written to CSV file
+(see dropped_columns).
+
+After every checkpoint_every rows a checkpoint is saved next to the output file (<output>.checkpoint): number of
+processed input rows and size of the output file. If generation is interrupted, the next run with the same input
+and output discards rows written after the checkpoint and continues with the first unprocessed input row.
+"""
+import csv
+import itertools
+import json
+import os
+import sys
+from collections import OrderedDict
+
+from pyqualtrics.csvstream import CSVBody
+from pyqualtrics.sync import _replace
+
+# Fields added to every input row
+RESULT_FIELDS = ["RecipientID", "Link", "Error"]
+
+
+class UniqueLinkGenerator(object):
+    """ See module description
+    """
+    def __init__(self, qualtrics, SurveyID, LibraryID, PanelID, DistributionID, workers=4, rate_limit=None,
+                 checkpoint_every=1000, columns=None):
+        """
+        :param qualtrics: Qualtrics object
+        :param SurveyID: ID of the survey
+        :param LibraryID: Library of the panel
+        :param PanelID: Panel people are added to
+        :param DistributionID: ID of the distribution (EMD_xxxxxxxxxx)
+        :param workers: Number of concurrent addRecipient calls
+        :param rate_limit: Maximum number of API calls per second (None - unlimited)
+        :param checkpoint_every: Number of rows between checkpoints
+        :param columns: Input columns written to CSV file (followed by RecipientID, Link and Error). If None,
+        keys of the first row are used
+        """
+        self.qualtrics = qualtrics
+        self.SurveyID = SurveyID
+        self.LibraryID = LibraryID
+        self.PanelID = PanelID
+        self.DistributionID = DistributionID
+        self.workers = workers
+        self.rate_limit = rate_limit
+        self.checkpoint_every = checkpoint_every
+        self.columns = columns
+        # Keys of input rows which were not written to CSV file by the last run
+        self.dropped_columns = set()
+
+    def _add(self, person):
+        EmbeddedData = person.get("EmbeddedData", person.get("ED")) or {}
+        recipient_id = self.qualtrics.addRecipient(self.LibraryID, self.PanelID,
+                                                   FirstName=person.get("FirstName"),
+                                                   LastName=person.get("LastName"),
+                                                   Email=person.get("Email"),
+                                                   ExternalDataRef=person.get("ExternalDataRef", ""),
+                                                   Language=person.get("Language", "English"),
+                                                   ED=EmbeddedData)
+        return recipient_id, self.qualtrics.last_error_message
+
+    @staticmethod
+    def _load_checkpoint(path):
+        if not os.path.exists(path):
+            return {"rows": 0, "size": 0}
+        with open(path) as fp:
+            return json.load(fp)
+
+    @staticmethod
+    def _save_checkpoint(path, checkpoint):
+        tmp = path + ".tmp"
+        with open(tmp, "w") as fp:
+            json.dump(checkpoint, fp)
+            fp.flush()
+            os.fsync(fp.fileno())
+        _replace(tmp, path)
+
+    def run(self, people, path, format=None):
+        """ Generate links for people and write them to path
+
+        :param people: Iterable of dictionaries with FirstName, LastName, Email, ExternalDataRef, Language and
+        EmbeddedData keys (other keys are only copied to the output)
+        :param path: Output file. Rows are appended to it if a checkpoint of the previous run exists
+        :param format: csv or jsonl. If None, it is guessed from path extension (jsonl if it is not .csv)
+        :return: tuple (number of links generated, list of (row index, error message) tuples).
+        None if SurveyID or DistributionID is not valid (see qualtrics.last_error_message)
+        """
+        prefix = self.qualtrics._survey_link_prefix(self.SurveyID, self.DistributionID)
+        if prefix is None:
+            return None
+        if format is None:
+            format = "csv" if path.lower().endswith(".csv") else "jsonl"
+        checkpoint_path = path + ".checkpoint"
+        checkpoint = self._load_checkpoint(checkpoint_path)
+        people = itertools.islice(people, checkpoint["rows"], None)
+
+        generated = 0
+        failures = []
+        self.dropped_columns = set()
+        fieldnames = None
+        # Results are completed out of order, they are written for the longest completed prefix of the input
+        completed = {}
+        next_index = 0
+        with open(path, "ab") as fp:
+            # Discard anything written after the last checkpoint (by interrupted run)
+            fp.truncate(checkpoint["size"])
+            fp.seek(checkpoint["size"])
+            for index, person, result, error in self.qualtrics._imap(self._add, people, self.workers,
+                                                                      self.rate_limit):
+                recipient_id, message = result if error is None else (None, str(error))
+                row = OrderedDict(person)
+                row["RecipientID"] = recipient_id
+                row["Link"] = prefix + recipient_id if recipient_id is not None else None
+                row["Error"] = message if recipient_id is None else None
+                if recipient_id is None:
+                    failures.append((checkpoint["rows"] + index, message))
+                else:
+                    generated += 1
+                completed[index] = row
+                while next_index in completed:
+                    row = completed.pop(next_index)
+                    next_index += 1
+                    if format == "csv":
+                        if fieldnames is None:
+                            header = fp.tell() == 0
+                            if not header:
+                                fieldnames = _csv_header(path)
+                            elif self.columns is not None:
+                                fieldnames = [name for name in self.columns if name not in RESULT_FIELDS]
+                                fieldnames += RESULT_FIELDS
+                            else:
+                                fieldnames = [name for name in row if name not in RESULT_FIELDS] + RESULT_FIELDS
+                        self.dropped_columns.update(name for name in row if name not in fieldnames)
+                        row = dict((name, row.get(name)) for name in fieldnames)
+                        for record in CSVBody([_flatten(row)], fieldnames, header_rows=int(header)).records():
+                            fp.write(record)
+                        header = False
+                    else:
+                        fp.write(json.dumps(row).encode("utf-8") + b"\n")
+                    if next_index % self.checkpoint_every == 0:
+                        self._checkpoint(fp, checkpoint_path, checkpoint["rows"] + next_index)
+            self._checkpoint(fp, checkpoint_path, checkpoint["rows"] + next_index)
+        failures.sort()
+        return generated, failures
+
+    def _checkpoint(self, fp, checkpoint_path, rows):
+        fp.flush()
+        os.fsync(fp.fileno())
+        self._save_checkpoint(checkpoint_path, {"rows": rows, "size": fp.tell()})
+
+
+def _csv_header(path):
+    """ Column names in the first row of CSV file written by a previous run
+    """
+    with open(path, "rb") as fp:
+        line = fp.readline()
+    if sys.version_info >= (3, 0):
+        return next(csv.reader([line.decode("utf-8")]))
+    # Python 2.7, csv module works with byte strings
+    return [name.decode("utf-8") for name in next(csv.reader([line]))]
+
+
+def _flatten(row):
+    """ Dictionaries (embedded data) are written to CSV as JSON
+    """
+    return dict((name, json.dumps(value) if isinstance(value, dict) else value) for name, value in row.items())
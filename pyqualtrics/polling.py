@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the pyqualtrics package.
+# For copyright and licensing information about this package, see the
+# NOTICE.txt and LICENSE.txt files in its top-level directory; they are
+# available at https://github.com/Baguage/pyqualtrics
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Polling of long running operations (response exports, contact imports)
+"""
+import heapq
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class AdaptivePoller(object):
+    """ Computes delay before the next status check of a long running operation.
+
+    If the operation reports its progress (percent complete), completion time is predicted from the average
+    speed so far, and the next check is scheduled right at that time. Otherwise (or if progress is not changing)
+    delay grows exponentially. Delay is always between min_interval and max_interval seconds.
+    """
+    def __init__(self, min_interval=0.5, max_interval=30.0, backoff=1.5):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.started = time.time()
+        self.delay = min_interval
+        self.checks = 0
+
+    def next_delay(self, percent_complete=None):
+        """
+        :param percent_complete: Progress of the operation (0-100) reported by the last status check, if known
+        :return: Number of seconds to wait before the next status check
+        """
+        self.checks += 1
+        elapsed = time.time() - self.started
+        if percent_complete and 0 < percent_complete < 100 and elapsed > 0:
+            speed = percent_complete / elapsed
+            delay = (100.0 - percent_complete) / speed
+        else:
+            delay = self.delay * self.backoff
+        self.delay = max(self.min_interval, min(self.max_interval, delay))
+        return self.delay
+
+
+class DeadlineExceeded(Exception):
+    """ Operation did not complete before its deadline (reported by Scheduler.run)
+    """
+
+
+def _timed(func, *args):
+    """ Call func and measure how long it takes (not counting time spent in executor queue)
+
+    :return: tuple (time in seconds, result of the call)
+    """
+    started = time.time()
+    result = func(*args)
+    return time.time() - started, result
+
+
+class Scheduler(object):
+    """ Single scheduling loop for many long running operations (export.ExportOrchestrator,
+    imports.ImportJobManager).
+
+    Every operation is identified by a key and goes through phases (create, poll, download etc). Calls are run on
+    a pool of max_concurrency threads, either as soon as possible (submit) or after a delay (schedule, used for
+    status checks). run() yields the outcome of every call, and the caller submits or schedules the next call of
+    the operation. When the deadline of an operation passes, its scheduled calls and running interruptible calls
+    are dropped and DeadlineExceeded is reported once; calls which are not interruptible (uploads, downloads) are
+    allowed to complete. Results of dropped calls are never reported.
+
+    Example:
+        scheduler = Scheduler(max_concurrency=8)
+        for key in keys:
+            scheduler.submit(key, "create", create, (key,), interruptible=True)
+        for key, phase, result, error, duration in scheduler.run():
+            if phase == "create" and error is None:
+                scheduler.schedule(1.0, key, "poll", poll, (result,), interruptible=True)
+    """
+    def __init__(self, max_concurrency=8):
+        """
+        :param max_concurrency: Maximum number of calls running at the same time
+        """
+        self.max_concurrency = max_concurrency
+        # (time, sequence number, key, phase, func, args, interruptible)
+        self._scheduled = []
+        # future -> (key, phase, interruptible)
+        self._running = {}
+        self._deadlines = {}
+        # Keys of operations which exceeded their deadline
+        self._expired = set()
+        self._counter = itertools.count()
+
+    def set_deadline(self, key, deadline):
+        """
+        :param deadline: Time (as returned by time.time()) by which the operation must complete
+        """
+        self._deadlines[key] = deadline
+
+    def submit(self, key, phase, func, args=(), interruptible=False):
+        """ Call func(*args) as soon as a worker thread is available
+
+        :param interruptible: True if the call is dropped when the deadline of the operation passes
+        """
+        self.schedule(0, key, phase, func, args, interruptible)
+
+    def schedule(self, delay, key, phase, func, args=(), interruptible=False):
+        """ Call func(*args) after delay seconds, see submit
+        """
+        if key in self._expired:
+            return
+        heapq.heappush(self._scheduled, (time.time() + delay, next(self._counter), key, phase, func, args,
+                                         interruptible))
+
+    def _expire(self, now):
+        """ Drop calls of operations past their deadline
+
+        :return: list of (key, phase of a dropped call) tuples
+        """
+        if not self._deadlines:
+            return []
+        interruptible = {}
+        for entry in self._scheduled:
+            interruptible.setdefault(entry[2], entry[3])
+        busy = set()
+        for key, phase, flag in self._running.values():
+            busy.add(key)
+            if flag:
+                interruptible.setdefault(key, phase)
+        expired = []
+        for key, deadline in list(self._deadlines.items()):
+            if deadline > now:
+                continue
+            if key in interruptible:
+                expired.append((key, interruptible[key]))
+                del self._deadlines[key]
+            elif key not in busy:
+                # Completed operation
+                del self._deadlines[key]
+        if expired:
+            keys = set(key for key, phase in expired)
+            self._expired.update(keys)
+            self._scheduled = [entry for entry in self._scheduled if entry[2] not in keys]
+            heapq.heapify(self._scheduled)
+            for future, (key, phase, flag) in list(self._running.items()):
+                if key in keys and flag:
+                    # Call which has already started completes in background, its result is ignored
+                    future.cancel()
+                    del self._running[future]
+        return expired
+
+    def _next_deadline(self):
+        """ Earliest deadline of operations with calls which can be dropped (None if there is no such deadline)
+        """
+        keys = set(entry[2] for entry in self._scheduled)
+        keys.update(key for key, phase, flag in self._running.values() if flag)
+        deadlines = [self._deadlines[key] for key in keys if key in self._deadlines]
+        return min(deadlines) if deadlines else None
+
+    def run(self):
+        """ Run submitted and scheduled calls (including those added while iterating) until there are none left
+
+        :return: generator of (key, phase, result, error, duration) tuples. error is the exception raised by the
+        call (DeadlineExceeded if the operation did not complete before its deadline) or None, duration is
+        the time spent in the call in seconds
+        """
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            while self._running or self._scheduled:
+                now = time.time()
+                for key, phase in self._expire(now):
+                    yield key, phase, None, DeadlineExceeded(), None
+                # Start calls which are due
+                while self._scheduled and self._scheduled[0][0] <= now:
+                    _, _, key, phase, func, args, interruptible = heapq.heappop(self._scheduled)
+                    self._running[executor.submit(_timed, func, *args)] = (key, phase, interruptible)
+
+                wait_time = self._scheduled[0][0] - now if self._scheduled else None
+                deadline = self._next_deadline()
+                if deadline is not None:
+                    wait_time = min(wait_time, deadline - now) if wait_time is not None else deadline - now
+                if wait_time is not None:
+                    wait_time = max(wait_time, 0)
+                if not self._running:
+                    if not self._scheduled:
+                        break
+                    time.sleep(wait_time)
+                    continue
+                done, _ = wait(list(self._running), timeout=wait_time, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key, phase, _ = self._running.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        yield key, phase, None, error, None
+                        continue
+                    duration, result = future.result()
+                    yield key, phase, result, None, duration
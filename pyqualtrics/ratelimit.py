@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the pyqualtrics package.
+# For copyright and licensing information about this package, see the
+# NOTICE.txt and LICENSE.txt files in its top-level directory; they are
+# available at https://github.com/Baguage/pyqualtrics
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Client-side rate limiting of API calls.
+
+TokenBucket limits calls made by threads of one process. FileTokenBucket keeps the state of the bucket in a file
+(protected by a file lock), so several processes on one host can share the same budget.
+"""
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+
+
+class TokenBucket(object):
+    """ Thread-safe token bucket: allows `rate` calls per second on average, with bursts up to `capacity` calls.
+    """
+    def __init__(self, rate, capacity=None):
+        """
+        :param rate: Number of calls per second
+        :param capacity: Maximum burst size (defaults to rate, but not less than 1)
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self._tokens = self.capacity
+        self._timestamp = time.time()
+        self._lock = threading.Lock()
+
+    def _update(self, stored, timestamp, now, tokens):
+        """ Refill bucket which had `stored` tokens at `timestamp` and try to take `tokens` from it
+
+        :return: tuple (number of tokens left in the bucket, delay). delay is 0 if tokens were taken, otherwise
+        number of seconds to wait before trying again
+        """
+        stored = min(self.capacity, stored + max(now - timestamp, 0) * self.rate)
+        if stored >= tokens:
+            return stored - tokens, 0
+        return stored, (tokens - stored) / self.rate
+
+    def _take(self, tokens):
+        """ Take tokens from the bucket if there are enough of them.
+
+        :return: 0 if tokens were taken, otherwise number of seconds to wait before trying again
+        """
+        with self._lock:
+            now = time.time()
+            self._tokens, delay = self._update(self._tokens, self._timestamp, now, tokens)
+            self._timestamp = now
+            return delay
+
+    def acquire(self, tokens=1):
+        """ Block until the call is allowed
+        """
+        while True:
+            delay = self._take(tokens)
+            if not delay:
+                return
+            time.sleep(delay)
+
+
+class FileTokenBucket(TokenBucket):
+    """ Token bucket shared by all processes (and threads) using the same state file.
+    The file is created if it does not exist. Available on POSIX systems only.
+    """
+    def __init__(self, path, rate, capacity=None):
+        """
+        :param path: State file, for example /tmp/qualtrics-<user>.bucket
+        :param rate: Number of calls per second (for all processes together)
+        :param capacity: Maximum burst size (defaults to rate, but not less than 1)
+        """
+        if fcntl is None:
+            raise NotImplementedError("FileTokenBucket requires fcntl module (POSIX systems)")
+        super(FileTokenBucket, self).__init__(rate, capacity)
+        self.path = path
+
+    def _take(self, tokens):
+        # Thread lock is needed as well: flock is not guaranteed to exclude threads of one process
+        with self._lock:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                now = time.time()
+                try:
+                    stored, timestamp = [float(value) for value in os.read(fd, 64).split()]
+                except ValueError:
+                    # New (empty) or corrupted file - bucket is full
+                    stored, timestamp = self.capacity, now
+                stored, delay = self._update(stored, timestamp, now, tokens)
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.ftruncate(fd, 0)
+                os.write(fd, ("%r %r" % (stored, now)).encode("ascii"))
+                return delay
+            finally:
+                # Closing the file releases the lock
+                os.close(fd)
+
+
+def rate_limiter(value):
+    """ Rate limiter for the value of rate_limit parameter: None (no limit), number of calls per second
+    (new TokenBucket) or an object with acquire() method, returned as is
+    """
+    if value is None or hasattr(value, "acquire"):
+        return value
+    return TokenBucket(value)
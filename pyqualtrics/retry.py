@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the pyqualtrics package.
+# For copyright and licensing information about this package, see the
+# NOTICE.txt and LICENSE.txt files in its top-level directory; they are
+# available at https://github.com/Baguage/pyqualtrics
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+""" Retrying failed API calls (network errors, throttling and server errors)
+"""
+import calendar
+import random
+import time
+from email.utils import parsedate_tz, mktime_tz
+
+# HTTP status codes of responses which are worth retrying
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+# v2 API calls which create something or send e-mails. Repeating such a call after it reached the server
+# may create a duplicate, so they are retried only if the server has not processed them
+# (connection could not be established or HTTP 429 Too Many Requests)
+NON_IDEMPOTENT = frozenset([
+    "addRecipient",
+    "createDistribution",
+    "createPanel",
+    "importContacts",
+    "importPanel",
+    "importResponses",
+    "importSurvey",
+    "sendReminder",
+    "sendSurveyToIndividual",
+    "sendSurveyToPanel",
+    "subscribe",
+])
+
+
+def parse_retry_after(value):
+    """ Parse value of Retry-After header: number of seconds or HTTP date
+
+    :return: Number of seconds to wait or None if value is not valid
+    """
+    if value is None:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    parsed = parsedate_tz(value)
+    if parsed is None:
+        return None
+    if parsed[9] is None:
+        return max(calendar.timegm(parsed[:9]) - time.time(), 0.0)
+    return max(mktime_tz(parsed) - time.time(), 0.0)
+
+
+class RetryPolicy(object):
+    """ When and how long to wait before repeating a failed API call.
+
+    Delay before the n-th retry is backoff * backoff_factor ** (n - 1) seconds (but not more than max_backoff).
+    With jitter, random delay between 0 and that value is used instead, so concurrent clients do not retry
+    at the same moment. If server sends Retry-After header, client waits at least that long
+    (but not more than max_retry_after seconds).
+    """
+    def __init__(self, max_attempts=4, backoff=0.5, backoff_factor=2.0, max_backoff=30.0, jitter=True,
+                 retry_statuses=RETRY_STATUSES, respect_retry_after=True, max_retry_after=300.0,
+                 retry_non_idempotent=False):
+        """
+        :param max_attempts: Maximum number of attempts (including the first one)
+        :param backoff: Delay before the first retry, in seconds
+        :param backoff_factor: Delay is multiplied by this number after every retry
+        :param max_backoff: Maximum delay (without Retry-After), in seconds
+        :param jitter: If True, random delay between 0 and computed value is used
+        :param retry_statuses: HTTP status codes to retry
+        :param respect_retry_after: If True, Retry-After header of 429 and 503 responses is honoured
+        :param max_retry_after: Maximum delay requested by Retry-After header, in seconds
+        :param retry_non_idempotent: If True, API calls from NON_IDEMPOTENT set (and v3 POST calls) are retried
+        as any other call. Otherwise they are repeated only if server has not processed them
+        """
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_statuses = frozenset(retry_statuses)
+        self.respect_retry_after = respect_retry_after
+        self.max_retry_after = max_retry_after
+        self.retry_non_idempotent = retry_non_idempotent
+
+    def backoff_delay(self, retry):
+        """
+        :param retry: Number of the retry, starting from 1
+        :return: Delay in seconds, not taking Retry-After into account
+        """
+        delay = min(self.max_backoff, self.backoff * self.backoff_factor ** (retry - 1))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+    def next_delay(self, attempts, idempotent, status=None, sent=True, retry_after=None):
+        """ Decide if failed API call should be repeated
+
+        :param attempts: Number of attempts made so far
+        :param idempotent: False if repeating the call may have side effects (see NON_IDEMPOTENT)
+        :param status: HTTP status code of the response, None if request failed with network error or timeout
+        :param sent: False if request has certainly not reached the server (connection was not established)
+        :param retry_after: Value of Retry-After header of the response
+        :return: Number of seconds to wait before the next attempt or None if call should not be repeated
+        """
+        if attempts >= self.max_attempts:
+            return None
+        if status is not None and status not in self.retry_statuses:
+            return None
+        if not idempotent and not self.retry_non_idempotent and sent and status != 429:
+            return None
+        delay = self.backoff_delay(attempts)
+        if self.respect_retry_after:
+            requested = parse_retry_after(retry_after)
+            if requested is not None:
+                delay = max(delay, min(requested, self.max_retry_after))
+        return delay
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the pyqualtrics package.
+# For copyright and licensing information about this package, see the
+# NOTICE.txt and LICENSE.txt files in its top-level directory; they are
+# available at https://github.com/Baguage/pyqualtrics
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Incremental parsing of large JSON documents.
+
+Qualtrics returns survey responses as one JSON document: an object {ResponseID: response, ...} (API v2)
+or {"responses": [response, ...]} (API v3 export). iter_json_items reads such a document from a file-like
+object chunk by chunk and yields one response at a time, so memory usage is bounded by the size of the largest
+response, not by the size of the document.
+"""
+import codecs
+import json
+
+WHITESPACE = " \t\n\r"
+
+
+class _Scanner(object):
+    """ Text buffer on top of a file-like object. Only unparsed part of the document is kept in memory
+    """
+    def __init__(self, fp, chunk_size, decoder):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.decoder = decoder
+        self.text_decoder = None
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _read(self, size):
+        if self.eof:
+            return False
+        raw = self.fp.read(size)
+        chunk = raw
+        if isinstance(raw, bytes) and not isinstance(raw, str):
+            # Python 3, binary file. JSON documents returned by Qualtrics are UTF-8 encoded.
+            # Multibyte characters may be split between chunks, incremental decoder keeps their beginning
+            if self.text_decoder is None:
+                self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+            chunk = self.text_decoder.decode(raw, final=not raw)
+        if not raw:
+            self.eof = True
+            if not chunk:
+                return False
+        # Drop parsed part of the buffer
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """ Next non-whitespace character (None at the end of the document)
+        """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._read(self.chunk_size):
+                return None
+
+    def expect(self, chars):
+        char = self.peek()
+        if char is None or char not in chars:
+            raise ValueError("Expecting one of '%s' at position %s, got %r" % (chars, self.pos, char))
+        self.pos += 1
+        return char
+
+    def value(self):
+        """ Decode next JSON value
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # Number at the very end of the buffer may be incomplete ("12" of "123")
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except ValueError:
+                if self.eof:
+                    raise
+            # Value does not fit in the buffer, read more.
+            # Buffer grows exponentially, so large values are not re-parsed too many times
+            self._read(max(self.chunk_size, len(self.buffer) - self.pos))
+
+
+def _iter_array(scanner):
+    scanner.expect("[")
+    if scanner.peek() == "]":
+        scanner.pos += 1
+        return
+    index = 0
+    while True:
+        yield index, scanner.value()
+        index += 1
+        if scanner.expect(",]") == "]":
+            return
+
+
+def _iter_object(scanner):
+    scanner.expect("{")
+    if scanner.peek() == "}":
+        scanner.pos += 1
+        return
+    while True:
+        name = scanner.value()
+        scanner.expect(":")
+        yield name, scanner
+        if scanner.expect(",}") == "}":
+            return
+
+
+def iter_json_items(fp, key=None, object_pairs_hook=None, chunk_size=65536):
+    """ Parse JSON document incrementally.
+
+    If key is None, top level of the document must be an object or an array. (name, value) pairs of the object
+    or (index, value) pairs of the array are yielded.
+    If key is not None, top level of the document must be an object and key must be one of its members
+    with array value. (index, value) pairs of that array are yielded, other members are skipped.
+
+    :param fp: file-like object (text or binary) with read(size) method
+    :param key: see above
+    :param object_pairs_hook: passed to json.JSONDecoder (collections.OrderedDict preserves order of fields)
+    :param chunk_size: Number of characters to read from fp at once
+    :return: generator of (name or index, value) tuples
+    """
+    scanner = _Scanner(fp, chunk_size, json.JSONDecoder(object_pairs_hook=object_pairs_hook))
+    if key is None and scanner.peek() == "[":
+        for item in _iter_array(scanner):
+            yield item
+        return
+    for name, _ in _iter_object(scanner):
+        if key is None:
+            yield name, scanner.value()
+        elif name == key:
+            for item in _iter_array(scanner):
+                yield item
+        else:
+            scanner.value()
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the pyqualtrics package.
+# For copyright and licensing information about this package, see the
+# NOTICE.txt and LICENSE.txt files in its top-level directory; they are
+# available at https://github.com/Baguage/pyqualtrics
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Incremental synchronization of survey responses to a local dataset.
+
+Responses are requested page by page (iterLegacyResponseData) and appended to a JSON Lines file (one response
+per line). After every page a checkpoint is saved: ID and EndDate of the last response and size of the dataset
+file. Next sync only requests responses received after the last one (LastResponseID parameter of
+getLegacyResponseData).
+
+If sync is interrupted, the dataset may contain lines written after the last checkpoint. They are discarded
+(the file is truncated to the size saved in the checkpoint) and downloaded again by the next sync. A non-empty
+dataset without a checkpoint (lost checkpoint file, different store) is never truncated, sync fails instead.
+"""
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+def _replace(src, dst):
+    """ Atomically replace dst with src
+    """
+    if sys.version_info >= (3, 3):
+        os.replace(src, dst)
+    else:
+        # Python 2.7. Atomic on POSIX systems only
+        os.rename(src, dst)
+
+
+class JSONCheckpointStore(object):
+    """ Checkpoints of all surveys are saved in one JSON file (rewritten atomically on every update)
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path) as fp:
+            return json.load(fp)
+
+    def get(self, SurveyID):
+        """
+        :return: checkpoint (dictionary with last_response_id, end_date and dataset_size keys) or None
+        """
+        with self._lock:
+            return self._load().get(SurveyID)
+
+    def set(self, SurveyID, checkpoint):
+        with self._lock:
+            checkpoints = self._load()
+            checkpoints[SurveyID] = checkpoint
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)))
+            with os.fdopen(fd, "w") as fp:
+                json.dump(checkpoints, fp, indent=2, sort_keys=True)
+                fp.flush()
+                os.fsync(fp.fileno())
+            _replace(tmp, self.path)
+
+
+class SQLiteCheckpointStore(object):
+    """ Checkpoints are saved in SQLite database (one row per survey)
+    """
+    def __init__(self, path):
+        self.path = path
+        db = self._connect()
+        try:
+            with db:
+                db.execute("CREATE TABLE IF NOT EXISTS checkpoints ("
+                           "survey_id TEXT PRIMARY KEY, last_response_id TEXT, end_date TEXT, "
+                           "dataset_size INTEGER, updated REAL)")
+        finally:
+            db.close()
+
+    def _connect(self):
+        # New connection for every operation, so the store can be used from any thread
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, SurveyID):
+        db = self._connect()
+        try:
+            row = db.execute("SELECT last_response_id, end_date, dataset_size FROM checkpoints WHERE survey_id = ?",
+                             (SurveyID,)).fetchone()
+        finally:
+            db.close()
+        if row is None:
+            return None
+        return {"last_response_id": row[0], "end_date": row[1], "dataset_size": row[2]}
+
+    def set(self, SurveyID, checkpoint):
+        db = self._connect()
+        try:
+            with db:
+                db.execute("INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?)",
+                           (SurveyID, checkpoint["last_response_id"], checkpoint["end_date"],
+                            checkpoint["dataset_size"], time.time()))
+        finally:
+            db.close()
+
+
+class ResponseSync(object):
+    """ Appends new responses of a survey to a local JSON Lines file. See module description
+    """
+    def __init__(self, qualtrics, store):
+        """
+        :param qualtrics: Qualtrics object
+        :param store: JSONCheckpointStore, SQLiteCheckpointStore or any object with get(SurveyID) and
+        set(SurveyID, checkpoint) methods
+        """
+        self.qualtrics = qualtrics
+        self.store = store
+
+    def sync(self, SurveyID, dataset_path, page_size=1000, **kwargs):
+        """ Download responses received since the last sync and append them to dataset_path
+
+        :param SurveyID: The survey you will be getting the responses for
+        :param dataset_path: JSON Lines file, created if does not exist
+        :param page_size: Number of responses requested by one API call (checkpoint is saved after every page)
+        :param kwargs: Additional parameters for getLegacyResponseData (Labels, ExportTags etc)
+        :return: Number of new responses, None if error occurs (see qualtrics.last_error_message).
+        Responses of pages downloaded before the error are kept
+        """
+        checkpoint = self.store.get(SurveyID)
+        size = os.path.getsize(dataset_path) if os.path.exists(dataset_path) else 0
+        if checkpoint is None:
+            if size:
+                self.qualtrics.last_error_message = "Dataset %s is not empty, but there is no checkpoint of " \
+                                                    "survey %s" % (dataset_path, SurveyID)
+                return None
+            checkpoint = {"last_response_id": None, "end_date": None, "dataset_size": 0}
+        if size < checkpoint["dataset_size"]:
+            self.qualtrics.last_error_message = "Dataset %s is smaller than saved by the last sync (%s bytes)" % (
+                dataset_path, checkpoint["dataset_size"])
+            return None
+        responses = self.qualtrics.iterLegacyResponseData(SurveyID, page_size=page_size,
+                                                          LastResponseID=checkpoint["last_response_id"], **kwargs)
+        count = 0
+        with open(dataset_path, "ab") as fp:
+            # Discard anything written after the last checkpoint (by interrupted sync)
+            fp.truncate(checkpoint["dataset_size"])
+            fp.seek(checkpoint["dataset_size"])
+            for response_id, response in responses:
+                row = OrderedDict([("ResponseID", response_id)])
+                row.update(response)
+                fp.write(json.dumps(row).encode("utf-8") + b"\n")
+                checkpoint["last_response_id"] = response_id
+                checkpoint["end_date"] = response.get("EndDate", checkpoint["end_date"])
+                count += 1
+                if count % page_size == 0:
+                    self._checkpoint(SurveyID, fp, checkpoint)
+            if count % page_size:
+                self._checkpoint(SurveyID, fp, checkpoint)
+        if self.qualtrics.last_error_message:
+            # Iteration stopped because an API call failed
+            return None
+        return count
+
+    def _checkpoint(self, SurveyID, fp, checkpoint):
+        fp.flush()
+        os.fsync(fp.fileno())
+        checkpoint["dataset_size"] = fp.tell()
+        self.store.set(SurveyID, checkpoint)
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the pyqualtrics package.
+# For copyright and licensing information about this package, see the
+# NOTICE.txt and LICENSE.txt files in its top-level directory; they are
+# available at https://github.com/Baguage/pyqualtrics
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Updating embedded data of many responses at once.
+
+Updates are read in batches of batch_size (ResponseID, embedded data) pairs. Updates of the same response within
+a batch are merged into one (later values win), then the batch is sent by concurrent updateResponseEmbeddedData
+calls. Transient failures are repeated according to retry policy of the Qualtrics object (retry option).
+
+Outcome of every update is appended to a journal (JSON Lines file), with keys of every (ResponseID, field, value)
+it has set. When the same updates are sent again (for example after the process was interrupted), fields which
+already have been set to the same values are skipped, no matter how the updates were split into batches (updates of
+one response spanning two batches are sent as two calls, but recognized when merged into one by the next run).
+"""
+import hashlib
+import itertools
+import json
+import os
+from collections import OrderedDict
+
+
+def _field_key(ResponseID, name, value):
+    """ Identifies a value of one embedded data field of a response in the journal
+    """
+    data = json.dumps([ResponseID, name, value]).encode("utf-8")
+    return hashlib.sha1(data).hexdigest()
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class EmbeddedDataUpdater(object):
+    """ See module description
+    """
+    def __init__(self, qualtrics, SurveyID, workers=4, rate_limit=None, batch_size=10000, journal=None):
+        """
+        :param qualtrics: Qualtrics object
+        :param SurveyID: The survey ID of the responses
+        :param workers: Number of concurrent updateResponseEmbeddedData calls
+        :param rate_limit: Maximum number of API calls per second (None - unlimited)
+        :param batch_size: Number of updates read (and merged) at once
+        :param journal: JSON Lines file with outcomes of updates (None - no journal)
+        """
+        self.qualtrics = qualtrics
+        self.SurveyID = SurveyID
+        self.workers = workers
+        self.rate_limit = rate_limit
+        self.batch_size = batch_size
+        self.journal = journal
+
+    def _load_journal(self):
+        """ Keys of fields set by updates which succeeded
+        """
+        done = set()
+        if self.journal is None or not os.path.exists(self.journal):
+            return done
+        with open(self.journal) as fp:
+            for line in fp:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Last line written by interrupted process may be incomplete
+                    continue
+                if entry["ok"]:
+                    done.update(entry["keys"])
+        return done
+
+    def _update(self, update):
+        ResponseID, ED, keys = update
+        if self.qualtrics.updateResponseEmbeddedData(self.SurveyID, ResponseID, ED):
+            return None
+        return self.qualtrics.last_error_message
+
+    def _outcomes(self, updates):
+        """ Send updates of one batch
+
+        :return: generator of ((ResponseID, ED, field keys), error message or None) tuples
+        """
+        for index, update, error, exception in self.qualtrics._imap(self._update, updates, self.workers,
+                                                                    self.rate_limit):
+            yield update, str(exception) if exception is not None else error
+
+    def run(self, updates):
+        """
+        :param updates: Iterable of (ResponseID, embedded data dictionary) tuples
+        :return: tuple (number of successful updates, list of (ResponseID, error message) tuples).
+        A response whose updates span several batches is counted once per batch. Updates skipped because
+        of the journal are not counted
+        """
+        done = self._load_journal()
+        updated = 0
+        failures = []
+        journal = open(self.journal, "a") if self.journal is not None else None
+        try:
+            for batch in _batches(updates, self.batch_size):
+                merged = OrderedDict()
+                for ResponseID, ED in batch:
+                    merged.setdefault(ResponseID, {}).update(ED)
+                pending = []
+                for ResponseID, ED in merged.items():
+                    # Only fields not set to these values yet
+                    keys = dict((name, _field_key(ResponseID, name, value)) for name, value in ED.items())
+                    ED = dict((name, value) for name, value in ED.items() if keys[name] not in done)
+                    if ED:
+                        pending.append((ResponseID, ED, sorted(keys[name] for name in ED)))
+                for (ResponseID, ED, keys), error in self._outcomes(pending):
+                    if error is None:
+                        updated += 1
+                        done.update(keys)
+                    else:
+                        failures.append((ResponseID, error))
+                    if journal is not None:
+                        journal.write(json.dumps(OrderedDict([("ResponseID", ResponseID), ("keys", keys),
+                                                              ("ok", error is None), ("error", error)])) + "\n")
+                if journal is not None:
+                    journal.flush()
+                    os.fsync(journal.fileno())
+        finally:
+            if journal is not None:
+                journal.close()
+        return updated, failures
@@ -38,13 +38,24 @@ setup(
     # find_packages() takes a source directory and two lists of package name patterns to exclude and include.
     # If omitted, the source directory defaults to the same directory as the setup script.
     packages=find_packages(exclude=["examples"]),  # https://pythonhosted.org/setuptools/setuptools.html#using-find-packages
-    install_requires=["requests"],
+    # concurrent.futures backport is required for Python 2.7
+    install_requires=["requests", 'futures; python_version < "3.0"'],
+    extras_require={
+        # pyqualtrics.aio.AsyncQualtrics (Python 3.5+)
+        "async": ["aiohttp"],
+        # Faster decoding of API responses (pyqualtrics.jsonbackend)
+        "fastjson": ['orjson; python_version >= "3.6"'],
+        # Parquet output of ExportReader.to_columnar (pyqualtrics.columnar.ColumnarWriter)
+        "parquet": ["pyarrow"],
+    },
     scripts=['bin/qualtrics.cmd', 'bin/qualtrics'],
     package_data = {
         # If any package contains *.qsf or *.rst files, include them:
         '': ['*.qsf', '*.rst'],
     },
     test_suite="tests",
+    # Load only tests/__init__.py: scanning the package would compile tests/test_aio.py on Python < 3.5
+    test_loader="unittest:TestLoader",
     classifiers=[
         "Development Status :: 4 - Beta",
         "License :: OSI Approved :: Apache Software License",
@@ -17,34 +17,79 @@
 
 """ Unittests for the pyqualtrics package
 """
+import csv
+import io
 import json
 import random
+import shutil
 import string
+import sys
+import tempfile
+import threading
 
 import time
 import zipfile
+from collections import OrderedDict
 
-from requests.exceptions import ConnectionError
+from requests.exceptions import ConnectionError, ConnectTimeout
 
 from pyqualtrics import Qualtrics
+from pyqualtrics import jsonbackend
+from pyqualtrics.cache import MetadataCache, ResponseCache
+from pyqualtrics.columnar import ColumnarResponses, ColumnarWriter, read_columnar
+from pyqualtrics.csvstream import CSVBody
+from pyqualtrics.imports import ImportJobManager
+from pyqualtrics.links import UniqueLinkGenerator
+from pyqualtrics.polling import AdaptivePoller
+from pyqualtrics.ratelimit import FileTokenBucket
+from pyqualtrics.retry import RetryPolicy, parse_retry_after
+from pyqualtrics.sync import JSONCheckpointStore, SQLiteCheckpointStore
 from mock.mock import patch
 import unittest
 import os
 
 
+if sys.version_info >= (3, 5):
+    # async syntax, see tests/test_aio.py
+    from tests.test_aio import TestAsyncQualtrics
+
 base_dir = os.path.dirname(os.path.abspath(__file__))
 
 class MockResponse:
-    def __init__(self, status_code=200, data=""):
+    def __init__(self, status_code=200, data="", url="", headers=None):
         self.status_code = status_code
         self.text = data
         self.content = data
+        self.url = url
+        self.headers = headers or {}
+        self.encoding = "utf-8"
+        self.raw = io.BytesIO(data if isinstance(data, bytes) else data.encode("utf-8"))
 
     def json(self):
         # http://docs.python-requests.org/en/master/user/quickstart/#json-response-content
         # In case the JSON decoding fails, r.json() raises an exception (ValueError)
         return json.loads(self.text)
 
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def close(self):
+        pass
+
+
+def csv_rows(document):
+    return list(csv.reader(io.StringIO(document, newline="")))
+
+
+def zip_archive(name, contents):
+    """ Zip archive with one file, similar to response export file returned by Qualtrics
+    """
+    fp = io.BytesIO()
+    with zipfile.ZipFile(fp, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(name, contents)
+    return fp.getvalue()
+
 
 class TestQualtrics(unittest.TestCase):
     def setUp(self):
@@ -920,7 +965,7 @@ Use link https://nd.qualtrics.com/jfe/form/SV_8pqqcl4sy2316ZL and answer "Male".
             "R_2sPsOsGV0GSrLJb,Default Response Set,129.74.117.12,2016-04-08 12:04:00,2016-04-08 12:04:00,,,,,1,4,Male,,,-1"
         )
 
-    @patch("pyqualtrics.requests.get")
+    @patch("pyqualtrics.requests.Session.get")
     def test_GetResponseExportProgress_percentComplete(self, get_func):
         # Using mock get, because it is difficult to get in progress status reliably
         data='{"meta": {"httpStatus": "200 - OK", "requestId": "f53927df-d5d8-45eb-b6e3-de5542c7cd94"}, '\
@@ -947,7 +992,7 @@ Use link https://nd.qualtrics.com/jfe/form/SV_8pqqcl4sy2316ZL and answer "Male".
         self.assertIsNone(responseExportId)
         self.assertEqual(qualtrics.last_error_message, "Unrecognized X-API-TOKEN.")
 
-    @patch("pyqualtrics.requests.post")
+    @patch("pyqualtrics.requests.Session.post")
     def test_CreateResponseExport_mailformed_response(self, get_func):
         get_func.return_value = MockResponse(status_code=200, data="")
         qualtrics = Qualtrics("234", "123")
@@ -968,7 +1013,7 @@ Use link https://nd.qualtrics.com/jfe/form/SV_8pqqcl4sy2316ZL and answer "Male".
         self.assertEqual(msg, "Unrecognized X-API-TOKEN.")
         self.assertEqual(qualtrics.last_error_message, "Unrecognized X-API-TOKEN.")
 
-    @patch("pyqualtrics.requests.get")
+    @patch("pyqualtrics.requests.Session.get")
     def test_GetResponseExportProgress_fail_3(self, get_func):
         get_func.return_value = MockResponse(status_code=200, data="")
         status, msg = self.qualtrics.GetResponseExportProgress("sdfasdfdsf")
@@ -976,7 +1021,7 @@ Use link https://nd.qualtrics.com/jfe/form/SV_8pqqcl4sy2316ZL and answer "Male".
         self.assertIn("Mailformed server response:", msg)
         self.assertIn("Mailformed server response:", self.qualtrics.last_error_message)
 
-    @patch("pyqualtrics.requests.get")
+    @patch("pyqualtrics.requests.Session.get")
     def test_GetResponseExportProgress_fail_4(self, get_func):
         get_func.return_value = MockResponse(status_code=200, data='{"result": ""}')
         status, msg = self.qualtrics.GetResponseExportProgress("sdfasdfdsf")
@@ -996,7 +1041,7 @@ Use link https://nd.qualtrics.com/jfe/form/SV_8pqqcl4sy2316ZL and answer "Male".
         self.assertEqual(result, None)
         self.assertEqual(qualtrics.last_error_message, "Unrecognized X-API-TOKEN.")
 
-    @patch("pyqualtrics.requests.get")
+    @patch("pyqualtrics.requests.Session.get")
     def test_GetResponseExportFile_fail_bad_zip_file(self, get_func):
         get_func.return_value = MockResponse(status_code=200, data="")
         qualtrics = Qualtrics("234", "123")
@@ -1033,14 +1078,14 @@ Use link https://nd.qualtrics.com/jfe/form/SV_8pqqcl4sy2316ZL and answer "Male".
     def test_request3_notimplemented(self):
         self.assertRaises(NotImplementedError, self.qualtrics.request3, "123", method="trace")
 
-    @patch("pyqualtrics.requests.get")
+    @patch("pyqualtrics.requests.Session.get")
     def test_request3_mock_connection_error(self, get_func):
         get_func.side_effect = ConnectionError("Connection Error")
         status, msg = self.qualtrics.GetResponseExportProgress("123")
         self.assertEqual(msg, "Connection Error")
         self.assertEqual(status, "servfail")
 
-    # @patch("pyqualtrics.requests.get")
+    # @patch("pyqualtrics.requests.Session.get")
     # def test_request3_mailformed_response_from_server_1(self, get_func):
     #     mock_response = MockResponse(status_code=400)
     #     get_func.return_value = mock_response
@@ -1048,7 +1093,7 @@ Use link https://nd.qualtrics.com/jfe/form/SV_8pqqcl4sy2316ZL and answer "Male".
     #     self.assertEqual(msg, "Mailformed server response: No JSON object could be decoded")
     #     self.assertEqual(status, "servfail")
     #
-    # @patch("pyqualtrics.requests.get")
+    # @patch("pyqualtrics.requests.Session.get")
     # def test_request3_mailformed_response_from_server_2(self, get_func):
     #     mock_response = MockResponse(status_code=400, data='{"result": ""}')
     #
@@ -1057,7 +1102,7 @@ Use link https://nd.qualtrics.com/jfe/form/SV_8pqqcl4sy2316ZL and answer "Male".
     #     self.assertEqual(msg, "Mailformed server response: string indices must be integers")
     #     self.assertEqual(status, "servfail")
 
-    @patch("pyqualtrics.requests.get")
+    @patch("pyqualtrics.requests.Session.get")
     def test_request3_mailformed_response_from_server_3(self, get_func):
         mock_response = MockResponse(status_code=400)
         get_func.return_value = mock_response
@@ -1078,5 +1123,1120 @@ Use link https://nd.qualtrics.com/jfe/form/SV_8pqqcl4sy2316ZL and answer "Male".
                 self.qualtrics.deleteSurvey(SurveyID=survey_id)
 
 
+class TestQualtricsOffline(unittest.TestCase):
+    """ Tests that do not require access to Qualtrics API (all HTTP calls are mocked)
+    """
+    def setUp(self):
+        self.qualtrics = Qualtrics("user", "token")
+
+    def tearDown(self):
+        self.qualtrics.close()
+
+    @patch("pyqualtrics.requests.Session.get")
+    def test_session_shared_by_request_and_request3(self, get_func):
+        get_func.return_value = MockResponse(data='{"Meta": {"Status": "Success"}, "Result": {"Count": "3"}}')
+        self.assertEqual(self.qualtrics.getPanelMemberCount("UR_123", "ML_123"), 3)
+        get_func.return_value = MockResponse(data='{"result": {"status": "in progress", "percentComplete": 5.0}}')
+        self.assertEqual(self.qualtrics.GetResponseExportProgress("ES_123"), ("in progress", 5.0))
+        self.assertEqual(get_func.call_count, 2)
+
+    def test_context_manager(self):
+        with Qualtrics("user", "token", pool_maxsize=4) as qualtrics:
+            adapter = qualtrics.session.get_adapter("https://survey.qualtrics.com")
+            self.assertEqual(adapter._pool_maxsize, 4)
+        with patch("pyqualtrics.requests.Session.close") as close_func:
+            with Qualtrics("user", "token"):
+                pass
+        close_func.assert_called_once_with()
+
+    def test_keep_alive_disabled(self):
+        qualtrics = Qualtrics("user", "token", keep_alive=False)
+        self.assertEqual(qualtrics.session.headers["Connection"], "close")
+        self.assertNotEqual(self.qualtrics.session.headers.get("Connection"), "close")
+
+    @patch("pyqualtrics.requests.Session.get")
+    def test_add_recipients(self, get_func):
+        def get(url, params, **kwargs):
+            time.sleep(random.random() / 100)
+            if params["Email"] == "bad":
+                return MockResponse(data='{"Meta": {"Status": "Error", "ErrorMessage": "Invalid Email"}}')
+            self.assertEqual(params["ED[SubjectID]"], params["Email"])
+            return MockResponse(data='{"Meta": {"Status": "Success"}, "Result": {"RecipientID": "MLRP_%s"}}' %
+                                     params["Email"])
+        get_func.side_effect = get
+        recipients = ({"Email": "bad" if i % 7 == 3 else str(i), "ED": {"SubjectID": str(i)}} for i in range(50))
+        results = self.qualtrics.addRecipients("UR_1", "ML_1", recipients, workers=5)
+        self.assertEqual(len(results), 50)
+        for i, (recipient_id, error) in enumerate(results):
+            if i % 7 == 3:
+                self.assertEqual((recipient_id, error), (None, "Invalid Email"))
+            else:
+                self.assertEqual((recipient_id, error), ("MLRP_%s" % i, None))
+        # Main object is not affected by calls made from worker threads
+        self.assertIsNone(self.qualtrics.last_error_message)
+
+    @patch("pyqualtrics.requests.Session.get")
+    def test_iter_add_recipients_rate_limit(self, get_func):
+        get_func.return_value = MockResponse(data='{"Meta": {"Status": "Success"}, "Result": {"RecipientID": "1"}}')
+        start = time.time()
+        results = list(self.qualtrics.iterAddRecipients("UR_1", "ML_1", [{}] * 15, workers=4, rate_limit=50))
+        # 50 calls burst is allowed, then 50 calls per second
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual(sorted(index for index, _, _, _ in results), list(range(15)))
+        start = time.time()
+        list(self.qualtrics.iterAddRecipients("UR_1", "ML_1", [{}] * 15, workers=4, rate_limit=10))
+        self.assertGreater(time.time() - start, 0.4)
+
+    @patch("pyqualtrics.requests.Session.get")
+    def test_thread_local_state(self, get_func):
+        def get(url, params, **kwargs):
+            # Slow responses, so calls of different threads overlap
+            time.sleep(0.01)
+            if params["PanelID"].startswith("bad"):
+                return MockResponse(data=json.dumps({"Meta": {"Status": "Error", "ErrorMessage": params["PanelID"]}}))
+            return MockResponse(data=json.dumps({"Meta": {"Status": "Success"}, "Result": {"Count": params["PanelID"]}}))
+        get_func.side_effect = get
+        errors = []
+
+        def worker(index):
+            for i in range(10):
+                panel_id = "%s%s_%s" % ("bad" if i % 2 else "", index, i)
+                result = self.qualtrics.call("getPanelMemberCount", LibraryID="UR_1", PanelID=panel_id)
+                if i % 2:
+                    expected = (False, None, panel_id)
+                else:
+                    expected = (True, {"Meta": {"Status": "Success"}, "Result": {"Count": panel_id}}, None)
+                if (result.ok, result.body, result.error) != expected:
+                    errors.append(result)
+                # Legacy attributes describe the last call of this thread
+                if self.qualtrics.last_error_message != result.error or self.qualtrics.json_response["Meta"][
+                        "Status"] != ("Error" if i % 2 else "Success"):
+                    errors.append(self.qualtrics.last_error_message)
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        # Main thread has not made any calls
+        self.assertIsNone(self.qualtrics.last_error_message)
+        self.assertEqual(self.qualtrics.last_retries, 0)
+        result = self.qualtrics.call("getPanelMemberCount", LibraryID="UR_1", PanelID="ML_1")
+        self.assertEqual((result.status_code, result.retries), (200, 0))
+        self.assertGreater(result.elapsed, 0)
+        self.assertIn("getPanelMemberCount", get_func.call_args[1]["params"]["Request"])
+
+    @patch("pyqualtrics.requests.Session.post")
+    @patch("pyqualtrics.requests.Session.get")
+    def test_instance_rate_limiters(self, get_func, post_func):
+        class CountingLimiter(object):
+            calls = 0
+
+            def acquire(self):
+                self.calls += 1
+        get_func.return_value = MockResponse(data='{"Meta": {"Status": "Success"}, "Result": {"Count": "3"}}')
+        post_func.return_value = MockResponse(data='{"meta": {"httpStatus": "200 - OK"}, "result": {"id": "ES_1"}}')
+        limiter, limiter3 = CountingLimiter(), CountingLimiter()
+        with Qualtrics("user", "token", rate_limit=limiter, rate_limit3=limiter3) as qualtrics:
+            qualtrics.getPanelMemberCount("UR_1", "ML_1")
+            qualtrics.addRecipients("UR_1", "ML_1", [{}] * 5, workers=2)
+            qualtrics.CreateResponseExport("csv", "SV_1")
+        self.assertEqual((limiter.calls, limiter3.calls), (6, 1))
+        with Qualtrics("user", "token", rate_limit=10) as qualtrics:
+            start = time.time()
+            for i in range(15):
+                qualtrics.getPanelMemberCount("UR_1", "ML_1")
+            self.assertGreater(time.time() - start, 0.4)
+            self.assertIsNone(qualtrics.rate_limiter3)
+
+    @patch("pyqualtrics.requests.Session.get")
+    def test_retry_policy(self, get_func):
+        success = MockResponse(data='{"Meta": {"Status": "Success"}, "Result": {"Count": "3"}}')
+        error = '{"Meta": {"Status": "Error", "ErrorMessage": "Server error"}}'
+        retry = RetryPolicy(max_attempts=3, backoff=0.01, jitter=False)
+        with Qualtrics("user", "token", retry=retry) as qualtrics:
+            get_func.side_effect = [MockResponse(status_code=503, data=error, headers={"Retry-After": "0"}),
+                                    ConnectionError("Connection aborted"), success]
+            self.assertEqual(qualtrics.getPanelMemberCount("UR_1", "ML_1"), 3)
+            self.assertEqual(qualtrics.last_retries, 2)
+            # Attempts are exhausted
+            get_func.side_effect = [MockResponse(status_code=500, data=error)] * 3 + [success]
+            self.assertIsNone(qualtrics.getPanelMemberCount("UR_1", "ML_1"))
+            self.assertEqual(qualtrics.last_retries, 2)
+            self.assertEqual(qualtrics.last_error_message, "Server error")
+            # Client errors are not retried
+            get_func.side_effect = [MockResponse(status_code=401, data=error), success]
+            self.assertIsNone(qualtrics.getPanelMemberCount("UR_1", "ML_1"))
+            self.assertEqual(qualtrics.last_retries, 0)
+
+            # addRecipient is not repeated if server may have processed it
+            recipient = '{"Meta": {"Status": "Success"}, "Result": {"RecipientID": "MLRP_1"}}'
+            for first in (MockResponse(status_code=500, data=error), ConnectionError("Connection aborted")):
+                get_func.side_effect = [first, MockResponse(data=recipient)]
+                self.assertIsNone(qualtrics.addRecipient("UR_1", "ML_1", "", "", "", "", "", {}))
+            for first in (MockResponse(status_code=429, data=error), ConnectTimeout("Connect timeout")):
+                get_func.side_effect = [first, MockResponse(data=recipient)]
+                self.assertEqual(qualtrics.addRecipient("UR_1", "ML_1", "", "", "", "", "", {}), "MLRP_1")
+                self.assertEqual(qualtrics.last_retries, 1)
+
+        # Without retry policy the first failure is final
+        get_func.side_effect = [MockResponse(status_code=503, data=error), success]
+        self.assertIsNone(self.qualtrics.getPanelMemberCount("UR_1", "ML_1"))
+
+        self.assertEqual(parse_retry_after("120"), 120)
+        self.assertEqual(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0)
+        self.assertIsNone(parse_retry_after("soon"))
+        self.assertEqual(RetryPolicy(max_retry_after=10, jitter=False).next_delay(1, True, status=429,
+                                                                                 retry_after="3600"), 10)
+
+    @patch("pyqualtrics.requests.Session.post")
+    @patch("pyqualtrics.requests.Session.get")
+    def test_lean_mode(self, get_func, post_func):
+        responses = b'{"R_1": {"Q1": "1"}, "R_2": {"Q1": "2"}}'
+        get_func.return_value = MockResponse(data=responses)
+        post_func.return_value = MockResponse(data=b'{"meta": {"httpStatus": "200 - OK"}, "result": {"id": "ES_1"}}')
+        parsed = []
+
+        def loads(text):
+            parsed.append(type(text))
+            return json.loads(text.decode("utf-8"))
+        with Qualtrics("user", "token", lean=True) as qualtrics:
+            data = qualtrics.getLegacyResponseData("SV_1")
+            self.assertEqual(list(data.keys()), ["R_1", "R_2"])
+            self.assertIs(qualtrics.json_response, data)
+            # No copies of the response body
+            self.assertIsNone(qualtrics.response)
+            self.assertTrue(get_func.call_args[1]["stream"])
+            # Raw bytes are parsed, the body is not decoded to str first
+            qualtrics.json_backend = jsonbackend.Backend("recording", loads)
+            self.assertEqual(qualtrics.CreateResponseExport("csv", "SV_1"), "ES_1")
+            self.assertEqual(parsed, [bytes])
+            self.assertIsNone(qualtrics.response)
+            self.assertIsNone(qualtrics.r)
+            archive = io.BytesIO()
+            with zipfile.ZipFile(archive, "w") as zf:
+                zf.writestr("SV_1.csv", "ResponseID\nR_1\n")
+            get_func.return_value = MockResponse(data=archive.getvalue())
+            self.assertIsNotNone(qualtrics.GetResponseExportFile("ES_1"))
+            self.assertIsNone(qualtrics.r)
+            get_func.return_value = MockResponse(data=b"<SurveyDefinition></SurveyDefinition>")
+            self.assertEqual(qualtrics.getSurvey("SV_1"), "<SurveyDefinition></SurveyDefinition>")
+        get_func.return_value = MockResponse(data=responses.decode("ascii"))
+        self.qualtrics.getLegacyResponseData("SV_1")
+        self.assertEqual(self.qualtrics.response, responses.decode("ascii"))
+        self.assertFalse(get_func.call_args[1]["stream"])
+
+    @patch("pyqualtrics.requests.Session.get")
+    def test_stream_legacy_response_data(self, get_func):
+        responses = OrderedDict(("R_%s" % i, OrderedDict([("Q%s" % q, "%s-%s" % (i, q)) for q in range(20, 0, -1)]))
+                                for i in range(50))
+        get_func.side_effect = lambda url, **kwargs: MockResponse(data=json.dumps(responses))
+        items = list(self.qualtrics.streamLegacyResponseData("SV_1", chunk_size=100, Limit=50))
+        self.assertEqual(items, list(responses.items()))
+        # Order of fields is preserved
+        self.assertEqual(list(items[0][1].keys()), ["Q%s" % q for q in range(20, 0, -1)])
+        self.assertIsNone(self.qualtrics.last_error_message)
+        self.assertTrue(get_func.call_args[1]["stream"])
+        self.assertEqual(get_func.call_args[1]["params"]["SurveyID"], "SV_1")
+        self.assertEqual(get_func.call_args[1]["params"]["Limit"], 50)
+
+        # Multibyte characters split between chunks
+        names = OrderedDict(("R_%s" % i, {"Name": u"Zo\u00eb \u2603 %s" % i}) for i in range(50))
+        get_func.side_effect = lambda url, **kwargs: MockResponse(data=json.dumps(names, ensure_ascii=False))
+        for chunk_size in (1, 7, 100):
+            items = list(self.qualtrics.streamLegacyResponseData("SV_1", chunk_size=chunk_size))
+            self.assertEqual(items, list(names.items()))
+            self.assertIsNone(self.qualtrics.last_error_message)
+
+        # Generator is lazy
+        get_func.reset_mock()
+        stream = self.qualtrics.streamLegacyResponseData("SV_1")
+        self.assertEqual(get_func.call_count, 0)
+        self.assertEqual(next(stream)[0], "R_0")
+        stream.close()
+
+        get_func.side_effect = None
+        error = '{"Meta": {"Status": "Error", "ErrorMessage": "Invalid SurveyID"}}'
+        for status_code in (200, 400):
+            get_func.return_value = MockResponse(status_code=status_code, data=error)
+            self.assertEqual(list(self.qualtrics.streamLegacyResponseData("SV_1")), [])
+            self.assertEqual(self.qualtrics.last_error_message, "Invalid SurveyID")
+        # Truncated response
+        get_func.return_value = MockResponse(data=json.dumps(responses)[:500])
+        self.assertEqual(list(self.qualtrics.streamLegacyResponseData("SV_1")), list(responses.items())[:1])
+        self.assertTrue(self.qualtrics.last_error_message.startswith("Unexpected response from Qualtrics"))
+        get_func.side_effect = ConnectionError("Connection refused")
+        self.assertEqual(list(self.qualtrics.streamLegacyResponseData("SV_1")), [])
+        self.assertEqual(self.qualtrics.last_error_message, "Connection refused")
+
+    @patch("pyqualtrics.requests.Session.get")
+    def test_json_backends(self, get_func):
+        self.assertIn("json", jsonbackend.available_backends())
+        self.assertRaises(ValueError, jsonbackend.get_backend, "simplejson")
+        responses = '{"R_2": {"Q2": "a", "Q1": "b"}, "R_1": {"Q2": "c", "Q1": "d"}}'
+        for name in jsonbackend.available_backends():
+            backend = jsonbackend.get_backend(name)
+            self.assertEqual(backend.loads(b'{"a": [1, 2.5, null]}'), {"a": [1, 2.5, None]})
+            self.assertRaises(ValueError, backend.loads, "not json")
+            with Qualtrics("user", "token", json_backend=name) as qualtrics:
+                get_func.return_value = MockResponse(data=responses)
+                data = qualtrics.getLegacyResponseData("SV_1")
+                # Order of responses and fields is preserved by any backend
+                self.assertIsInstance(data["R_2"], OrderedDict)
+                self.assertEqual([list(response.keys()) for response in data.values()], [["Q2", "Q1"]] * 2)
+                self.assertEqual(list(data.keys()), ["R_2", "R_1"])
+                get_func.return_value = MockResponse(data='{"Meta": {"Status": "Success"}, "Result": {"Count": "3"}}')
+                self.assertEqual(qualtrics.getPanelMemberCount("UR_1", "ML_1"), 3)
+                get_func.return_value = MockResponse(data="not json")
+                self.assertIsNone(qualtrics.getPanelMemberCount("UR_1", "ML_1"))
+                self.assertEqual(qualtrics.last_error_message, "Unexpected response from Qualtrics: not a JSON document")
+        default = jsonbackend.get_backend()
+        try:
+            jsonbackend.set_default_backend("json")
+            self.assertEqual(jsonbackend.get_backend().name, "json")
+        finally:
+            jsonbackend.set_default_backend(default.name)
+
+    @patch("pyqualtrics.requests.Session.get")
+    def test_columnar_responses(self, get_func):
+        responses = OrderedDict([
+            ("R_1", OrderedDict([("Finished", "1"), ("Q1", "a"), ("Q2", None)])),
+            ("R_2", OrderedDict([("Finished", "1"), ("Q1", "b"), ("Q3", "new")])),
+        ])
+        get_func.side_effect = lambda url, **kwargs: MockResponse(data=json.dumps(responses))
+        table = self.qualtrics.getLegacyResponseData("SV_1", columnar=True, Limit=2)
+        self.assertIsInstance(table, ColumnarResponses)
+        self.assertTrue(get_func.call_args[1]["stream"])
+        self.assertEqual(get_func.call_args[1]["params"]["Limit"], 2)
+        self.assertEqual(len(table), 2)
+        self.assertEqual(list(table), ["R_1", "R_2"])
+        self.assertEqual(table.columns, ["Finished", "Q1", "Q2", "Q3"])
+        self.assertEqual(table["R_2"]["Q1"], "b")
+        self.assertEqual(dict(table["R_1"]), {"Finished": "1", "Q1": "a", "Q2": None, "Q3": None})
+        self.assertRaises(KeyError, lambda: table["R_3"])
+        self.assertRaises(KeyError, lambda: table["R_1"]["Q4"])
+        self.assertEqual(table.column("Q3"), [None, "new"])
+        # Equal values are stored once
+        self.assertIs(table.column("Finished")[0], table.column("Finished")[1])
+        self.assertEqual(table.to_dict()["R_1"], OrderedDict([("Finished", "1"), ("Q1", "a"), ("Q2", None),
+                                                              ("Q3", None)]))
+        self.assertEqual(list(table.to_records()[1].items())[:2], [("ResponseID", "R_2"), ("Finished", "1")])
+        self.assertRaises(ValueError, table.append, "R_1", {})
+        self.assertEqual(ColumnarResponses.from_items([("R_1", {})]).to_dict(), {"R_1": {}})
+        # Equal values of different types are not mixed up
+        table = ColumnarResponses.from_items([("R_1", {"a": 1.0, "b": True}), ("R_2", {"a": 1, "b": 1})])
+        self.assertEqual([(type(value), value) for value in table.column("a") + table.column("b")],
+                         [(float, 1.0), (int, 1), (bool, True), (int, 1)])
+
+        get_func.side_effect = None
+        get_func.return_value = MockResponse(data='{"Meta": {"Status": "Error", "ErrorMessage": "Invalid SurveyID"}}')
+        self.assertIsNone(self.qualtrics.getLegacyResponseData("SV_1", columnar=True))
+        self.assertEqual(self.qualtrics.last_error_message, "Invalid SurveyID")
+
+    @patch("pyqualtrics.requests.Session.get")
+    def test_response_cache(self, get_func):
+        work_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(work_dir, "responses.db")
+            qualtrics = Qualtrics("user", "token", response_cache=path)
+            data = '{"R_1": {"Q1": "1", "Q2": "a"}}'
+            get_func.side_effect = lambda url, **kwargs: MockResponse(data=data)
+            self.assertEqual(qualtrics.getResponse("SV_1", "R_1"), {"Q1": "1", "Q2": "a"})
+            self.assertEqual(list(qualtrics.getResponse("SV_1", "R_1")), ["Q1", "Q2"])
+            self.assertEqual(get_func.call_count, 1)
+            # Other parameters are cached separately. Cache is persistent
+            qualtrics = Qualtrics("user", "token", response_cache=path)
+            qualtrics.getResponse("SV_1", "R_1", Labels=1)
+            qualtrics.getResponse("SV_1", "R_1")
+            self.assertEqual(get_func.call_count, 2)
+
+            data = '{"Meta": {"Status": "Success"}, "Result": "<html></html>"}'
+            self.assertEqual(qualtrics.getSingleResponseHTML("SV_1", "R_1"), "<html></html>")
+            self.assertEqual(qualtrics.getSingleResponseHTML("SV_1", "R_1"), "<html></html>")
+            self.assertEqual(get_func.call_count, 3)
+            self.assertEqual((qualtrics.response_cache.hits, qualtrics.response_cache.misses), (2, 2))
+
+            self.assertTrue(qualtrics.updateResponseEmbeddedData("SV_1", "R_1", {"ED": "1"}))
+            self.assertEqual(len(qualtrics.response_cache), 0)
+
+            cache = ResponseCache(os.path.join(work_dir, "lru.db"), max_entries=2)
+            for response_id in ("R_1", "R_2", "R_3"):
+                cache.set("SV_1", response_id, "response", {}, {"id": response_id})
+                time.sleep(0.01)
+            self.assertEqual(len(cache), 2)
+            self.assertIsNone(cache.get("SV_1", "R_1", "response", {}))
+            self.assertEqual(cache.get("SV_1", "R_2", "response", {}), {"id": "R_2"})
+            cache.ttl = 0
+            self.assertIsNone(cache.get("SV_1", "R_2", "response", {}))
+            self.assertEqual(len(cache), 1)
+        finally:
+            shutil.rmtree(work_dir)
+
+    @patch("pyqualtrics.requests.Session.get")
+    def test_metadata_cache(self, get_func):
+        qualtrics = Qualtrics("user", "token", metadata_cache=MetadataCache(ttl={"getPanelMemberCount": 0.1},
+                                                                            stale_ttl=10))
+        responses = {
+            "getPanels": '{"Meta": {"Status": "Success"}, "Result": {"Panels": [{"PanelID": "ML_1"}]}}',
+            "getPanelMemberCount": '{"Meta": {"Status": "Success"}, "Result": {"Count": "%s"}}',
+            "createPanel": '{"Meta": {"Status": "Success"}, "Result": {"PanelID": "ML_2"}}',
+            "addRecipient": '{"Meta": {"Status": "Success"}, "Result": {"RecipientID": "MLRP_1"}}',
+        }
+        counts = []
+
+        def get(url, params, **kwargs):
+            data = responses[params["Request"]]
+            if params["Request"] == "getPanelMemberCount":
+                counts.append(params["PanelID"])
+                data = data % len(counts)
+            return MockResponse(data=data)
+
+        get_func.side_effect = get
+        self.assertEqual(qualtrics.getPanels("UR_1"), [{"PanelID": "ML_1"}])
+        self.assertEqual(qualtrics.getPanels("UR_1"), [{"PanelID": "ML_1"}])
+        self.assertEqual(get_func.call_count, 1)
+        qualtrics.createPanel("UR_1", "Panel")
+        qualtrics.getPanels("UR_1")
+        self.assertEqual(get_func.call_count, 3)
+
+        self.assertEqual(qualtrics.getPanelMemberCount("UR_1", "ML_1"), 1)
+        self.assertEqual(qualtrics.getPanelMemberCount("UR_1", "ML_2"), 2)
+        self.assertEqual(qualtrics.getPanelMemberCount("UR_1", "ML_1"), 1)
+        qualtrics.addRecipient("UR_1", "ML_1", "First", "Last", "a@example.com", "", "EN", {})
+        self.assertEqual(qualtrics.getPanelMemberCount("UR_1", "ML_1"), 3)
+        self.assertEqual(qualtrics.getPanelMemberCount("UR_1", "ML_2"), 2)
+        # Stale value is returned and refreshed in background
+        time.sleep(0.15)
+        self.assertEqual(qualtrics.getPanelMemberCount("UR_1", "ML_2"), 2)
+        for i in range(100):
+            if len(counts) == 4 and qualtrics.getPanelMemberCount("UR_1", "ML_2") == 4:
+                break
+            time.sleep(0.01)
+        self.assertEqual(qualtrics.getPanelMemberCount("UR_1", "ML_2"), 4)
+        self.assertEqual(counts, ["ML_1", "ML_2", "ML_1", "ML_2"])
+
+        # On-disk cache is shared by Qualtrics objects
+        work_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(work_dir, "metadata.db")
+            first = Qualtrics("user", "token", metadata_cache=MetadataCache(path=path))
+            second = Qualtrics("user", "token", metadata_cache=MetadataCache(path=path, max_entries=1))
+            first.getPanels("UR_1")
+            self.assertEqual(second.getPanels("UR_1"), [{"PanelID": "ML_1"}])
+            self.assertEqual(get_func.call_count, 9)
+            second.metadata_cache.invalidate("getPanels", LibraryID="UR_1")
+            self.assertEqual(len(first.metadata_cache._entries), 1)
+            first.metadata_cache._entries.clear()
+            first.getPanels("UR_1")
+            self.assertEqual(get_func.call_count, 10)
+        finally:
+            shutil.rmtree(work_dir)
+
+    def test_metadata_cache_invalidate_during_refresh(self):
+        cache = MetadataCache(ttl=0.05, stale_ttl=10)
+        started, release = threading.Event(), threading.Event()
+
+        def fetch():
+            started.set()
+            release.wait(5)
+            return "old"
+
+        self.assertEqual(cache.get("getPanels", {"LibraryID": "UR_1"}, lambda: "old"), "old")
+        time.sleep(0.1)
+        # Stale value is returned, refresh blocks in fetch until the entry is invalidated
+        self.assertEqual(cache.get("getPanels", {"LibraryID": "UR_1"}, fetch), "old")
+        self.assertTrue(started.wait(5))
+        cache.invalidate("getPanels", LibraryID="UR_1")
+        release.set()
+        for i in range(100):
+            if not cache._refreshing:
+                break
+            time.sleep(0.01)
+        # Result of the refresh started before invalidation is not cached
+        self.assertEqual(cache._entries, {})
+        self.assertEqual(cache.get("getPanels", {"LibraryID": "UR_1"}, lambda: "fresh"), "fresh")
+        self.assertEqual(cache._fetching, {})
+
+    @patch("pyqualtrics.requests.Session.post")
+    def test_streaming_csv_imports(self, post_func):
+        post_func.return_value = MockResponse(data='{"Meta": {"Status": "Success"}, "Result": {"PanelID": "ML_1"}}')
+        responses = ({"ResponseID": "R_%s" % i, "Q1": u"\u00e9,%s" % i} for i in range(1000))
+        self.assertTrue(self.qualtrics.importResponsesAsDict("SV_1", responses))
+        body = post_func.call_args[1]["data"]
+        self.assertEqual(post_func.call_args[1]["params"]["Request"], "importResponses")
+        lines = b"".join(body).decode("utf-8").splitlines()
+        self.assertEqual(lines[:3], ["ResponseID,Q1", "ResponseID,Q1", u'R_0,"\u00e9,0"'])
+        self.assertEqual(len(lines), 1002)
+        self.assertTrue(self.qualtrics.importResponsesAsDict("SV_1", iter([])))
+        self.assertEqual(post_func.call_count, 1)
+
+        panel = [{"Email": "a@example.com", "FirstName": "A"}, {"Email": "b@example.com", "FirstName": "B"}]
+        self.assertEqual(self.qualtrics.importJsonPanel("UR_1", "Panel", panel, headers=["FirstName", "Email"]),
+                         "ML_1")
+        params = post_func.call_args[1]["params"]
+        self.assertEqual((params["ColumnHeaders"], params["Email"], params["FirstName"]), ("1", 2, 1))
+        self.assertEqual(post_func.call_args[1]["data"], b"FirstName,Email\r\nA,a@example.com\r\nB,b@example.com\r\n")
+        # CSV document as bytes (read from a file in binary mode), with byte order mark
+        document = u"\ufeffExternalRef,Email,LastName\r\n1,\u00e9@example.com,\u00c9\r\n".encode("utf-8")
+        self.assertEqual(self.qualtrics.importPanel("UR_1", "Panel", document, ColumnHeaders="1"), "ML_1")
+        params = post_func.call_args[1]["params"]
+        self.assertEqual((params["ExternalRef"], params["Email"], params["LastName"]), (1, 2, 3))
+        self.assertEqual(post_func.call_args[1]["data"], document)
+        # List of rows can be uploaded again
+        body = CSVBody(panel, ["FirstName", "Email"])
+        self.assertEqual(b"".join(body), b"".join(body))
+        # Rows of a generator can not
+        body = CSVBody((row for row in panel), ["FirstName", "Email"])
+        self.assertFalse(body.replayable)
+        self.assertEqual(len(b"".join(body).splitlines()), 3)
+        self.assertRaises(ValueError, b"".join, body)
+
+        # Generator body is not repeated after HTTP 429: the second attempt would upload only header rows
+        bodies = []
+
+        def post(url, data=None, **kwargs):
+            bodies.append(b"".join(data))
+            return responses.pop(0)
+        success = '{"Meta": {"Status": "Success"}, "Result": {}}'
+        error = '{"Meta": {"Status": "Error", "ErrorMessage": "Too many requests"}}'
+        retry = RetryPolicy(max_attempts=3, backoff=0.01, jitter=False)
+        post_func.side_effect = post
+        with Qualtrics("user", "token", retry=retry) as qualtrics:
+            responses = [MockResponse(status_code=429, data=error), MockResponse(data=success)]
+            rows = ({"ResponseID": "R_%s" % i, "ED": str(i)} for i in range(3))
+            self.assertFalse(qualtrics.importResponsesAsDict("SV_1", rows))
+            self.assertEqual(qualtrics.last_error_message, "Too many requests")
+            self.assertEqual(qualtrics.last_retries, 0)
+            self.assertEqual(len(bodies), 1)
+            self.assertEqual(len(bodies[0].splitlines()), 5)
+            # List of rows is uploaded again
+            responses = [MockResponse(status_code=429, data=error), MockResponse(data=success)]
+            rows = [{"ResponseID": "R_%s" % i, "ED": str(i)} for i in range(3)]
+            self.assertTrue(qualtrics.importResponsesAsDict("SV_1", rows))
+            self.assertEqual(qualtrics.last_retries, 1)
+            self.assertEqual(bodies[1], bodies[2])
+        post_func.side_effect = None
+        chunks = list(CSVBody([{"a": 1}] * 10000, ["a"], chunk_size=1000))
+        self.assertTrue(all(1000 <= len(chunk) < 1010 for chunk in chunks[:-1]))
+
+    @patch("pyqualtrics.requests.Session.post")
+    def test_chunked_imports(self, post_func):
+        uploads = []
+        lock = threading.Lock()
+
+        def post(url, data, params, **kwargs):
+            with lock:
+                uploads.append((data, params.get("PanelID"), params.get("ListID")))
+            if params["Request"] == "importContacts":
+                return MockResponse(data='{"Meta": {"Status": "Success"}, "Result": {"ListID": "ML_2"}}')
+            if b"fail" in data:
+                return MockResponse(data='{"Meta": {"Status": "Error", "ErrorMessage": "Invalid row"}}')
+            return MockResponse(data='{"Meta": {"Status": "Success"}, "Result": {"PanelID": "ML_1"}}')
+
+        post_func.side_effect = post
+        rows = [u'"Line\nbreak",%s,\u00e9\r\n' % i for i in range(100)]
+        document = u"FirstName,Email,LastName\r\n" + u"".join(rows)
+        self.assertEqual(self.qualtrics.importPanel("UR_1", "Panel", document, ColumnHeaders="1", max_size=200),
+                         "ML_1")
+        self.assertEqual([panel_id for _, panel_id, _ in uploads], [None] + ["ML_1"] * (len(uploads) - 1))
+        self.assertGreater(len(uploads), 10)
+        self.assertEqual(post_func.call_args[1]["params"]["Email"], 2)
+        parts = [data.decode("utf-8") for data, _, _ in uploads]
+        self.assertTrue(all(len(part.encode("utf-8")) <= 200 for part in parts))
+        self.assertTrue(all(part.startswith(u"FirstName,Email,LastName\r\n") for part in parts))
+        self.assertEqual(sorted(row for part in parts for row in csv_rows(part)[1:]),
+                         sorted(row for row in csv_rows(document)[1:]))
+
+        del uploads[:]
+        panel = [{"Email": "%s@example.com" % i} for i in range(50)] + [{"Email": "fail"}]
+        PanelID, failures = self.qualtrics.import_panel("UR_1", "Panel", CSVBody(panel, ["Email"]), max_size=100,
+                                                        ColumnHeaders="1")
+        self.assertEqual(PanelID, "ML_1")
+        self.assertEqual(failures, [(len(uploads) - 1, "Invalid row")])
+        del uploads[:]
+        self.assertIsNone(self.qualtrics.importJsonPanel("UR_1", "Panel", panel, max_size=100))
+        self.assertEqual(self.qualtrics.last_error_message, "Part %s: Invalid row" % (len(uploads) - 1))
+        self.assertIsNone(self.qualtrics.importPanel("UR_1", "Panel", "Email\r\nfail\r\n"))
+        self.assertEqual(self.qualtrics.last_error_message, "Part 0: Invalid row")
+
+        del uploads[:]
+        self.assertEqual(self.qualtrics.importContacts("UR_1", "List", document, max_size=1000), "ML_2")
+        self.assertEqual([list_id for _, _, list_id in uploads], [None] + ["ML_2"] * (len(uploads) - 1))
+        # Without ColumnHeaders the first row is not repeated
+        self.assertEqual(b"".join(data for data, _, _ in uploads), document.encode("utf-8"))
+
+    @patch("pyqualtrics.requests.Session.post")
+    @patch("pyqualtrics.requests.Session.get")
+    def test_import_job_manager(self, get_func, post_func):
+        checks = {}
+        lock = threading.Lock()
+
+        def post(url, data, params, **kwargs):
+            if b"fail" in data:
+                return MockResponse(data='{"Meta": {"Status": "Error", "ErrorMessage": "Invalid file"}}')
+            list_id = "ML_" + data.decode("utf-8").split()[-1]
+            return MockResponse(data='{"Meta": {"Status": "Success"}, "Result": {"ListID": "%s", "JobID": "J%s"}}'
+                                % (list_id, list_id))
+
+        def get(url, params, **kwargs):
+            self.assertEqual(params["Request"], "checkImportContactsStatus")
+            self.assertEqual(params["JobID"], "J" + params["ListID"])
+            with lock:
+                checks[params["ListID"]] = checks.get(params["ListID"], 0) + 1
+                count = checks[params["ListID"]]
+            status = {"ML_1": "Complete" if count == 1 else "Importing", "ML_2": "Complete" if count == 3 else
+                      "Importing", "ML_3": "Failed", "ML_4": "Importing"}[params["ListID"]]
+            return MockResponse(data='{"Meta": {"Status": "Success"}, "Result": {"Status": "%s", '
+                                     '"PercentComplete": %s}}' % (status, 30 * count))
+
+        post_func.side_effect = post
+        get_func.side_effect = get
+        manager = ImportJobManager(self.qualtrics, timeout=0.5, min_interval=0.01, max_interval=0.05)
+        manager_jobs = [manager.submit("UR_1", "List " + name, "Email\r\n" + name, ColumnHeaders="1")
+                        for name in ("1", "2", "3", "4", "fail")]
+        order = [job["Name"] for job in manager.as_completed()]
+        self.assertEqual(order[0], "List fail")
+        self.assertEqual(order[3:], ["List 2", "List 4"])
+        jobs = dict((job["Name"], job) for job in manager_jobs)
+        self.assertEqual(jobs["List fail"]["error"], "Part 0: Invalid file")
+        self.assertEqual((jobs["List 1"]["status"], jobs["List 1"]["ListID"]), ("complete", "ML_1"))
+        self.assertEqual(list(jobs["List 1"]["timings"]), ["submit", "wait"])
+        self.assertEqual(jobs["List 3"]["error"], "Contact import ML_3 failed: status Failed")
+        self.assertEqual(jobs["List 2"]["JobIDs"], ["JML_2"])
+        self.assertEqual(jobs["List 2"]["results"], [{"Status": "Complete", "PercentComplete": 90}])
+        self.assertEqual(jobs["List 4"]["status"], "failed")
+        self.assertEqual(jobs["List 4"]["error"], "Contact import did not complete in 0.5 seconds")
+        self.assertEqual(checks["ML_2"], 3)
+        self.assertEqual(manager.jobs, [])
+
+        # Import split into parts is complete when import jobs of all parts are complete
+        statuses = {"J1": ["Importing", "Complete"], "J2": ["Importing", "Importing", "Complete"]}
+        post_func.side_effect = [MockResponse(data='{"Meta": {"Status": "Success"}, "Result": {"ListID": "ML_5", '
+                                                   '"JobID": "J%s"}}' % part) for part in (1, 2)]
+
+        def get(url, params, **kwargs):
+            status = statuses[params["JobID"]].pop(0)
+            return MockResponse(data='{"Meta": {"Status": "Success"}, "Result": {"Status": "%s"}}' % status)
+
+        get_func.side_effect = get
+        manager = ImportJobManager(self.qualtrics, min_interval=0.01, max_interval=0.05)
+        job = manager.submit("UR_1", "List 5", "Email\r\n%s\r\n%s\r\n" % ("a" * 20, "b" * 20), ColumnHeaders="1",
+                             max_size=30, workers=1)
+        self.assertEqual(list(manager.as_completed()), [job])
+        self.assertEqual((job["status"], job["ListID"], job["JobIDs"]), ("complete", "ML_5", ["J1", "J2"]))
+        self.assertEqual(statuses, {"J1": [], "J2": []})
+        self.assertEqual(post_func.call_args[1]["params"]["ListID"], "ML_5")
+        # Import without JobID can not be told apart from other imports to the same list
+        post_func.side_effect = None
+        post_func.return_value = MockResponse(data='{"Meta": {"Status": "Success"}, "Result": {"ListID": "ML_6"}}')
+        get_func.reset_mock()
+        job = manager.submit("UR_1", "List 6", "Email\r\na\r\n", ColumnHeaders="1")
+        self.assertEqual(list(manager.as_completed()), [job])
+        self.assertEqual((job["status"], job["error"]),
+                         ("failed", "Qualtrics did not return JobID of contact import to ML_6"))
+        self.assertEqual(get_func.call_count, 0)
+        post_func.return_value = MockResponse(data='{"Meta": {"Status": "Error", "ErrorMessage": "Invalid file"}}')
+        self.assertEqual(self.qualtrics.import_contacts("UR_1", "List", "Email\r\na\r\n", ColumnHeaders="1"),
+                         (None, [(0, "Invalid file")], []))
+
+    @patch("pyqualtrics.requests.Session.get")
+    def test_generate_unique_survey_links(self, get_func):
+        def get(url, params, **kwargs):
+            if params["Email"] == "fail":
+                return MockResponse(data='{"Meta": {"Status": "Error", "ErrorMessage": "Invalid email"}}')
+            return MockResponse(data='{"Meta": {"Status": "Success"}, "Result": {"RecipientID": "MLRP_%s"}}'
+                                     % params["Email"].split("@")[0])
+
+        get_func.side_effect = get
+        people = [{"Email": "%s@example.com" % i, "FirstName": u"\u00e9", "EmbeddedData": {"n": i}}
+                  for i in range(10)]
+        people[4]["Email"] = "fail"
+        # Key missing in the first row
+        people[8]["Phone"] = "555"
+
+        def interrupted():
+            for person in people[:7]:
+                yield person
+            raise KeyboardInterrupt()
+
+        work_dir = tempfile.mkdtemp()
+        try:
+            self.assertIsNone(self.qualtrics.generate_unique_survey_links("SV1", "UR_1", "ML_1", "EMD_1", people,
+                                                                          os.path.join(work_dir, "links.csv")))
+            self.assertEqual(self.qualtrics.last_error_message, "Invalid SurveyID format (must be SV_xxxxxxxxxx)")
+            self.assertEqual(get_func.call_count, 0)
+
+            for name in ("links.csv", "links.jsonl"):
+                path = os.path.join(work_dir, name)
+                self.assertRaises(KeyboardInterrupt, self.qualtrics.generate_unique_survey_links, "SV_1", "UR_1",
+                                  "ML_1", "EMD_1", interrupted(), path, workers=2, checkpoint_every=3)
+                with open(path + ".checkpoint") as fp:
+                    processed = json.load(fp)["rows"]
+                self.assertIn(processed, (0, 3, 6))
+                result = self.qualtrics.generate_unique_survey_links("SV_1", "UR_1", "ML_1", "EMD_1", people, path,
+                                                                     workers=2, checkpoint_every=3)
+                if processed < 6:
+                    self.assertEqual(result, (9 - processed, [(4, "Invalid email")]))
+                else:
+                    self.assertEqual(result, (4, []))
+                with open(path) as fp:
+                    if name.endswith(".csv"):
+                        rows = list(csv.DictReader(fp))
+                    else:
+                        rows = [json.loads(line) for line in fp]
+                self.assertEqual(len(rows), 10)
+                self.assertEqual(rows[1]["Link"], "http://new.qualtrics.com/SE?Q_DL=1_1_MLRP_1")
+                self.assertEqual(rows[4]["Error"], "Invalid email")
+                self.assertFalse(rows[4]["Link"])
+                self.assertEqual([row["RecipientID"] for row in rows[5:]], ["MLRP_%s" % i for i in range(5, 10)])
+                self.assertEqual(rows[8].get("Phone"), "555" if name.endswith(".jsonl") else None)
+            self.assertEqual(list(rows[9].keys()), ["Email", "FirstName", "EmbeddedData", "RecipientID", "Link",
+                                                    "Error"])
+            self.assertEqual(rows[9]["EmbeddedData"], {"n": 9})
+
+            # Declared CSV columns
+            path = os.path.join(work_dir, "columns.csv")
+            generator = UniqueLinkGenerator(self.qualtrics, "SV_1", "UR_1", "ML_1", "EMD_1",
+                                            columns=["Email", "Phone"])
+            self.assertEqual(generator.run(people, path), (9, [(4, "Invalid email")]))
+            self.assertEqual(generator.dropped_columns, set(["FirstName", "EmbeddedData"]))
+            with open(path) as fp:
+                rows = list(csv.DictReader(fp))
+            self.assertEqual(list(rows[0].keys()), ["Email", "Phone", "RecipientID", "Link", "Error"])
+            self.assertEqual([row["Phone"] for row in rows[7:]], ["", "555", ""])
+        finally:
+            shutil.rmtree(work_dir)
+
+    @patch("pyqualtrics.requests.Session.get")
+    def test_update_responses_embedded_data(self, get_func):
+        sent = []
+        lock = threading.Lock()
+
+        def get(url, params, **kwargs):
+            with lock:
+                sent.append((params["ResponseID"], dict((name[3:-1], value) for name, value in params.items()
+                                                        if name.startswith("ED["))))
+            if params["ResponseID"] == "R_bad":
+                return MockResponse(data='{"Meta": {"Status": "Error", "ErrorMessage": "Invalid ResponseID"}}')
+            return MockResponse(data='{"Meta": {"Status": "Success"}, "Result": {}}')
+
+        get_func.side_effect = get
+        updates = [("R_%s" % (i % 20), {"score": str(i)}) for i in range(40)] + [("R_1", {"extra": "1"}),
+                                                                                 ("R_bad", {"score": "0"})]
+        work_dir = tempfile.mkdtemp()
+        try:
+            journal = os.path.join(work_dir, "journal.jsonl")
+            updated, failures = self.qualtrics.updateResponsesEmbeddedData("SV_1", updates, workers=3, journal=journal)
+            self.assertEqual((updated, failures), (20, [("R_bad", "Invalid ResponseID")]))
+            self.assertEqual(len(sent), 21)
+            self.assertEqual(dict(sent)["R_1"], {"score": "21", "extra": "1"})
+            # Successful updates are not sent again
+            self.assertEqual(self.qualtrics.updateResponsesEmbeddedData("SV_1", updates, journal=journal),
+                             (0, [("R_bad", "Invalid ResponseID")]))
+            self.assertEqual(len(sent), 22)
+            # Batches are merged separately
+            del sent[:]
+            self.assertEqual(self.qualtrics.updateResponsesEmbeddedData("SV_1", updates[:40], batch_size=20)[0], 40)
+            self.assertEqual(len(sent), 40)
+
+            # Updates of one response spanning two batches are recognized when the next run merges them
+            journal = os.path.join(work_dir, "batches.jsonl")
+            updates = [("R_1", {"a": "1"}), ("R_2", {"a": "2"}), ("R_1", {"b": "3"})]
+            del sent[:]
+            self.assertEqual(self.qualtrics.updateResponsesEmbeddedData("SV_1", updates, batch_size=2,
+                                                                        journal=journal), (3, []))
+            self.assertEqual(sorted((rid, sorted(ed.items())) for rid, ed in sent),
+                             [("R_1", [("a", "1")]), ("R_1", [("b", "3")]), ("R_2", [("a", "2")])])
+            self.assertEqual(self.qualtrics.updateResponsesEmbeddedData("SV_1", updates, journal=journal), (0, []))
+            # Only fields with new values are sent
+            self.assertEqual(self.qualtrics.updateResponsesEmbeddedData(
+                "SV_1", updates + [("R_1", {"b": "4"})], journal=journal), (1, []))
+            self.assertEqual(sent[-1], ("R_1", {"b": "4"}))
+            self.assertEqual(len(sent), 4)
+        finally:
+            shutil.rmtree(work_dir)
+
+    def test_file_token_bucket(self):
+        work_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(work_dir, "bucket")
+            # Two buckets using the same file (as in two processes) share one budget
+            first, second = FileTokenBucket(path, rate=10), FileTokenBucket(path, rate=10)
+            start = time.time()
+            for i in range(10):
+                (first if i % 2 else second).acquire()
+            self.assertLess(time.time() - start, 0.5)
+            second.acquire()
+            self.assertGreater(time.time() - start, 0.05)
+            # Corrupted state file is reset
+            with open(path, "w") as fp:
+                fp.write("garbage")
+            first.acquire()
+        finally:
+            shutil.rmtree(work_dir)
+
+    @patch("pyqualtrics.requests.Session.get")
+    def test_stream_response_export_file(self, get_func):
+        responses = [{"ResponseID": "R_%s" % i, "Q1": str(i % 5)} for i in range(1000)]
+        documents = {
+            "csv": u"\ufeffResponseID,Q1\r\n" + u"".join(u"%(ResponseID)s,%(Q1)s\r\n" % r for r in responses),
+            "json": json.dumps({"responses": responses}),
+            "xml": u"<?xml version='1.0'?><Responses>" + u"".join(
+                u"<Response><ResponseID>%(ResponseID)s</ResponseID><Q1>%(Q1)s</Q1></Response>" % r
+                for r in responses) + u"</Responses>",
+        }
+        for format, document in documents.items():
+            archive = zip_archive("survey.%s" % format, document.encode("utf-8"))
+            get_func.return_value = MockResponse(data=archive)
+            with self.qualtrics.StreamResponseExportFile("ES_123", chunk_size=100) as reader:
+                self.assertIsNone(self.qualtrics.last_error_message)
+                self.assertEqual(reader.bytes_downloaded, len(archive))
+                self.assertEqual([dict(row) for row in reader], responses)
+                self.assertEqual(reader.rows_parsed, 1000)
+
+        # Additional header row of csv2013 format is not a response
+        document = u"ResponseID,Q1\r\nResponse ID,Q1 text\r\nR_1,1\r\n"
+        get_func.return_value = MockResponse(data=zip_archive("survey.csv", document.encode("utf-8")))
+        with self.qualtrics.StreamResponseExportFile("ES_123", format="csv2013") as reader:
+            self.assertEqual([dict(row) for row in reader], [{"ResponseID": "R_1", "Q1": "1"}])
+            self.assertEqual(reader.rows_parsed, 1)
+
+        get_func.return_value = MockResponse(data=zip_archive("survey.sav", b"1234"))
+        self.assertIsNone(self.qualtrics.StreamResponseExportFile("ES_123"))
+        self.assertEqual(self.qualtrics.last_error_message, "Export format sav is not supported by ExportReader")
+        get_func.return_value = MockResponse(data=b"")
+        self.assertIsNone(self.qualtrics.StreamResponseExportFile("ES_123"))
+        self.assertEqual(self.qualtrics.last_error_message, "File is not a zip file")
+
+    @patch("pyqualtrics.requests.Session.get")
+    def test_export_to_columnar_file(self, get_func):
+        rows = [u"R_%s,%s,%s,0%s,%s" % (i, i % 5, i / 4.0, i, u"\u00e9" * (i % 3)) for i in range(100)]
+        document = u"\ufeffResponseID,Q1,Q2,Zip,Text\r\nResponse ID,Q1 text,Q2 text,Zip,Text\r\n" \
+                   u'{"ImportId":"responseId"},{"ImportId":"QID1"},{"ImportId":"QID2"},,\r\n' + \
+                   u"\r\n".join(rows) + u"\r\nR_100,,1e3,,\r\n"
+        get_func.return_value = MockResponse(data=zip_archive("survey.csv", document.encode("utf-8")))
+        work_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(work_dir, "survey.qcol")
+            with self.qualtrics.StreamResponseExportFile("ES_123", format="csv") as reader:
+                self.assertEqual(reader.header_rows, 2)
+                writer = reader.to_columnar(path, sample_rows=10, row_group_size=30, engine="qcol")
+            self.assertEqual(writer.rows_written, 101)
+            self.assertEqual(list(writer.types.items()), [("ResponseID", "string"), ("Q1", "int"), ("Q2", "float"),
+                                                          ("Zip", "string"), ("Text", "string")])
+            table = read_columnar(path, columns=["Q2", "Q1"])
+            self.assertEqual(list(table), ["Q2", "Q1"])
+            self.assertEqual(table["Q1"], [i % 5 for i in range(100)] + [None])
+            self.assertEqual(table["Q2"], [i / 4.0 for i in range(100)] + [1000.0])
+            table = read_columnar(path)
+            self.assertEqual(table["Zip"][:3], ["00", "01", "02"])
+            self.assertEqual(table["Text"][:3], [None, u"\u00e9", u"\u00e9\u00e9"])
+
+            # Values which do not match type inferred from the sample widen the column,
+            # row groups already written are rewritten
+            with ColumnarWriter(path, sample_rows=2, row_group_size=2, engine="qcol") as writer:
+                for value in ("1", 2, "", "3", "2.5", "4", "N/A"):
+                    writer.write({"Q1": value, "Q2": value if value != "N/A" else "5"})
+            self.assertEqual(writer.rows_written, 7)
+            self.assertEqual(dict(writer.types), {"Q1": "string", "Q2": "float"})
+            self.assertEqual(dict(writer.widened), {"Q1": "int", "Q2": "int"})
+            self.assertEqual(read_columnar(path), {"Q1": ["1.0", "2.0", None, "3.0", "2.5", "4.0", "N/A"],
+                                                   "Q2": [1.0, 2.0, None, 3.0, 2.5, 4.0, 5.0]})
+            self.assertEqual(os.listdir(work_dir), ["survey.qcol"])
+
+            # Types specified explicitly are not widened. Partial file is deleted
+            os.remove(path)
+            with ColumnarWriter(path, sample_rows=2, row_group_size=2, types={"Q1": "int"}, engine="qcol") as writer:
+                for value in range(5):
+                    writer.write({"Q1": value})
+                self.assertRaises(ValueError, writer.write, {"Q1": "x"})
+                self.assertRaises(ValueError, writer.write, {"Q2": "1"})
+            self.assertEqual(read_columnar(path), {"Q1": [0, 1, 2, 3, 4]})
+            os.remove(path)
+            try:
+                with ColumnarWriter(path, sample_rows=2, row_group_size=2, engine="qcol") as writer:
+                    for value in range(5):
+                        writer.write({"Q1": value})
+                    writer.write({"Q2": "1"})
+            except ValueError:
+                pass
+            self.assertEqual(os.listdir(work_dir), [])
+            with ColumnarWriter(path, sample_rows=2, types={"Q1": "string"}, engine="qcol") as writer:
+                for value in ("1", "2", "x"):
+                    writer.write({"Q1": value})
+            self.assertEqual(read_columnar(path), {"Q1": ["1", "2", "x"]})
+
+            # Integers out of int64 range (long IDs) are strings, in the sample and after it
+            with ColumnarWriter(path, sample_rows=2, engine="qcol") as writer:
+                for index, value in enumerate(("12345678901234567890123", "1", "9223372036854775807",
+                                               "-9223372036854775809")):
+                    writer.write({"ID": value, "Q1": str(index)})
+            self.assertEqual(dict(writer.types), {"ID": "string", "Q1": "int"})
+            self.assertEqual(read_columnar(path)["ID"], ["12345678901234567890123", "1", "9223372036854775807",
+                                                         "-9223372036854775809"])
+            with ColumnarWriter(path, sample_rows=2, engine="qcol") as writer:
+                for value in ("1", 2, 18446744073709551616):
+                    writer.write({"Q1": value})
+            self.assertEqual(read_columnar(path), {"Q1": ["1", "2", "18446744073709551616"]})
+        finally:
+            shutil.rmtree(work_dir)
+
+    @patch("pyqualtrics.requests.Session.post")
+    @patch("pyqualtrics.requests.Session.get")
+    def test_export_responses(self, get_func, post_func):
+        post_func.return_value = MockResponse(data='{"result": {"id": "ES_123"}}')
+        progress = '{"result": {"status": "%s", "percentComplete": %s, "file": "https://example.com/file"}}'
+        archive = zip_archive("survey.json", b'{"responses": [{"ResponseID": "R_1"}]}')
+        get_func.side_effect = [
+            MockResponse(data=progress % ("in progress", 0.0)),
+            MockResponse(data=progress % ("in progress", 80.0)),
+            MockResponse(data=progress % ("complete", 100.0)),
+            MockResponse(data=archive),
+        ]
+        reader = self.qualtrics.export_responses("SV_123", format="json", min_interval=0.01, limit=10)
+        self.assertIsNone(self.qualtrics.last_error_message)
+        self.assertEqual(json.loads(post_func.call_args[1]["data"]),
+                         {"format": "json", "surveyId": "SV_123", "limit": 10})
+        self.assertEqual(get_func.call_args[0][0], "https://example.com/file")
+        self.assertEqual([dict(row) for row in reader], [{"ResponseID": "R_1"}])
+        reader.close()
+
+        get_func.side_effect = None
+        get_func.return_value = MockResponse(data=progress % ("in progress", 0.0))
+        self.assertIsNone(self.qualtrics.export_responses("SV_123", timeout=0.05, min_interval=0.01))
+        self.assertEqual(self.qualtrics.last_error_message, "Response export ES_123 did not complete in 0.05 seconds")
+
+        cancel = threading.Event()
+        cancel.set()
+        self.assertIsNone(self.qualtrics.export_responses("SV_123", cancel=cancel))
+        self.assertEqual(self.qualtrics.last_error_message, "Response export ES_123 was cancelled")
+
+        get_func.return_value = MockResponse(data=progress % ("failed", 0.0))
+        self.assertIsNone(self.qualtrics.export_responses("SV_123"))
+        self.assertEqual(self.qualtrics.last_error_message, "Response export ES_123 failed: status failed")
+
+        # Unsupported format is reported before the export is created
+        post_func.reset_mock()
+        self.assertIsNone(self.qualtrics.export_responses("SV_123", format="spss"))
+        self.assertEqual(self.qualtrics.last_error_message, "Export format spss is not supported by ExportReader")
+        self.assertFalse(post_func.called)
+
+    @patch("pyqualtrics.requests.Session.post")
+    @patch("pyqualtrics.requests.Session.get")
+    def test_export_surveys(self, get_func, post_func):
+        polls = {}
+        lock = threading.Lock()
+
+        def post(url, data, **kwargs):
+            survey_id = json.loads(data)["surveyId"]
+            if survey_id == "SV_bad":
+                return MockResponse(400, '{"meta": {"error": {"errorMessage": "Invalid surveyId parameter."}}}')
+            return MockResponse(data='{"result": {"id": "ES_%s"}}' % survey_id)
+
+        def get(url, **kwargs):
+            export_id = url.split("/")[-1]
+            if url.startswith("https://example.com/"):
+                return MockResponse(data=zip_archive("export.csv", export_id.encode("utf-8")))
+            with lock:
+                polls[export_id] = polls.get(export_id, 0) + 1
+                count = polls[export_id]
+            if export_id == "ES_SV_slow" or count < 3:
+                return MockResponse(data='{"result": {"status": "in progress", "percentComplete": 10.0}}')
+            return MockResponse(data='{"result": {"status": "complete", "file": "https://example.com/%s"}}' %
+                                     export_id)
+        post_func.side_effect = post
+        get_func.side_effect = get
+        target_dir = tempfile.mkdtemp()
+        try:
+            survey_ids = ["SV_%s" % i for i in range(10)] + ["SV_bad", "SV_slow"]
+            manifest = self.qualtrics.export_surveys(survey_ids, target_dir, max_concurrency=4, timeout=1,
+                                                     min_interval=0.01, max_interval=0.05)
+            self.assertEqual(list(manifest["surveys"]), survey_ids)
+            for i in range(10):
+                survey = manifest["surveys"]["SV_%s" % i]
+                self.assertEqual(survey["status"], "complete")
+                self.assertEqual(survey["file"], os.path.join(target_dir, "SV_%s.csv" % i))
+                self.assertEqual(list(survey["timings"]), ["create", "wait", "download", "unzip"])
+                with open(survey["file"]) as fp:
+                    self.assertEqual(fp.read(), "ES_SV_%s" % i)
+            self.assertEqual(manifest["surveys"]["SV_bad"]["error"], "Invalid surveyId parameter.")
+            self.assertEqual(manifest["surveys"]["SV_slow"]["error"], "Response export did not complete in 1 seconds")
+            with open(os.path.join(target_dir, "manifest.json")) as fp:
+                self.assertEqual(json.load(fp)["surveys"]["SV_slow"]["status"], "failed")
+            self.assertEqual(len(os.listdir(target_dir)), 11)
+        finally:
+            shutil.rmtree(target_dir)
+
+    @patch("pyqualtrics.requests.Session.get")
+    def test_sync_responses(self, get_func):
+        def get(url, params, **kwargs):
+            responses = [("R_%s" % i, {"EndDate": "2017-06-0%s" % i, "Q1": i}) for i in range(1, 6)]
+            if params.get("LastResponseID"):
+                responses = responses[int(params["LastResponseID"][2:]):]
+            return MockResponse(data=json.dumps(OrderedDict(responses[:3])))
+        get_func.side_effect = get
+        work_dir = tempfile.mkdtemp()
+        try:
+            dataset = os.path.join(work_dir, "SV_1.jsonl")
+            for store in (JSONCheckpointStore(os.path.join(work_dir, "checkpoints.json")),
+                          SQLiteCheckpointStore(os.path.join(work_dir, "checkpoints.db"))):
+                if os.path.exists(dataset):
+                    os.remove(dataset)
+                self.assertEqual(self.qualtrics.sync_responses("SV_1", dataset, store), 3)
+                self.assertIsNone(get_func.call_args[1]["params"].get("LastResponseID"))
+                # Partially written line from interrupted sync is discarded
+                with open(dataset, "a") as fp:
+                    fp.write('{"ResponseID": "R_')
+                self.assertEqual(self.qualtrics.sync_responses("SV_1", dataset, store), 2)
+                self.assertEqual(get_func.call_args[1]["params"]["LastResponseID"], "R_3")
+                self.assertEqual(self.qualtrics.sync_responses("SV_1", dataset, store), 0)
+                with open(dataset) as fp:
+                    rows = [json.loads(line, object_pairs_hook=OrderedDict) for line in fp]
+                self.assertEqual([list(row.items()) for row in rows],
+                                 [[("ResponseID", "R_%s" % i), ("EndDate", "2017-06-0%s" % i), ("Q1", i)]
+                                  for i in range(1, 6)])
+                self.assertEqual(store.get("SV_1")["end_date"], "2017-06-05")
+                self.assertEqual(store.get("SV_1")["dataset_size"], os.path.getsize(dataset))
+                self.assertIsNone(store.get("SV_2"))
+                # Existing dataset without checkpoint is not truncated
+                self.assertIsNone(self.qualtrics.sync_responses("SV_2", dataset, store))
+                self.assertIn("no checkpoint", self.qualtrics.last_error_message)
+                self.assertEqual(len(open(dataset).readlines()), 5)
+        finally:
+            shutil.rmtree(work_dir)
+
+    @patch("pyqualtrics.requests.Session.get")
+    def test_sync_responses_pages(self, get_func):
+        def get(url, params, **kwargs):
+            responses = [("R_%s" % i, {"Q1": i}) for i in range(1, 8)]
+            if params.get("LastResponseID"):
+                if params["LastResponseID"] == "R_4" and fail:
+                    return MockResponse(data='{"Meta": {"Status": "Error", "ErrorMessage": "Server error"}}')
+                responses = responses[int(params["LastResponseID"][2:]):]
+            return MockResponse(data=json.dumps(OrderedDict(responses[:int(params["Limit"])])))
+        get_func.side_effect = get
+        fail = True
+        work_dir = tempfile.mkdtemp()
+        try:
+            dataset = os.path.join(work_dir, "SV_1.jsonl")
+            store = JSONCheckpointStore(os.path.join(work_dir, "checkpoints.json"))
+            # Third page fails, checkpoint of the first two pages is kept
+            self.assertIsNone(self.qualtrics.sync_responses("SV_1", dataset, store, page_size=2))
+            self.assertEqual(get_func.call_count, 3)
+            self.assertEqual(store.get("SV_1")["last_response_id"], "R_4")
+            self.assertEqual(store.get("SV_1")["dataset_size"], os.path.getsize(dataset))
+            fail = False
+            self.assertEqual(self.qualtrics.sync_responses("SV_1", dataset, store, page_size=2), 3)
+            self.assertEqual(get_func.call_args_list[3][1]["params"]["LastResponseID"], "R_4")
+            with open(dataset) as fp:
+                self.assertEqual([json.loads(line)["ResponseID"] for line in fp], ["R_%s" % i for i in range(1, 8)])
+        finally:
+            shutil.rmtree(work_dir)
+
+    @patch("pyqualtrics.requests.Session.get")
+    def test_iter_legacy_response_data(self, get_func):
+        def get(url, params, **kwargs):
+            responses = [("R_%s" % i, {"Q1": i}) for i in range(1, 8)]
+            if params.get("LastResponseID"):
+                responses = responses[int(params["LastResponseID"][2:]):]
+            return MockResponse(data=json.dumps(OrderedDict(responses[:int(params["Limit"])])))
+        get_func.side_effect = get
+        for prefetch in (False, True):
+            items = list(self.qualtrics.iterLegacyResponseData("SV_1", page_size=3, prefetch=prefetch))
+            self.assertEqual([response_id for response_id, _ in items], ["R_%s" % i for i in range(1, 8)])
+            self.assertEqual(items[6][1]["Q1"], 7)
+            self.assertIsNone(self.qualtrics.last_error_message)
+        # Pages of 3, 3 and 1 responses
+        self.assertEqual([c[1]["params"].get("LastResponseID") for c in get_func.call_args_list[-3:]],
+                         [None, "R_3", "R_6"])
+        # Exact multiple of page_size: one more (empty) page is requested
+        self.assertEqual(len(list(self.qualtrics.iterLegacyResponseData("SV_1", page_size=7))), 7)
+        self.assertEqual(len(list(self.qualtrics.iterLegacyResponseData("SV_1", LastResponseID="R_2"))), 5)
+
+        get_func.side_effect = lambda url, params, **kwargs: MockResponse(
+            status_code=500, data='{"Meta": {"Status": "Error", "ErrorMessage": "Server error"}}')
+        self.assertEqual(list(self.qualtrics.iterLegacyResponseData("SV_1", prefetch=True)), [])
+        self.assertIsNotNone(self.qualtrics.last_error_message)
+
+    @patch("pyqualtrics.requests.Session.get")
+    def test_iter_panel_and_list_contacts(self, get_func):
+        members = [{"RecipientID": "MLRP_%s" % i, "Email": "%s@example.com" % i} for i in range(1, 11)]
+
+        def get(url, params, **kwargs):
+            start = int(params["LastRecipientID"][5:]) if params.get("LastRecipientID") else 0
+            return MockResponse(data=json.dumps(members[start:start + int(params["NumberOfRecords"])]))
+        get_func.side_effect = get
+        for prefetch in (False, True):
+            self.assertEqual(list(self.qualtrics.iterPanel("UR_1", "ML_1", page_size=4, prefetch=prefetch)), members)
+            self.assertEqual(get_func.call_args[1]["params"]["Request"], "getPanel")
+            self.assertEqual(list(self.qualtrics.iterListContacts("UR_1", "ML_1", page_size=4, prefetch=prefetch)),
+                             members)
+            self.assertEqual(get_func.call_args[1]["params"]["Request"], "getListContacts")
+        self.assertEqual([c[1]["params"]["LastRecipientID"] for c in get_func.call_args_list[-3:]],
+                         [None, "MLRP_4", "MLRP_8"])
+        # Generator is lazy: only the first page is requested
+        get_func.reset_mock()
+        iterator = self.qualtrics.iterPanel("UR_1", "ML_1", page_size=2, LastRecipientID="MLRP_5")
+        self.assertEqual(next(iterator)["RecipientID"], "MLRP_6")
+        self.assertEqual(get_func.call_count, 1)
+        iterator.close()
+
+    @patch("pyqualtrics.requests.Session.get")
+    def test_truncate_contact_list(self, get_func):
+        contacts = ["MLRP_%02d" % i for i in range(1, 26)]
+        lock = threading.Lock()
+
+        def get(url, params, **kwargs):
+            with lock:
+                if params["Request"] == "getListContacts":
+                    start = 0
+                    if params.get("LastRecipientID"):
+                        if params["LastRecipientID"] not in contacts:
+                            return MockResponse(status_code=400, data=json.dumps(
+                                {"Meta": {"Status": "Error", "ErrorMessage": "Invalid LastRecipientID"}}))
+                        start = contacts.index(params["LastRecipientID"]) + 1
+                    page = contacts[start:start + int(params["NumberOfRecords"])]
+                    return MockResponse(data=json.dumps([{"RecipientID": rid} for rid in page]))
+                if params["RecipientID"] == "MLRP_07":
+                    return MockResponse(status_code=500, data=json.dumps(
+                        {"Meta": {"Status": "Error", "ErrorMessage": "Server error"}}))
+                contacts.remove(params["RecipientID"])
+                return MockResponse(data=json.dumps({"Meta": {"Status": "Success", "Debug": ""}, "Result": {}}))
+        get_func.side_effect = get
+        reported = []
+        success, failures = self.qualtrics.truncate_contact_list("UR_1", "CG_1", workers=3, page_size=4,
+                                                                 progress=reported.append)
+        self.assertFalse(success)
+        self.assertEqual([rid for rid, error in failures], ["MLRP_07"])
+        self.assertIsNotNone(failures[0][1])
+        self.assertEqual(contacts, ["MLRP_07"])
+        self.assertEqual(reported[-1], "MLRP_25")
+        self.assertEqual(reported, sorted(reported))
+        self.assertIsNone(self.qualtrics.last_error_message)
+
+        # Resume: contacts up to LastRecipientID are not touched
+        contacts[:] = ["MLRP_%02d" % i for i in range(1, 11)]
+        success, failures = self.qualtrics.truncate_contact_list("UR_1", "CG_1", LastRecipientID="MLRP_08")
+        self.assertEqual((success, failures), (True, []))
+        self.assertEqual(contacts, ["MLRP_%02d" % i for i in range(1, 9)])
+
+        # Listing fails
+        success, failures = self.qualtrics.truncate_contact_list("UR_1", "CG_1", LastRecipientID="MLRP_99")
+        self.assertEqual((success, failures), (False, []))
+        self.assertEqual(self.qualtrics.last_error_message, "Invalid LastRecipientID")
+
+    def test_adaptive_poller(self):
+        poller = AdaptivePoller(min_interval=1, max_interval=30)
+        poller.started -= 10
+        # 25% in 10 seconds - 30 more seconds, but no more than max_interval
+        self.assertAlmostEqual(poller.next_delay(25.0), 30, places=1)
+        # 80% in 10 seconds
+        self.assertAlmostEqual(poller.next_delay(80.0), 2.5, places=1)
+        self.assertEqual(poller.next_delay(99.99), 1)
+        # No progress information - exponential backoff
+        self.assertEqual(poller.next_delay(None), 1.5)
+        self.assertEqual(poller.next_delay(0), 2.25)
+
+
 if __name__ == "__main__":
     unittest.main()
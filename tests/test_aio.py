@@ -0,0 +1,158 @@
+# This file is part of the pyqualtrics package.
+# For copyright and licensing information about this package, see the
+# NOTICE.txt and LICENSE.txt files in its top-level directory; they are
+# available at https://github.com/Baguage/pyqualtrics
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Unittests for pyqualtrics.aio (Python 3.5+, loaded by tests/__init__.py only on these versions,
+because async syntax can not be compiled by older interpreters)
+"""
+import asyncio
+import unittest
+
+
+class TestAsyncQualtrics(unittest.TestCase):
+    def test_async_api_calls(self):
+        try:
+            from aiohttp import web
+            from aiohttp.test_utils import TestServer
+            from pyqualtrics.aio import AsyncQualtrics
+        except ImportError:
+            self.skipTest("aiohttp is not installed")
+        state = {"in_flight": 0, "max_in_flight": 0}
+
+        async def handler(request):
+            state["in_flight"] += 1
+            state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+            await asyncio.sleep(0.01)
+            state["in_flight"] -= 1
+            if request.path == "/v3":
+                return web.Response(status=404, text='{"meta": {"error": {"errorMessage": "Export id not found"}}}')
+            self.assertEqual(request.query["Request"], "getPanelMemberCount")
+            self.assertNotIn("Unused", request.query)
+            return web.Response(text='{"Meta": {"Status": "Success"}, "Result": {"Count": "%s"}}' %
+                                     request.query["PanelID"])
+
+        async def run():
+            app = web.Application()
+            app.router.add_route("*", "/{tail:.*}", handler)
+            async with TestServer(app) as server:
+                async with AsyncQualtrics("user", "token", max_concurrency=5) as qualtrics:
+                    qualtrics.url = str(server.make_url("/"))
+                    counts = await asyncio.gather(*[qualtrics.getPanelMemberCount("UR_1", str(i), Unused=None)
+                                                    for i in range(20)])
+                    self.assertEqual(counts, list(range(20)))
+                    self.assertIsNone(await qualtrics.request3(str(server.make_url("/v3")), method="get"))
+                    self.assertEqual(qualtrics.last_error_message, "Export id not found")
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(run())
+        finally:
+            loop.close()
+        self.assertEqual(state["max_in_flight"], 5)
+
+    def test_truncate_contact_list(self):
+        try:
+            from aiohttp import web
+            from aiohttp.test_utils import TestServer
+            from pyqualtrics.aio import AsyncQualtrics
+        except ImportError:
+            self.skipTest("aiohttp is not installed")
+        contacts = ["MLRP_%02d" % i for i in range(1, 26)]
+        state = {"in_flight": 0, "max_in_flight": 0}
+
+        async def handler(request):
+            params = request.query
+            if params["Request"] == "getListContacts":
+                start = contacts.index(params["LastRecipientID"]) + 1 if "LastRecipientID" in params else 0
+                page = contacts[start:start + int(params["NumberOfRecords"])]
+                return web.json_response([{"RecipientID": rid} for rid in page])
+            state["in_flight"] += 1
+            state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+            await asyncio.sleep(0.01)
+            state["in_flight"] -= 1
+            if params["RecipientID"] == "MLRP_07":
+                return web.json_response({"Meta": {"Status": "Error", "ErrorMessage": "Server error"}})
+            contacts.remove(params["RecipientID"])
+            return web.json_response({"Meta": {"Status": "Success", "Debug": ""}, "Result": {}})
+
+        async def run():
+            app = web.Application()
+            app.router.add_route("*", "/{tail:.*}", handler)
+            async with TestServer(app) as server:
+                async with AsyncQualtrics("user", "token") as qualtrics:
+                    qualtrics.url = str(server.make_url("/"))
+                    reported = []
+                    result = await qualtrics.truncate_contact_list("UR_1", "CG_1", workers=3, page_size=4,
+                                                                   progress=reported.append)
+                    self.assertEqual(result, (False, [("MLRP_07", "Server error")]))
+                    self.assertEqual(contacts, ["MLRP_07"])
+                    self.assertEqual(reported[-1], "MLRP_25")
+                    self.assertEqual(reported, sorted(reported))
+
+                    # Resume: contacts up to LastRecipientID are not touched
+                    contacts[:] = ["MLRP_%02d" % i for i in range(1, 11)]
+                    result = await qualtrics.truncate_contact_list("UR_1", "CG_1", page_size=4,
+                                                                   LastRecipientID="MLRP_08")
+                    self.assertEqual(result, (True, []))
+                    self.assertEqual(contacts, ["MLRP_%02d" % i for i in range(1, 9)])
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(run())
+        finally:
+            loop.close()
+        self.assertEqual(state["max_in_flight"], 3)
+
+    def test_generate_unique_survey_link(self):
+        try:
+            from aiohttp import web
+            from aiohttp.test_utils import TestServer
+            from pyqualtrics.aio import AsyncQualtrics
+        except ImportError:
+            self.skipTest("aiohttp is not installed")
+        requests = []
+
+        async def handler(request):
+            requests.append(request.query["Request"])
+            return web.json_response({"Meta": {"Status": "Success"}, "Result": {"RecipientID": "MLRP_1"}})
+
+        async def run():
+            app = web.Application()
+            app.router.add_route("*", "/{tail:.*}", handler)
+            async with TestServer(app) as server:
+                async with AsyncQualtrics("user", "token") as qualtrics:
+                    qualtrics.url = str(server.make_url("/"))
+                    # Recipient is not added if IDs are not valid
+                    self.assertIsNone(await qualtrics.generate_unique_survey_link(
+                        "SV1", "UR_1", "ML_1", "EMD_1", "First", "Last", "a@example.com"))
+                    self.assertEqual(qualtrics.last_error_message, "Invalid SurveyID format (must be SV_xxxxxxxxxx)")
+                    self.assertIsNone(await qualtrics.generate_unique_survey_link(
+                        "SV_1", "UR_1", "ML_1", "EMD1", "First", "Last", "a@example.com"))
+                    self.assertEqual(requests, [])
+                    link = await qualtrics.generate_unique_survey_link("SV_1", "UR_1", "ML_1", "EMD_1", "First",
+                                                                       "Last", "a@example.com")
+                    self.assertEqual(link, "http://new.qualtrics.com/SE?Q_DL=1_1_MLRP_1")
+                    self.assertEqual(requests, ["addRecipient"])
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(run())
+        finally:
+            loop.close()
+
+
+if __name__ == "__main__":
+    unittest.main()